@@ -0,0 +1,230 @@
+from datetime import date, datetime, timedelta
+from typing import Collection, Optional
+from sqlalchemy import func, literal, select, tuple_, union_all
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from api import models, schemas
+from api.dialects import is_true
+
+# These helpers take a sync Session so the CLI and bootstrap code can call
+# them directly; async route handlers run them through AsyncSession.run_sync.
+
+def _percentage(part: int, whole: int) -> int:
+    return round((part / whole * 100)) if whole else 0
+
+def compute_summary(db: Session, user_id: str) -> schemas.AnalyticsSummary:
+    now = datetime.now()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    week_ago = today - timedelta(days=7)
+
+    Task = models.Task
+    Pomodoro = models.PomodoroSession
+
+    is_completed = Task.status == "completed"
+    task_row = db.query(
+        func.count(),
+        func.count().filter(is_completed),
+        func.count().filter(is_completed, Task.completed_at >= today),
+        func.count().filter(is_completed, Task.completed_at >= week_ago),
+    ).select_from(Task).filter(Task.user_id == user_id).one()
+    total_tasks, completed_tasks, tasks_completed_today, tasks_completed_week = task_row
+
+    was_completed = is_true(Pomodoro.was_completed)
+    session_row = db.query(
+        func.count(),
+        func.count().filter(was_completed),
+        func.coalesce(func.sum(Pomodoro.focus_duration).filter(was_completed), 0),
+        func.coalesce(func.sum(Pomodoro.focus_duration).filter(was_completed, Pomodoro.completed_at >= today), 0),
+        func.coalesce(func.sum(Pomodoro.focus_duration).filter(was_completed, Pomodoro.completed_at >= week_ago), 0),
+    ).select_from(Pomodoro).filter(Pomodoro.user_id == user_id).one()
+    total_sessions, completed_sessions, total_study_time, today_study_time, week_study_time = session_row
+
+    subject_rows = db.query(Task.subject, func.sum(Task.actual_duration)).filter(
+        Task.user_id == user_id,
+        is_completed,
+        Task.subject.isnot(None),
+        Task.subject != "",
+        Task.actual_duration.isnot(None),
+        Task.actual_duration != 0,
+    ).group_by(Task.subject).order_by(Task.subject).all()
+
+    subject_distribution = [
+        schemas.SubjectDistribution(subject=subject, minutes=minutes)
+        for subject, minutes in subject_rows
+    ]
+
+    current_streak = db.query(models.UserSettings.current_streak).filter(
+        models.UserSettings.user_id == user_id
+    ).scalar()
+
+    return schemas.AnalyticsSummary(
+        total_study_time=total_study_time,
+        today_study_time=today_study_time,
+        week_study_time=week_study_time,
+        tasks_completed_today=tasks_completed_today,
+        tasks_completed_week=tasks_completed_week,
+        current_streak=current_streak or 0,
+        subject_distribution=subject_distribution,
+        completion_rate=_percentage(completed_tasks, total_tasks),
+        focus_efficiency=_percentage(completed_sessions, total_sessions)
+    )
+
+# The daily_stats rollup holds one row per (user, date, subject). Task completions
+# are attributed to their subject ("" when there is none) and pomodoro
+# sessions, which carry no subject, always land in the "" row.
+
+def task_contribution(task):
+    if not task.completed_at:
+        return None
+    return (task.user_id, task.completed_at.date(), task.subject or "", task.actual_duration or 0)
+
+def _add_delta(deltas, key, minutes=0, tasks=0, sessions=0):
+    delta = deltas.setdefault(key, [0, 0, 0])
+    delta[0] += minutes
+    delta[1] += tasks
+    delta[2] += sessions
+
+def _apply_daily_deltas(db: Session, deltas):
+    DailyStats = models.DailyStats
+    deltas = {key: delta for key, delta in deltas.items() if any(delta)}
+    if not deltas:
+        return
+    
+    stmt = insert(DailyStats).values([
+        {
+            "user_id": user_id,
+            "date": day,
+            "subject": subject,
+            "minutes_studied": minutes,
+            "tasks_completed": tasks,
+            "pomodoro_sessions_completed": sessions,
+        }
+        for (user_id, day, subject), (minutes, tasks, sessions) in deltas.items()
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DailyStats.user_id, DailyStats.date, DailyStats.subject],
+        set_={
+            "minutes_studied": DailyStats.minutes_studied + stmt.excluded.minutes_studied,
+            "tasks_completed": DailyStats.tasks_completed + stmt.excluded.tasks_completed,
+            "pomodoro_sessions_completed": DailyStats.pomodoro_sessions_completed + stmt.excluded.pomodoro_sessions_completed,
+        },
+    )
+    db.execute(stmt)
+    
+    shrunk = [key for key, (_, tasks, sessions) in deltas.items() if tasks < 0 or sessions < 0]
+    if shrunk:
+        db.query(DailyStats).filter(
+            tuple_(DailyStats.user_id, DailyStats.date, DailyStats.subject).in_(shrunk),
+            DailyStats.tasks_completed <= 0,
+            DailyStats.pomodoro_sessions_completed <= 0,
+        ).delete(synchronize_session=False)
+
+def record_task_changes(db: Session, changes):
+    deltas = {}
+    for before, after in changes:
+        if before == after:
+            continue
+        if before:
+            user_id, day, subject, minutes = before
+            _add_delta(deltas, (user_id, day, subject), minutes=-minutes, tasks=-1)
+        if after:
+            user_id, day, subject, minutes = after
+            _add_delta(deltas, (user_id, day, subject), minutes=minutes, tasks=1)
+    _apply_daily_deltas(db, deltas)
+
+def record_task_change(db: Session, before, after):
+    record_task_changes(db, [(before, after)])
+
+def record_session(db: Session, session):
+    if session.was_completed and session.completed_at:
+        deltas = {}
+        _add_delta(deltas, (session.user_id, session.completed_at.date(), ""), minutes=session.focus_duration, sessions=1)
+        _apply_daily_deltas(db, deltas)
+
+def rebuild_daily_stats(db: Session, user_id: Optional[str] = None, user_ids: Optional[Collection[str]] = None):
+    # Rebuilds one user's rows, several users' (user_ids), or (neither) the
+    # whole table, in the caller's transaction.
+    Task = models.Task
+    Pomodoro = models.PomodoroSession
+    DailyStats = models.DailyStats
+    
+    tasks = select(
+        Task.user_id.label("user_id"),
+        func.date(Task.completed_at).label("date"),
+        func.coalesce(Task.subject, "").label("subject"),
+        func.coalesce(Task.actual_duration, 0).label("minutes"),
+        literal(1).label("tasks"),
+        literal(0).label("sessions"),
+    ).where(Task.completed_at.isnot(None))
+    sessions = select(
+        Pomodoro.user_id,
+        func.date(Pomodoro.completed_at),
+        literal(""),
+        Pomodoro.focus_duration,
+        literal(0),
+        literal(1),
+    ).where(is_true(Pomodoro.was_completed), Pomodoro.completed_at.isnot(None))
+    existing = db.query(DailyStats)
+    if user_id is not None:
+        tasks = tasks.where(Task.user_id == user_id)
+        sessions = sessions.where(Pomodoro.user_id == user_id)
+        existing = existing.filter(DailyStats.user_id == user_id)
+    if user_ids is not None:
+        tasks = tasks.where(Task.user_id.in_(user_ids))
+        sessions = sessions.where(Pomodoro.user_id.in_(user_ids))
+        existing = existing.filter(DailyStats.user_id.in_(user_ids))
+    contributions = union_all(tasks, sessions).subquery()
+    
+    rollup = select(
+        contributions.c.user_id,
+        contributions.c.date,
+        contributions.c.subject,
+        func.sum(contributions.c.minutes),
+        func.sum(contributions.c.tasks),
+        func.sum(contributions.c.sessions),
+    ).group_by(contributions.c.user_id, contributions.c.date, contributions.c.subject)
+    
+    existing.delete(synchronize_session=False)
+    db.execute(insert(DailyStats).from_select(
+        ["user_id", "date", "subject", "minutes_studied", "tasks_completed", "pomodoro_sessions_completed"],
+        rollup,
+    ))
+
+def get_daily_stats(db: Session, user_id: str, date_from: Optional[date] = None, date_to: Optional[date] = None):
+    DailyStats = models.DailyStats
+    query = db.query(DailyStats).filter(DailyStats.user_id == user_id)
+    if date_from is not None:
+        query = query.filter(DailyStats.date >= date_from)
+    if date_to is not None:
+        query = query.filter(DailyStats.date <= date_to)
+    
+    stats_map = {}
+    for row in query.order_by(DailyStats.date, DailyStats.subject):
+        day = row.date.strftime("%Y-%m-%d")
+        if day not in stats_map:
+            stats_map[day] = schemas.DailyStats(
+                date=day,
+                total_minutes_studied=0,
+                tasks_completed=0,
+                pomodoro_sessions_completed=0,
+                subject_breakdown={}
+            )
+        stats = stats_map[day]
+        stats.total_minutes_studied += row.minutes_studied
+        stats.tasks_completed += row.tasks_completed
+        stats.pomodoro_sessions_completed += row.pomodoro_sessions_completed
+        if row.subject and row.minutes_studied:
+            stats.subject_breakdown[row.subject] = row.minutes_studied
+    
+    return list(stats_map.values())
+
+if __name__ == "__main__":
+    from api.database import SessionLocal
+    
+    db = SessionLocal()
+    try:
+        rebuild_daily_stats(db)
+        db.commit()
+    finally:
+        db.close()
+    print("Daily stats rebuilt successfully!")
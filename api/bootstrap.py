@@ -0,0 +1,239 @@
+import fcntl
+import os
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import func, inspect, select, text
+from api import database, models, analytics, subjects
+from api.migrate import migrations_dir, run_migrations
+from api.users import DEFAULT_USER_ID
+
+# Run the bootstrap from each worker's lifespan. Deployments that run
+# `python -m api.bootstrap` once per release can turn this off.
+BOOTSTRAP_ON_STARTUP = os.getenv("BOOTSTRAP_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+# Seeds the sample data for the default user; on in development.
+SEED_SAMPLE_DATA = os.getenv("SEED_SAMPLE_DATA", str(os.getenv("NODE_ENV", "development") == "development")).lower() in ("1", "true", "yes")
+
+# pg_advisory_lock key held while the schema is created, migrated and
+# seeded, so workers starting together do the work once. SQLite has no
+# advisory locks; workers sharing a database file lock a file next to it.
+BOOTSTRAP_LOCK_KEY = 0x5354554459464C57
+
+def pending_migrations(connection) -> list:
+    versions = sorted(
+        os.path.splitext(filename)[0]
+        for filename in os.listdir(migrations_dir(connection.dialect.name))
+        if filename.endswith(".sql")
+    )
+    if not inspect(connection).has_table("schema_migrations"):
+        return versions
+    applied = set(connection.execute(text("SELECT version FROM schema_migrations")).scalars())
+    return [version for version in versions if version not in applied]
+
+def needs_seed(connection) -> bool:
+    return connection.execute(
+        select(models.Task.id).where(models.Task.user_id == DEFAULT_USER_ID).limit(1)
+    ).first() is None
+
+def seed_database():
+    db = database.SessionLocal()
+    try:
+        existing_tasks = db.query(models.Task).filter(models.Task.user_id == DEFAULT_USER_ID).first()
+        if existing_tasks:
+            return
+        
+        sample_tasks = [
+            models.Task(
+                id=str(uuid.uuid4()),
+                user_id=DEFAULT_USER_ID,
+                title="Revise Chapter 5: Thermodynamics",
+                description="Complete all formulas and solve practice problems",
+                status="pending",
+                priority="critical",
+                subject="Physics",
+                deadline=datetime.now() + timedelta(days=2),
+                estimated_duration=120,
+                resources=["https://example.com/physics-chapter5.pdf"],
+                created_at=datetime.now()
+            ),
+            models.Task(
+                id=str(uuid.uuid4()),
+                user_id=DEFAULT_USER_ID,
+                title="Practice Calculus Problems",
+                description="Solve integration and differentiation exercises",
+                status="in_progress",
+                priority="important",
+                subject="Math",
+                deadline=datetime.now() + timedelta(days=1),
+                estimated_duration=90,
+                created_at=datetime.now()
+            ),
+            models.Task(
+                id=str(uuid.uuid4()),
+                user_id=DEFAULT_USER_ID,
+                title="Read History Chapter 12",
+                description="World War II and its aftermath",
+                status="pending",
+                priority="optional",
+                subject="History",
+                deadline=datetime.now() + timedelta(days=3),
+                estimated_duration=60,
+                created_at=datetime.now()
+            ),
+            models.Task(
+                id=str(uuid.uuid4()),
+                user_id=DEFAULT_USER_ID,
+                title="Chemistry Lab Report",
+                description="Write up the titration experiment results",
+                status="completed",
+                priority="important",
+                subject="Chemistry",
+                completed_at=datetime.now(),
+                actual_duration=75,
+                created_at=datetime.now()
+            ),
+        ]
+        
+        for task in sample_tasks:
+            db.add(task)
+        
+        sample_goals = [
+            models.Goal(
+                id=str(uuid.uuid4()),
+                user_id=DEFAULT_USER_ID,
+                title="Complete 3 Physics chapters",
+                description="Finish chapters 5, 6, and 7 before the exam",
+                type="weekly",
+                target_date=datetime.now() + timedelta(days=7),
+                status="active",
+                progress=33,
+                created_at=datetime.now()
+            ),
+            models.Goal(
+                id=str(uuid.uuid4()),
+                user_id=DEFAULT_USER_ID,
+                title="Study 2 hours daily",
+                description="Maintain consistent study schedule",
+                type="daily",
+                target_date=datetime.now(),
+                status="active",
+                progress=50,
+                created_at=datetime.now()
+            ),
+            models.Goal(
+                id=str(uuid.uuid4()),
+                user_id=DEFAULT_USER_ID,
+                title="Finish entire Math syllabus",
+                description="Complete all topics before final exam",
+                type="monthly",
+                target_date=datetime.now() + timedelta(days=30),
+                status="active",
+                progress=60,
+                created_at=datetime.now()
+            ),
+        ]
+        
+        for goal in sample_goals:
+            db.add(goal)
+        
+        first_task_id = sample_tasks[0].id
+        for i in range(5):
+            session = models.PomodoroSession(
+                id=str(uuid.uuid4()),
+                user_id=DEFAULT_USER_ID,
+                task_id=first_task_id,
+                focus_duration=25,
+                break_duration=5,
+                was_completed=True,
+                completed_at=datetime.now() - timedelta(hours=i),
+                created_at=datetime.now() - timedelta(hours=i)
+            )
+            db.add(session)
+        
+        # Settings survive a reset, and there is one row per user.
+        existing_settings = db.query(models.UserSettings).filter(models.UserSettings.user_id == DEFAULT_USER_ID).first()
+        if not existing_settings:
+            settings = models.UserSettings(
+                id=str(uuid.uuid4()),
+                user_id=DEFAULT_USER_ID,
+                pomodoro_focus_duration=25,
+                pomodoro_break_duration=5,
+                theme="dark",
+                notifications_enabled=True,
+                sound_enabled=True,
+                current_streak=3,
+                longest_streak=5,
+                last_study_date=datetime.now(),
+                updated_at=datetime.now()
+            )
+            db.add(settings)
+            db.flush()
+            subjects.replace_subjects(db, DEFAULT_USER_ID)
+        
+        db.commit()
+        analytics.rebuild_daily_stats(db)
+        db.commit()
+    finally:
+        db.close()
+
+@contextmanager
+def bootstrap_lock(connection):
+    if connection.dialect.name == "postgresql":
+        connection.execute(select(func.pg_advisory_lock(BOOTSTRAP_LOCK_KEY)))
+        connection.commit()
+        try:
+            yield
+        finally:
+            connection.rollback()
+            connection.execute(select(func.pg_advisory_unlock(BOOTSTRAP_LOCK_KEY)))
+            connection.commit()
+        return
+
+    # An in-memory SQLite database belongs to one process.
+    path = connection.engine.url.database
+    if not path or path == ":memory:" or "mode=memory" in path:
+        yield
+        return
+    with open(f"{path}.bootstrap-lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def bootstrap(bind=None, seed: bool = SEED_SAMPLE_DATA) -> bool:
+    # Creates and migrates the schema and seeds the sample data, if any of it
+    # is still to do. An up-to-date database costs one or two queries and no
+    # lock; otherwise the first worker does the work under the bootstrap lock
+    # and the others wait for it, then find nothing left. Returns whether
+    # anything was done.
+    bind = bind if bind is not None else database.engine
+    with bind.connect() as connection:
+        if not pending_migrations(connection) and not (seed and needs_seed(connection)):
+            return False
+        connection.commit()
+        with bootstrap_lock(connection):
+            # Checked again: another worker may have finished while this one
+            # waited for the lock. The advisory lock belongs to this
+            # connection's session, so the work runs on other pooled
+            # connections, and the check's transaction is ended first so its
+            # table locks cannot block the migrations.
+            migrate = bool(pending_migrations(connection))
+            connection.commit()
+            if migrate:
+                models.Base.metadata.create_all(bind=bind)
+                run_migrations(bind)
+            seed = seed and needs_seed(connection)
+            if seed:
+                seed_database()
+            return migrate or seed
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Create, migrate and seed the database once per deployment")
+    parser.add_argument("--seed", action=argparse.BooleanOptionalAction, default=SEED_SAMPLE_DATA, help="seed the sample data")
+    args = parser.parse_args()
+
+    bootstrap(seed=args.seed)
+    print("Database bootstrapped successfully!")
@@ -0,0 +1,115 @@
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+from fastapi.encoders import jsonable_encoder
+
+try:
+    import redis.asyncio as redis
+except ImportError:
+    redis = None
+
+CACHE_URL = os.getenv("CACHE_URL")
+ANALYTICS_CACHE_TTL = float(os.getenv("ANALYTICS_CACHE_TTL", "60"))
+ANALYTICS_CACHE_SIZE = int(os.getenv("ANALYTICS_CACHE_SIZE", "256"))
+
+class CacheBackend:
+    # Values are JSON-compatible structures so any shared store can hold them.
+    async def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: Any, ttl: float):
+        raise NotImplementedError
+
+    async def get_counter(self, key: str) -> int:
+        raise NotImplementedError
+
+    async def incr(self, key: str) -> int:
+        raise NotImplementedError
+
+class MemoryCacheBackend(CacheBackend):
+    def __init__(self, maxsize: int = ANALYTICS_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        # Counters live outside the LRU so a generation is never evicted.
+        self.counters = {}
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: float):
+        self.entries[key] = (time.monotonic() + ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    async def get_counter(self, key: str) -> int:
+        return self.counters.get(key, 0)
+
+    async def incr(self, key: str) -> int:
+        self.counters[key] = self.counters.get(key, 0) + 1
+        return self.counters[key]
+
+class RedisCacheBackend(CacheBackend):
+    def __init__(self, url: str):
+        self.client = redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self.client.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Any, ttl: float):
+        await self.client.set(key, json.dumps(value), px=int(ttl * 1000))
+
+    async def get_counter(self, key: str) -> int:
+        raw = await self.client.get(key)
+        return int(raw) if raw is not None else 0
+
+    async def incr(self, key: str) -> int:
+        return await self.client.incr(key)
+
+def create_backend(url: Optional[str] = CACHE_URL) -> CacheBackend:
+    if url and url.startswith(("redis://", "rediss://")):
+        if redis is None:
+            raise RuntimeError("CACHE_URL points at Redis but the redis package is not installed")
+        return RedisCacheBackend(url)
+    return MemoryCacheBackend()
+
+class ResultCache:
+    # Entries are keyed by a generation counter per scope (one scope per
+    # user); invalidate() bumps the scope's generation, which orphans all of
+    # its cached results at once (across workers too, when the backend is
+    # shared) and lets the TTL clean them up. Other scopes are untouched.
+    def __init__(self, namespace: str, backend: CacheBackend, ttl: float = ANALYTICS_CACHE_TTL):
+        self.namespace = namespace
+        self.backend = backend
+        self.ttl = ttl
+
+    def generation_key(self, scope: str) -> str:
+        return f"{self.namespace}:{scope}:generation"
+
+    async def get_or_compute(self, scope: str, key: str, compute):
+        if self.ttl <= 0:
+            return jsonable_encoder(await compute())
+
+        generation = await self.backend.get_counter(self.generation_key(scope))
+        full_key = f"{self.namespace}:{scope}:{generation}:{key}"
+        value = await self.backend.get(full_key)
+        if value is None:
+            value = jsonable_encoder(await compute())
+            await self.backend.set(full_key, value, self.ttl)
+        return value
+
+    async def invalidate(self, scope: str):
+        await self.backend.incr(self.generation_key(scope))
+
+analytics_cache = ResultCache("analytics", create_backend())
@@ -1,28 +1,149 @@
+import importlib.util
 import os
-from sqlalchemy import create_engine
+from functools import lru_cache
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
+from api import metrics
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://localhost/defaultdb")
+# "postgresql", or "sqlite" for an embedded database file
+# (sqlite:///studyflow.db) or an in-memory one (sqlite://).
+DB_BACKEND = make_url(DATABASE_URL).get_backend_name()
+IS_SQLITE = DB_BACKEND == "sqlite"
 
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,
-    pool_recycle=300,
-    connect_args={
-        "connect_timeout": 10,
+# Async driver used by the route handlers: "asyncpg" or "psycopg" (psycopg 3).
+DB_ASYNC_DRIVER = os.getenv("DB_ASYNC_DRIVER", "asyncpg")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "300"))
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "10"))
+# Milliseconds; 0 leaves the server default (no timeout) in place.
+DB_STATEMENT_TIMEOUT = int(os.getenv("DB_STATEMENT_TIMEOUT", "0"))
+# SQLite only: milliseconds a writer waits for another one to commit.
+SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))
+
+# Set on every SQLite connection. WAL lets readers run alongside the single
+# writer; with it, synchronous=NORMAL stays crash-safe and only skips the
+# fsync per commit (a power loss can drop the last commits). SQLite leaves
+# foreign keys unenforced unless asked, and the relation tables rely on their
+# ON DELETE CASCADE.
+SQLITE_PRAGMAS = {
+    "foreign_keys": "ON",
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": SQLITE_BUSY_TIMEOUT,
+    "temp_store": "MEMORY",
+    "cache_size": -64000,
+    "mmap_size": 256 * 1024 * 1024,
+}
+
+pool_options = {
+    "pool_pre_ping": True,
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,
+}
+
+def sqlite_database_url(url: str):
+    # An in-memory database is private to its connection; a named one in
+    # shared-cache mode is seen by every connection of both engines, and
+    # lives as long as one of them stays open.
+    parsed = make_url(url)
+    if parsed.database in (None, "", ":memory:"):
+        parsed = parsed.set(database="file:studyflow?mode=memory&cache=shared", query={"uri": "true"})
+    return parsed
+
+def async_database_url(url: str, driver: str = DB_ASYNC_DRIVER):
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite":
+        return sqlite_database_url(url).set(drivername="sqlite+aiosqlite")
+    if parsed.drivername in ("postgres", "postgresql") or parsed.drivername.startswith("postgresql+"):
+        parsed = parsed.set(drivername=f"postgresql+{driver}")
+        # asyncpg does not understand libpq's sslmode parameter.
+        if driver == "asyncpg" and "sslmode" in parsed.query:
+            query = dict(parsed.query)
+            query["ssl"] = query.pop("sslmode")
+            parsed = parsed.set(query=query)
+    return parsed
+
+def sync_connect_args():
+    connect_args = {"connect_timeout": DB_CONNECT_TIMEOUT}
+    if DB_STATEMENT_TIMEOUT:
+        connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT}"
+    return connect_args
+
+def async_connect_args(driver: str = DB_ASYNC_DRIVER):
+    if driver == "asyncpg":
+        connect_args = {"timeout": DB_CONNECT_TIMEOUT}
+        if DB_STATEMENT_TIMEOUT:
+            connect_args["server_settings"] = {"statement_timeout": str(DB_STATEMENT_TIMEOUT)}
+        return connect_args
+    return sync_connect_args()
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name} = {value}")
+    cursor.close()
+
+def _sqlite_engines():
+    if importlib.util.find_spec("aiosqlite") is None:
+        raise RuntimeError("The SQLite backend needs aiosqlite: pip install -e '.[sqlite]'")
+    engine = create_engine(sqlite_database_url(DATABASE_URL), pool_pre_ping=True)
+    async_engine = create_async_engine(async_database_url(DATABASE_URL), pool_pre_ping=True)
+    for sync_engine in (engine, async_engine.sync_engine):
+        event.listen(sync_engine, "connect", set_sqlite_pragmas)
+    return engine, async_engine
+
+@lru_cache(maxsize=None)
+def _engines():
+    if IS_SQLITE:
+        engine, async_engine = _sqlite_engines()
+    else:
+        engine = create_engine(
+            DATABASE_URL,
+            connect_args=sync_connect_args(),
+            **pool_options,
+        )
+        async_engine = create_async_engine(
+            async_database_url(DATABASE_URL),
+            connect_args=async_connect_args(),
+            **pool_options,
+        )
+    if metrics.METRICS_ENABLED:
+        metrics.instrument({"sync": engine, "async": async_engine.sync_engine})
+    return {
+        "engine": engine,
+        "SessionLocal": sessionmaker(autocommit=False, autoflush=False, bind=engine),
+        "async_engine": async_engine,
+        "AsyncSessionLocal": async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False),
     }
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def __getattr__(name):
+    # engine, SessionLocal, async_engine and AsyncSessionLocal are created on
+    # first use, so importing the app loads no driver and opens nothing.
+    try:
+        return _engines()[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
 
 Base = declarative_base()
 
 def get_db():
-    db = SessionLocal()
+    db = _engines()["SessionLocal"]()
     try:
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with _engines()["AsyncSessionLocal"]() as db:
+        yield db
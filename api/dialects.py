@@ -0,0 +1,174 @@
+from sqlalchemy import ARRAY, JSON, Text, literal_column
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.types import Date, DateTime
+
+# The SQL that differs between the PostgreSQL and the SQLite backend: the
+# types and constructs below compile per dialect. Upserts need nothing here:
+# the postgresql insert() with ON CONFLICT also compiles for SQLite.
+
+# Arrays of text; SQLite stores them as JSON arrays.
+TextArray = ARRAY(Text).with_variant(JSON(), "sqlite")
+# Full-text documents exist on PostgreSQL only; SQLite searches through the
+# in-process search index instead (SEARCH_ENGINE=sqlite).
+SearchVector = TSVECTOR().with_variant(Text(), "sqlite")
+
+class array_of(FunctionElement):
+    # The values of a one-column subquery, labelled "item", as a TextArray
+    # in the subquery's order; empty rather than NULL when it has no rows.
+    type = TextArray
+    inherit_cache = True
+    name = "array_of"
+
+@compiles(array_of)
+def _compile_array_of(element, compiler, **kw):
+    return f"ARRAY{compiler.process(element.clauses, **kw)}"
+
+@compiles(array_of, "sqlite")
+def _compile_array_of_sqlite(element, compiler, **kw):
+    # json_group_array() takes no ORDER BY before SQLite 3.44; it keeps the
+    # order of the ordered subquery it reads from.
+    return f"(SELECT json_group_array(item) FROM {compiler.process(element.clauses, **kw)})"
+
+class localnow(FunctionElement):
+    # Local wall-clock time, like PostgreSQL's now() in a timestamp column.
+    type = DateTime()
+    inherit_cache = True
+    name = "localnow"
+
+@compiles(localnow)
+def _compile_localnow(element, compiler, **kw):
+    return "now()"
+
+@compiles(localnow, "sqlite")
+def _compile_localnow_sqlite(element, compiler, **kw):
+    return "(strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'))"
+
+class utcnow(FunctionElement):
+    type = DateTime()
+    inherit_cache = True
+    name = "utcnow"
+
+@compiles(utcnow)
+def _compile_utcnow(element, compiler, **kw):
+    return "(now() AT TIME ZONE 'UTC')"
+
+@compiles(utcnow, "sqlite")
+def _compile_utcnow_sqlite(element, compiler, **kw):
+    return "(strftime('%Y-%m-%d %H:%M:%f', 'now'))"
+
+# The first day of the day, ISO week (from Monday) or month a timestamp
+# falls in, for grouping rows into time buckets.
+BUCKET_UNITS = ("day", "week", "month")
+SQLITE_BUCKET_MODIFIERS = {"day": "", "week": ", 'weekday 0', '-6 days'", "month": ", 'start of month'"}
+
+class date_bucket(FunctionElement):
+    type = Date()
+    inherit_cache = True
+    name = "date_bucket"
+
+    def __init__(self, unit: str, value):
+        if unit not in BUCKET_UNITS:
+            raise ValueError(f"Unknown bucket unit: {unit}")
+        # The unit is a clause too, so statements for different units do not
+        # share a compiled cache entry.
+        super().__init__(literal_column(f"'{unit}'"), value)
+
+@compiles(date_bucket)
+def _compile_date_bucket(element, compiler, **kw):
+    return f"CAST(date_trunc({compiler.process(element.clauses, **kw)}) AS date)"
+
+@compiles(date_bucket, "sqlite")
+def _compile_date_bucket_sqlite(element, compiler, **kw):
+    unit, value = element.clauses
+    modifiers = SQLITE_BUCKET_MODIFIERS[unit.name.strip("'")]
+    return f"date({compiler.process(value, **kw)}{modifiers})"
+
+class is_true(FunctionElement):
+    # A boolean column as a condition, written the way the partial indexes
+    # on it are: PostgreSQL cannot match "IS true" to a "WHERE column" index,
+    # and SQLite only matches a term that appears in the index as written.
+    inherit_cache = True
+    name = "is_true"
+
+@compiles(is_true)
+def _compile_is_true(element, compiler, **kw):
+    return compiler.process(element.clauses, **kw)
+
+@compiles(is_true, "sqlite")
+def _compile_is_true_sqlite(element, compiler, **kw):
+    return f"({compiler.process(element.clauses, **kw)} IS 1)"
+
+class greatest(FunctionElement):
+    inherit_cache = True
+    name = "greatest"
+
+@compiles(greatest)
+def _compile_greatest(element, compiler, **kw):
+    return f"greatest({compiler.process(element.clauses, **kw)})"
+
+@compiles(greatest, "sqlite")
+def _compile_greatest_sqlite(element, compiler, **kw):
+    # SQLite's max() with several arguments is the scalar maximum.
+    return f"max({compiler.process(element.clauses, **kw)})"
+
+class search_document(FunctionElement):
+    # The generated search_vector expression; NULL where there is no tsvector.
+    inherit_cache = True
+    name = "search_document"
+
+    def __init__(self, sql: str):
+        self.sql = sql
+        super().__init__()
+
+@compiles(search_document)
+def _compile_search_document(element, compiler, **kw):
+    return element.sql
+
+@compiles(search_document, "sqlite")
+def _compile_search_document_sqlite(element, compiler, **kw):
+    return "NULL"
+
+# Paths of ids for recursive walks (task_tree): a text[] on PostgreSQL, a
+# "/id/id/" string on SQLite. Ids never contain "/".
+class id_path(FunctionElement):
+    type = ARRAY(Text)
+    inherit_cache = True
+    name = "id_path"
+
+@compiles(id_path)
+def _compile_id_path(element, compiler, **kw):
+    return f"ARRAY[{compiler.process(element.clauses, **kw)}]"
+
+@compiles(id_path, "sqlite")
+def _compile_id_path_sqlite(element, compiler, **kw):
+    return f"('/' || {compiler.process(element.clauses, **kw)} || '/')"
+
+class path_append(FunctionElement):
+    type = ARRAY(Text)
+    inherit_cache = True
+    name = "path_append"
+
+@compiles(path_append)
+def _compile_path_append(element, compiler, **kw):
+    return f"array_append({compiler.process(element.clauses, **kw)})"
+
+@compiles(path_append, "sqlite")
+def _compile_path_append_sqlite(element, compiler, **kw):
+    path, value = element.clauses
+    return f"({compiler.process(path, **kw)} || {compiler.process(value, **kw)} || '/')"
+
+class path_contains(FunctionElement):
+    inherit_cache = True
+    name = "path_contains"
+
+@compiles(path_contains)
+def _compile_path_contains(element, compiler, **kw):
+    path, value = element.clauses
+    return f"({compiler.process(value, **kw)} = ANY({compiler.process(path, **kw)}))"
+
+@compiles(path_contains, "sqlite")
+def _compile_path_contains_sqlite(element, compiler, **kw):
+    path, value = element.clauses
+    return f"(instr({compiler.process(path, **kw)}, '/' || {compiler.process(value, **kw)} || '/') > 0)"
@@ -0,0 +1,76 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+from fastapi import Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from api import models
+from api.dialects import utcnow
+from api.users import USER_ID_HEADER
+
+async def table_version(db: AsyncSession, model, user_id: str):
+    # The version, when it last changed and the current time, all on the
+    # database's clock.
+    row = (await db.execute(
+        select(models.TableVersion.version, models.TableVersion.updated_at, utcnow().label("now"))
+        .where(models.TableVersion.table_name == model.__tablename__, models.TableVersion.user_id == user_id)
+    )).first()
+    if row is None:
+        return 0, None, None
+    return row.version, row.updated_at, row.now
+
+def make_etag(model, user_id: str, version: int, request: Request) -> str:
+    # The path (e.g. which task's tree), filters and pagination change the
+    # body, so they are part of the tag; so is the user, whose versions are
+    # counted independently.
+    digest = hashlib.sha1(f"{user_id}:{version}:{request.url.path}?{request.url.query}".encode()).hexdigest()[:16]
+    return f'W/"{model.__tablename__}-{version}-{digest}"'
+
+def _strip_weak(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    return _strip_weak(etag) in [_strip_weak(tag) for tag in header.split(",")]
+
+def _last_modified(updated_at: Optional[datetime], now: Optional[datetime]) -> Optional[datetime]:
+    # HTTP dates count whole seconds, so Last-Modified only validates once
+    # its second is over: until then another write could land in the same
+    # second and be answered with a 304. Clients revalidate by ETag meanwhile.
+    if updated_at is None or updated_at >= now.replace(microsecond=0):
+        return None
+    return updated_at.replace(microsecond=0)
+
+def _not_modified_since(header: str, last_modified: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return last_modified <= since
+
+async def not_modified(request: Request, response: Response, db: AsyncSession, model, user_id: str) -> Optional[Response]:
+    version, updated_at, now = await table_version(db, model, user_id)
+    last_modified = _last_modified(updated_at, now)
+    headers = {"ETag": make_etag(model, user_id, version, request), "Cache-Control": "no-cache", "Vary": USER_ID_HEADER}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified.replace(tzinfo=timezone.utc), usegmt=True)
+
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_none_match is not None:
+        unchanged = _etag_matches(if_none_match, headers["ETag"])
+    elif if_modified_since is not None and last_modified is not None:
+        unchanged = _not_modified_since(if_modified_since, last_modified)
+    else:
+        unchanged = False
+
+    if unchanged:
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,247 @@
+import asyncio
+import itertools
+import logging
+import os
+from collections import defaultdict
+from typing import List, Optional
+import orjson
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+from api.database import IS_SQLITE
+
+logger = logging.getLogger(__name__)
+
+# "postgres" delivers events to every worker through LISTEN/NOTIFY;
+# "memory" only reaches connections served by the publishing process, and
+# is the default on SQLite.
+EVENTS_TRANSPORT = os.getenv("EVENTS_TRANSPORT", "memory" if IS_SQLITE else "postgres")
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+EVENTS_HEARTBEAT = float(os.getenv("EVENTS_HEARTBEAT", "15"))
+EVENTS_CHANNEL = "studyflow_events"
+
+# NOTIFY payloads are limited to 8000 bytes; larger changes are announced
+# without ids and clients refetch the whole resource.
+MAX_EVENT_IDS = 100
+
+# Sent instead of the dropped backlog when a connection falls behind, and to
+# every connection when the listener had to reconnect.
+RESYNC = {"type": "resync"}
+
+PENDING_EVENTS = "pending_events"
+
+# Event type prefixes for the export/import resource names.
+RESOURCE_NAMES = {"tasks": "task", "goals": "goal", "pomodoro-sessions": "pomodoro-session"}
+
+def publish(db, user_id: str, event_type: str, ids: Optional[List[str]] = None):
+    # Queues a change event on the session; it is sent when the session's
+    # transaction commits and dropped if it rolls back. Takes a sync Session
+    # or an AsyncSession.
+    session = getattr(db, "sync_session", db)
+    if ids is not None and len(ids) > MAX_EVENT_IDS:
+        ids = None
+    session.info.setdefault(PENDING_EVENTS, []).append({"type": event_type, "userId": user_id, "ids": ids})
+
+class Subscription:
+    def __init__(self, maxsize: int):
+        self.queue = asyncio.Queue(maxsize)
+
+    def put(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # A slow connection loses its backlog rather than making the
+            # broker buffer without bound; the resync tells it to refetch.
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+class EventBroker:
+    # Fans events out to this process's open connections, per user. Each
+    # connection has its own bounded queue, so one slow reader never delays
+    # the others.
+    def __init__(self, queue_size: int = EVENTS_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.subscribers = defaultdict(set)
+        self.loop = None
+
+    def start(self):
+        self.loop = asyncio.get_running_loop()
+
+    def subscribe(self, user_id: str) -> Subscription:
+        subscription = Subscription(self.queue_size)
+        self.subscribers[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, user_id: str, subscription: Subscription):
+        subscribers = self.subscribers.get(user_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self.subscribers[user_id]
+
+    def _deliver(self, item):
+        for subscription in list(self.subscribers.get(item["userId"], ())):
+            subscription.put(item)
+
+    def _resync(self):
+        for subscribers in list(self.subscribers.values()):
+            for subscription in list(subscribers):
+                subscription.put(RESYNC)
+
+    def _call(self, fn, *args):
+        # Commits also happen in worker threads (run_in_threadpool); asyncio
+        # queues may only be touched from the loop's own thread.
+        if self.loop is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            fn(*args)
+        else:
+            self.loop.call_soon_threadsafe(fn, *args)
+
+    def dispatch(self, item: dict):
+        self._call(self._deliver, item)
+
+    def resync(self):
+        self._call(self._resync)
+
+class MemoryTransport:
+    def send(self, session: Session, pending):
+        pass
+
+    def committed(self, broker: EventBroker, pending):
+        for item in pending:
+            broker.dispatch(item)
+
+    async def start(self, broker: EventBroker):
+        pass
+
+    async def stop(self):
+        pass
+
+class PostgresTransport:
+    # Events are NOTIFYed inside the writing transaction, so PostgreSQL
+    # delivers them only once it commits. Every worker, the sender included,
+    # LISTENs on one dedicated connection and feeds its broker from there.
+    RECONNECT_DELAY = 5
+
+    def __init__(self):
+        self.task = None
+
+    def send(self, session: Session, pending):
+        for item in pending:
+            session.execute(select(func.pg_notify(EVENTS_CHANNEL, orjson.dumps(item).decode())))
+
+    def committed(self, broker: EventBroker, pending):
+        pass
+
+    async def _connect(self):
+        import asyncpg
+        from api.database import DATABASE_URL, DB_CONNECT_TIMEOUT, async_database_url
+
+        url = async_database_url(DATABASE_URL, "asyncpg")
+        return await asyncpg.connect(
+            **url.translate_connect_args(username="user"),
+            **dict(url.query),
+            timeout=DB_CONNECT_TIMEOUT,
+        )
+
+    async def _listen(self, broker: EventBroker):
+        def received(connection, pid, channel, payload):
+            try:
+                broker.dispatch(orjson.loads(payload))
+            except ValueError:
+                logger.warning("Ignoring malformed event payload")
+
+        connected_before = False
+        while True:
+            connection = None
+            try:
+                connection = await self._connect()
+                await connection.add_listener(EVENTS_CHANNEL, received)
+                if connected_before:
+                    # Events sent while disconnected are lost.
+                    broker.resync()
+                connected_before = True
+                while not connection.is_closed():
+                    await asyncio.sleep(self.RECONNECT_DELAY)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Event listener connection failed")
+            finally:
+                if connection is not None:
+                    connection.terminate()
+            await asyncio.sleep(self.RECONNECT_DELAY)
+
+    async def start(self, broker: EventBroker):
+        self.task = asyncio.create_task(self._listen(broker))
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+def create_transport(name: str = EVENTS_TRANSPORT):
+    if name == "memory":
+        return MemoryTransport()
+    if name == "postgres":
+        return PostgresTransport()
+    raise RuntimeError(f"Unknown EVENTS_TRANSPORT {name!r}; expected 'postgres' or 'memory'")
+
+broker = EventBroker()
+transport = create_transport()
+
+@event.listens_for(Session, "before_commit")
+def _send_pending(session):
+    pending = session.info.get(PENDING_EVENTS)
+    if pending:
+        transport.send(session, pending)
+
+@event.listens_for(Session, "after_commit")
+def _committed(session):
+    pending = session.info.pop(PENDING_EVENTS, None)
+    if pending:
+        transport.committed(broker, pending)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(PENDING_EVENTS, None)
+
+async def start():
+    broker.start()
+    await transport.start(broker)
+
+async def stop():
+    await transport.stop()
+
+def format_event(item: dict, event_id: int) -> bytes:
+    data = {"type": item["type"]}
+    if "ids" in item:
+        data["ids"] = item["ids"]
+    return b"id: %d\nevent: %s\ndata: %s\n\n" % (event_id, item["type"].encode(), orjson.dumps(data))
+
+async def stream(user_id: str, heartbeat: float = EVENTS_HEARTBEAT):
+    # Server-sent events for one connection. There is no replay: a client
+    # that (re)connects should refetch, and comment lines keep idle
+    # connections from being closed by proxies.
+    subscription = broker.subscribe(user_id)
+    event_ids = itertools.count(1)
+    try:
+        yield b"retry: 3000\n\n"
+        while True:
+            try:
+                item = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield b": keep-alive\n\n"
+                continue
+            yield format_event(item, next(event_ids))
+    finally:
+        broker.unsubscribe(user_id, subscription)
@@ -0,0 +1,144 @@
+import csv
+import io
+import json
+from sqlalchemy import ARRAY, Boolean, Date, DateTime, Integer, inspect, select
+from pydantic.alias_generators import to_camel
+from api import database, models, schemas
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+EXPORT_RESOURCES = {
+    "tasks": (models.Task, schemas.Task),
+    "goals": (models.Goal, schemas.Goal),
+    "pomodoro-sessions": (models.PomodoroSession, schemas.PomodoroSession),
+}
+
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+BATCH_SIZE = 1000
+
+def parquet_available() -> bool:
+    return pyarrow is not None
+
+def data_columns(model):
+    # (name, column) pairs for the mapped columns and column properties (a
+    # goal's related task ids). The owner is implied by the request,
+    # generated columns (the search vector) are derived and internal columns
+    # hold scheduler state, so none of them is exported.
+    columns = []
+    for attribute in inspect(model).column_attrs:
+        column = attribute.expression
+        if attribute.key == "user_id" or getattr(column, "computed", None) is not None:
+            continue
+        if getattr(column, "info", {}).get("internal"):
+            continue
+        columns.append((attribute.key, column))
+    return columns
+
+def export_columns(model):
+    return [name for name, _ in data_columns(model)]
+
+async def _stream_batches(resource: str, user_id: str):
+    model, schema = EXPORT_RESOURCES[resource]
+    async with database.AsyncSessionLocal() as db:
+        result = await db.stream_scalars(
+            select(model).where(model.user_id == user_id).execution_options(yield_per=BATCH_SIZE)
+        )
+        async for batch in result.partitions():
+            yield [schema.model_validate(row) for row in batch]
+
+async def stream_ndjson(resource: str, user_id: str):
+    async for batch in _stream_batches(resource, user_id):
+        lines = [item.model_dump_json(by_alias=True) for item in batch]
+        yield ("\n".join(lines) + "\n").encode()
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return json.dumps(value)
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return value
+
+async def stream_csv(resource: str, user_id: str):
+    model, _ = EXPORT_RESOURCES[resource]
+    header = [to_camel(name) for name in export_columns(model)]
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    yield buffer.getvalue().encode()
+
+    async for batch in _stream_batches(resource, user_id):
+        buffer.seek(0)
+        buffer.truncate()
+        for item in batch:
+            row = item.model_dump(mode="json", by_alias=True)
+            writer.writerow([_csv_value(row.get(name)) for name in header])
+        yield buffer.getvalue().encode()
+
+class _ChunkSink(io.RawIOBase):
+    # Write-only file object that hands back whatever pyarrow has written
+    # since the last drain, so Parquet row groups can be streamed out.
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+def _arrow_type(column):
+    if isinstance(column.type, ARRAY):
+        return pyarrow.list_(pyarrow.string())
+    if isinstance(column.type, Boolean):
+        return pyarrow.bool_()
+    if isinstance(column.type, Integer):
+        return pyarrow.int64()
+    if isinstance(column.type, DateTime):
+        return pyarrow.timestamp("us")
+    if isinstance(column.type, Date):
+        return pyarrow.date32()
+    return pyarrow.string()
+
+async def stream_parquet(resource: str, user_id: str):
+    model, _ = EXPORT_RESOURCES[resource]
+    columns = data_columns(model)
+    arrow_schema = pyarrow.schema([(to_camel(name), _arrow_type(column)) for name, column in columns])
+
+    sink = _ChunkSink()
+    writer = pyarrow.parquet.ParquetWriter(sink, arrow_schema)
+    async for batch in _stream_batches(resource, user_id):
+        rows = [item.model_dump(by_alias=True) for item in batch]
+        writer.write_table(pyarrow.Table.from_pylist(rows, schema=arrow_schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+def stream_export(resource: str, export_format: str, user_id: str):
+    if export_format == "csv":
+        return stream_csv(resource, user_id)
+    if export_format == "parquet":
+        return stream_parquet(resource, user_id)
+    return stream_ndjson(resource, user_id)
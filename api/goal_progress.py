@@ -0,0 +1,122 @@
+from typing import Iterable, List, Optional
+from sqlalchemy import bindparam, delete, insert, select, text
+from sqlalchemy.orm import Session
+from api.models import Goal, GoalTask, Task
+
+# Like the analytics helpers these take a sync Session; async route handlers
+# run them through AsyncSession.run_sync inside their own transaction.
+
+# Task fields a goal's progress depends on.
+PROGRESS_FIELDS = {"status", "estimated_duration"}
+
+# A goal's progress is the share of its related tasks' estimated minutes
+# that are completed. Tasks without an estimate count as the goal's average
+# estimate, or as 1 when none of its tasks has one, so a goal of unestimated
+# tasks progresses by task count. Goals without related tasks keep their
+# manually set progress. The 100.0 keeps the division fractional on SQLite,
+# where the weights are integers, so it rounds the same as PostgreSQL.
+RECOMPUTE_PROGRESS = """
+WITH related AS (
+    SELECT goals.id AS goal_id, tasks.status, nullif(tasks.estimated_duration, 0) AS estimate
+    FROM goals
+    JOIN goal_tasks ON goal_tasks.goal_id = goals.id
+    JOIN tasks ON tasks.id = goal_tasks.task_id
+    WHERE {goals_filter}
+),
+weighted AS (
+    SELECT goal_id, status, coalesce(estimate, avg(estimate) OVER (PARTITION BY goal_id), 1) AS weight
+    FROM related
+),
+computed AS (
+    SELECT goal_id, CAST(round(100.0 * coalesce(sum(weight) FILTER (WHERE status = 'completed'), 0) / sum(weight)) AS integer) AS progress
+    FROM weighted
+    GROUP BY goal_id
+)
+UPDATE goals SET progress = computed.progress
+FROM computed
+WHERE goals.id = computed.goal_id AND goals.progress <> computed.progress
+RETURNING goals.id
+"""
+
+def recompute_goal_progress(
+    db: Session,
+    user_id: Optional[str] = None,
+    goal_ids: Optional[Iterable[str]] = None,
+    task_ids: Optional[Iterable[str]] = None,
+) -> List[str]:
+    # Recomputes the goals with the given ids, the goals that relate to any of
+    # the given tasks (found through ix_goal_tasks_task_id), all of one
+    # user's goals, or (no arguments) every goal. Returns the ids of the
+    # goals whose progress changed.
+    filters = []
+    params = {}
+    if user_id is not None:
+        filters.append("goals.user_id = :user_id")
+        params["user_id"] = user_id
+    if goal_ids is not None:
+        filters.append("goals.id IN :goal_ids")
+        params["goal_ids"] = list(goal_ids)
+    if task_ids is not None:
+        filters.append("goals.id IN (SELECT goal_id FROM goal_tasks WHERE task_id IN :task_ids)")
+        params["task_ids"] = list(task_ids)
+    if ("goal_ids" in params and not params["goal_ids"]) or ("task_ids" in params and not params["task_ids"]):
+        return []
+
+    # Pending ORM changes (a task's new status) must be visible to the SQL.
+    db.flush()
+    statement = text(RECOMPUTE_PROGRESS.format(goals_filter=" AND ".join(filters) or "TRUE"))
+    statement = statement.bindparams(*[bindparam(name, expanding=True) for name in ("goal_ids", "task_ids") if name in params])
+    return list(db.execute(statement, params).scalars())
+
+def tasks_changed(db: Session, user_id: str, task_ids: Iterable[str]) -> List[str]:
+    return recompute_goal_progress(db, user_id, task_ids=task_ids)
+
+def tasks_deleted(db: Session, user_id: str, task_ids: Iterable[str]) -> List[str]:
+    # Unlinks the tasks from every goal that listed them and recomputes those
+    # goals from the tasks that remain. Call it before deleting the tasks:
+    # the foreign key would drop the links too, but leave no trace of which
+    # goals changed.
+    task_ids = list(task_ids)
+    if not task_ids:
+        return []
+    db.flush()
+    goal_ids = list(db.execute(
+        delete(GoalTask)
+        .where(GoalTask.task_id.in_(task_ids), GoalTask.goal_id.in_(select(Goal.id).where(Goal.user_id == user_id)))
+        .returning(GoalTask.goal_id)
+    ).scalars())
+    goal_ids = list(dict.fromkeys(goal_ids))
+    recompute_goal_progress(db, user_id, goal_ids=goal_ids)
+    return goal_ids
+
+def unknown_tasks(db: Session, user_id: str, task_ids: Iterable[str]) -> List[str]:
+    # The ids that are not tasks of this user, in the order given.
+    task_ids = list(task_ids)
+    if not task_ids:
+        return []
+    owned = set(db.execute(select(Task.id).where(Task.user_id == user_id, Task.id.in_(set(task_ids)))).scalars())
+    return [task_id for task_id in task_ids if task_id not in owned]
+
+def set_related_tasks(db: Session, goal_id: str, task_ids: Optional[Iterable[str]]):
+    # Replaces a goal's related tasks. The ids must be tasks of the goal's
+    # owner (see unknown_tasks); one listed twice is linked once. A loaded
+    # goal's related_task_ids is stale until it is refreshed.
+    db.flush()
+    db.execute(delete(GoalTask).where(GoalTask.goal_id == goal_id))
+    task_ids = list(dict.fromkeys(task_ids or []))
+    if task_ids:
+        db.execute(insert(GoalTask), [
+            {"goal_id": goal_id, "task_id": task_id, "position": position}
+            for position, task_id in enumerate(task_ids)
+        ])
+
+if __name__ == "__main__":
+    from api.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        recompute_goal_progress(db)
+        db.commit()
+    finally:
+        db.close()
+    print("Goal progress recomputed successfully!")
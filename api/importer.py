@@ -0,0 +1,271 @@
+import csv
+import io
+import json
+import time
+import uuid
+from datetime import datetime
+from pydantic import ValidationError
+from pydantic.alias_generators import to_camel
+from sqlalchemy import ARRAY, column, insert, inspect, table, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from api import models, schemas
+
+IMPORT_RESOURCES = {
+    "tasks": (models.Task, schemas.TaskImport),
+    "goals": (models.Goal, schemas.GoalImport),
+    "pomodoro-sessions": (models.PomodoroSession, schemas.PomodoroSessionImport),
+}
+
+# Aggregates the freshly inserted rows into daily_stats, mirroring
+# analytics.rebuild_daily_stats for the resources that feed the rollup.
+ROLLUP_SELECTS = {
+    "tasks": (
+        "SELECT user_id, date(completed_at), coalesce(subject, ''), sum(coalesce(actual_duration, 0)), count(*), 0 "
+        "FROM {source} WHERE completed_at IS NOT NULL GROUP BY 1, 2, 3"
+    ),
+    "pomodoro-sessions": (
+        "SELECT user_id, date(completed_at), '', sum(focus_duration), 0, count(*) "
+        "FROM {source} WHERE was_completed AND completed_at IS NOT NULL GROUP BY 1, 2, 3"
+    ),
+}
+
+# A goal's related task ids arrive with the goal and land in goal_tasks,
+# through a staging table of their own. Links to tasks the user does not
+# have are dropped.
+LINK_STAGING = "import_goal_tasks"
+LINK_COLUMNS = [models.GoalTask.goal_id, models.GoalTask.task_id, models.GoalTask.position]
+
+# Tables whose ids no unique index covers on PostgreSQL: a partitioned
+# table's unique indexes have to include the partition key, so
+# pomodoro_sessions is only unique on (id, created_at). The merge skips
+# rows whose id exists in any partition, and the first of several rows with
+# one id, under a lock that keeps concurrent imports from racing past the
+# check.
+DEDUPED_BY_ID = {"pomodoro_sessions"}
+
+BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 100
+
+async def iter_lines(stream):
+    # Raw bytes: each record is decoded on its own, so a line that is not
+    # UTF-8 is rejected like any other bad row instead of failing the import.
+    pending = b""
+    async for chunk in stream:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line.rstrip(b"\r")
+    if pending:
+        yield pending.rstrip(b"\r")
+
+async def iter_ndjson_records(lines):
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line.decode("utf-8"))
+        except ValueError as e:
+            yield line_number, e
+
+async def iter_csv_records(lines, array_fields):
+    header = None
+    buffered = []
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        buffered.append(line)
+        record = b"\n".join(buffered)
+        # An odd number of quotes means a quoted field continues on the next
+        # line. Counted on the bytes: no UTF-8 sequence contains a quote byte.
+        if record.count(b'"') % 2:
+            continue
+        start_line = line_number - len(buffered) + 1
+        buffered = []
+        if not record.strip():
+            continue
+
+        if header is None:
+            # A column name that is not UTF-8 matches no field, and the rows
+            # are rejected for what they miss.
+            header = next(csv.reader(io.StringIO(record.decode("utf-8", errors="replace"))))
+            continue
+
+        try:
+            values = next(csv.reader(io.StringIO(record.decode("utf-8"))))
+            row = {}
+            for name, value in zip(header, values):
+                if value == "":
+                    value = None
+                elif name in array_fields:
+                    value = json.loads(value)
+                row[name] = value
+            yield start_line, row
+        except ValueError as e:
+            yield start_line, e
+
+    if buffered:
+        yield line_number - len(buffered) + 1, ValueError("Unterminated quoted field")
+
+async def _copy_records(db: AsyncSession, staging: str, columns, records):
+    # `columns` are the target table's Column objects; their types encode
+    # values (arrays as JSON on SQLite) when COPY is not available.
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    driver_connection = raw_connection.driver_connection
+    names = [c.name for c in columns]
+    if hasattr(driver_connection, "copy_records_to_table"):
+        await driver_connection.copy_records_to_table(staging, records=records, columns=names)
+    else:
+        staging_table = table(staging, *[column(c.name, c.type) for c in columns])
+        await db.execute(insert(staging_table), [dict(zip(names, record)) for record in records])
+
+def _rollup(resource: str, source: str) -> str:
+    return (
+        'INSERT INTO daily_stats (user_id, date, subject, minutes_studied, tasks_completed, pomodoro_sessions_completed) '
+        f'{ROLLUP_SELECTS[resource].format(source=source)} '
+        'ON CONFLICT (user_id, date, subject) DO UPDATE SET '
+        'minutes_studied = daily_stats.minutes_studied + excluded.minutes_studied, '
+        'tasks_completed = daily_stats.tasks_completed + excluded.tasks_completed, '
+        'pomodoro_sessions_completed = daily_stats.pomodoro_sessions_completed + excluded.pomodoro_sessions_completed'
+    )
+
+def _link(source: str) -> str:
+    # `source` has the inserted goals.
+    return (
+        'INSERT INTO goal_tasks (goal_id, task_id, position) '
+        f'SELECT link.goal_id, link.task_id, link.position FROM "{LINK_STAGING}" AS link '
+        f'JOIN {source} ON inserted.id = link.goal_id '
+        'JOIN tasks ON tasks.id = link.task_id AND tasks.user_id = inserted.user_id '
+        'WHERE true ON CONFLICT DO NOTHING'
+    )
+
+async def _create_staging(db: AsyncSession, staging: str, target: str, column_list: str):
+    if db.bind.dialect.name == "sqlite":
+        # Every column is supplied, so the copy needs no defaults. SQLite
+        # temp tables live until dropped, and one left by a failed import
+        # would still be there on this pooled connection.
+        await db.execute(text(f'DROP TABLE IF EXISTS temp."{staging}"'))
+        await db.execute(text(f'CREATE TEMP TABLE "{staging}" AS SELECT {column_list} FROM "{target}" WHERE false'))
+    else:
+        await db.execute(text(f'CREATE TEMP TABLE "{staging}" (LIKE "{target}" INCLUDING DEFAULTS) ON COMMIT DROP'))
+
+async def _merge(db: AsyncSession, resource: str, target: str, staging: str, column_list: str, links: bool) -> int:
+    # Existing ids are skipped, including ones that belong to another user,
+    # and so are occurrences of a recurring task that already exist.
+    if db.bind.dialect.name == "sqlite":
+        # No INSERT inside WITH on SQLite: the rollup and the links read the
+        # inserted rows back from the target by the ids the INSERT returned.
+        inserted = (await db.execute(text(
+            f'INSERT INTO "{target}" ({column_list}) SELECT {column_list} FROM "{staging}" WHERE true '
+            'ON CONFLICT DO NOTHING RETURNING id'
+        ))).scalars().all()
+        source = f'(SELECT * FROM "{target}" WHERE id IN (SELECT value FROM json_each(:ids))) AS inserted'
+        if resource in ROLLUP_SELECTS and inserted:
+            await db.execute(text(_rollup(resource, source)), {"ids": json.dumps(inserted)})
+        if links:
+            if inserted:
+                await db.execute(text(_link(source)), {"ids": json.dumps(inserted)})
+            await db.execute(text(f'DROP TABLE temp."{LINK_STAGING}"'))
+        await db.execute(text(f'DROP TABLE temp."{staging}"'))
+        return len(inserted)
+
+    source = f'SELECT {column_list} FROM "{staging}"'
+    if target in DEDUPED_BY_ID:
+        await db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:name))"), {"name": staging})
+        source = (
+            f'SELECT DISTINCT ON (id) {column_list} FROM "{staging}" AS staged '
+            f'WHERE NOT EXISTS (SELECT 1 FROM "{target}" WHERE "{target}".id = staged.id) ORDER BY id, ctid'
+        )
+    merge = (
+        f'WITH inserted AS ('
+        f'INSERT INTO "{target}" ({column_list}) {source} '
+        f'ON CONFLICT DO NOTHING RETURNING *)'
+    )
+    if resource in ROLLUP_SELECTS:
+        merge += f', rollup AS ({_rollup(resource, "inserted")})'
+    if links:
+        merge += f', linked AS ({_link("inserted")})'
+    merge += " SELECT count(*) FROM inserted"
+    return (await db.execute(text(merge))).scalar()
+
+async def import_rows(db: AsyncSession, user_id: str, resource: str, export_format: str, stream) -> schemas.ImportResult:
+    model, schema = IMPORT_RESOURCES[resource]
+    target = model.__tablename__
+    staging = f"import_{target}"
+    table_columns = [c for c in model.__table__.columns if c.computed is None]
+    columns = [c.name for c in table_columns]
+    array_fields = set()
+    for attribute in inspect(model).column_attrs:
+        if isinstance(attribute.expression.type, ARRAY):
+            array_fields.update((attribute.key, to_camel(attribute.key)))
+    links = resource == "goals"
+
+    started = time.perf_counter()
+    column_list = ", ".join(f'"{name}"' for name in columns)
+    await _create_staging(db, staging, target, column_list)
+    if links:
+        await _create_staging(db, LINK_STAGING, "goal_tasks", ", ".join(f'"{c.name}"' for c in LINK_COLUMNS))
+
+    lines = iter_lines(stream)
+    if export_format == "csv":
+        records = iter_csv_records(lines, array_fields)
+    else:
+        records = iter_ndjson_records(lines)
+
+    received = 0
+    rejected = 0
+    errors = []
+    batch = []
+    link_batch = []
+    # The links of a goal id's first row only; later rows with that id are skipped.
+    linked_goals = set()
+    async for line_number, row in records:
+        received += 1
+        try:
+            if isinstance(row, Exception):
+                raise row
+            item = schema.model_validate(row).model_dump()
+        except (ValidationError, ValueError) as e:
+            rejected += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                detail = e.errors(include_url=False, include_context=False, include_input=False) if isinstance(e, ValidationError) else str(e)
+                errors.append(schemas.ImportRowError(line=line_number, detail=detail))
+            continue
+
+        item["user_id"] = user_id
+        item["id"] = item["id"] or str(uuid.uuid4())
+        item["created_at"] = item["created_at"] or datetime.now()
+        batch.append(tuple(item.get(name) for name in columns))
+        if len(batch) >= BATCH_SIZE:
+            await _copy_records(db, staging, table_columns, batch)
+            batch = []
+        if links and item["id"] not in linked_goals:
+            linked_goals.add(item["id"])
+            task_ids = dict.fromkeys(item.get("related_task_ids") or [])
+            link_batch.extend((item["id"], task_id, position) for position, task_id in enumerate(task_ids))
+            if len(link_batch) >= BATCH_SIZE:
+                await _copy_records(db, LINK_STAGING, LINK_COLUMNS, link_batch)
+                link_batch = []
+
+    if batch:
+        await _copy_records(db, staging, table_columns, batch)
+    if link_batch:
+        await _copy_records(db, LINK_STAGING, LINK_COLUMNS, link_batch)
+
+    imported = await _merge(db, resource, target, staging, column_list, links)
+    await db.commit()
+
+    elapsed = time.perf_counter() - started
+    accepted = received - rejected
+    return schemas.ImportResult(
+        resource=resource,
+        received=received,
+        imported=imported,
+        skipped=accepted - imported,
+        rejected=rejected,
+        errors=errors,
+        elapsed_seconds=round(elapsed, 3),
+        rows_per_second=round(received / elapsed, 1) if elapsed else 0.0,
+    )
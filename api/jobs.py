@@ -0,0 +1,233 @@
+import asyncio
+import logging
+import os
+import time
+from contextlib import suppress
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+from sqlalchemy import delete, select, text, update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from api import analytics, events, goal_progress, models, streaks, subjects
+from api.dialects import localnow
+
+logger = logging.getLogger(__name__)
+
+# A durable queue in the jobs table. Request handlers enqueue work that is
+# too heavy to run inline and answer 202 with the job; workers claim due jobs
+# with FOR UPDATE SKIP LOCKED, so any number of them can share the queue.
+# A job runs at least once: a worker that dies mid-job loses its lease and
+# the job runs again, so handlers must be safe to repeat.
+JOB_WORKER = os.getenv("JOB_WORKER", "true").lower() in ("1", "true", "yes")
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "300"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Seconds before the first retry; doubled for each later one.
+JOB_RETRY_DELAY = float(os.getenv("JOB_RETRY_DELAY", "5"))
+JOB_RETENTION_DAYS = float(os.getenv("JOB_RETENTION_DAYS", "7"))
+
+PRUNE_INTERVAL = 3600
+
+class ClaimedJob(NamedTuple):
+    id: str
+    user_id: str
+    kind: str
+    payload: Optional[Dict[str, Any]]
+    attempts: int
+    max_attempts: int
+
+def reset_user_data(db: Session, user_id: str, payload: Optional[dict]) -> dict:
+    # Deletes the user's tasks, goals, sessions and analytics; settings stay,
+    # with the streak cleared and the default subjects.
+    deleted = {}
+    for name, model in (
+        ("tasks", models.Task),
+        ("goals", models.Goal),
+        ("pomodoroSessions", models.PomodoroSession),
+        ("dailyStats", models.DailyStats),
+    ):
+        deleted[name] = db.execute(delete(model).where(model.user_id == user_id)).rowcount
+
+    Settings = models.UserSettings
+    reset = db.execute(
+        update(Settings)
+        .where(Settings.user_id == user_id)
+        .values(current_streak=0, longest_streak=0, last_study_date=None, updated_at=localnow())
+    ).rowcount
+    if reset:
+        subjects.replace_subjects(db, user_id)
+
+    events.publish(db, user_id, "data.reset")
+    db.commit()
+    return {"deleted": deleted}
+
+def rebuild_user_analytics(db: Session, user_id: str, payload: Optional[dict]) -> dict:
+    # Rebuilds the user's daily_stats rows, goal progress and streak from
+    # their tasks and sessions. One transaction: a failed attempt leaves
+    # nothing half rebuilt, and the retry starts over from the same rows.
+    analytics.rebuild_daily_stats(db, user_id)
+    goal_ids = goal_progress.recompute_goal_progress(db, user_id=user_id)
+    if goal_ids:
+        events.publish(db, user_id, "goal.updated", goal_ids)
+    events.publish(db, user_id, "settings.updated")
+    streaks.recompute_streaks(db, user_id)
+    db.commit()
+    return {"goalsUpdated": len(goal_ids)}
+
+JOB_HANDLERS: Dict[str, Callable[[Session, str, Optional[dict]], Optional[dict]]] = {
+    "reset-all": reset_user_data,
+    "rebuild-analytics": rebuild_user_analytics,
+}
+
+def enqueue(db: Session, user_id: str, kind: str, payload: Optional[dict] = None) -> models.Job:
+    # Adds the job to the caller's transaction, so workers see it once that
+    # commits. If the user already has the same job waiting to start, that
+    # one is returned instead: it will see everything this one would.
+    Job = models.Job
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    queued = db.execute(
+        select(Job).where(Job.user_id == user_id, Job.kind == kind, Job.status == "queued", Job.attempts == 0)
+        .order_by(Job.created_at)
+        .limit(1)
+    ).scalar()
+    if queued is not None and queued.payload == payload:
+        return queued
+    job = Job(user_id=user_id, kind=kind, payload=payload, max_attempts=JOB_MAX_ATTEMPTS)
+    db.add(job)
+    db.flush()
+    return job
+
+def claim(db: Session, now: Optional[datetime] = None, lease: float = JOB_LEASE_SECONDS) -> Optional[ClaimedJob]:
+    # Takes the job that has been due the longest: a queued one whose
+    # run_after has come, or a running one whose worker's lease has run out.
+    # One UPDATE picks and leases it, so two workers never claim the same job
+    # (SKIP LOCKED on PostgreSQL; SQLite runs writes one at a time).
+    Job = models.Job
+    now = now or datetime.now()
+    next_job = (
+        select(Job.id)
+        .where(text(models.JOB_PENDING), Job.run_after <= now)
+        .order_by(Job.run_after)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+        # Its own scan of jobs, not a reference to the row being updated.
+        .correlate_except(Job)
+    )
+    row = db.execute(
+        update(Job)
+        .where(Job.id == next_job)
+        .values(status="running", attempts=Job.attempts + 1, started_at=now, run_after=now + timedelta(seconds=lease))
+        .returning(Job.id, Job.user_id, Job.kind, Job.payload, Job.attempts, Job.max_attempts)
+        .execution_options(synchronize_session=False)
+    ).first()
+    db.commit()
+    return ClaimedJob(*row) if row is not None else None
+
+def _finish(db: Session, job_id: str, **values):
+    Job = models.Job
+    db.execute(update(Job).where(Job.id == job_id).values(**values).execution_options(synchronize_session=False))
+    db.commit()
+
+def run_next(db: Session, now: Optional[datetime] = None) -> Optional[ClaimedJob]:
+    # Claims and runs one job; returns it, or None when no job is due. A
+    # failed attempt is retried after JOB_RETRY_DELAY, doubled each time,
+    # until the job runs out of attempts.
+    job = claim(db, now)
+    if job is None:
+        return None
+    if job.attempts > job.max_attempts:
+        # Its last attempt's worker never came back.
+        _finish(db, job.id, status="failed", error="Worker lost while running the job", finished_at=localnow())
+        return job
+
+    try:
+        handler = JOB_HANDLERS.get(job.kind)
+        if handler is None:
+            raise ValueError(f"Unknown job kind: {job.kind}")
+        result = handler(db, job.user_id, job.payload)
+    except Exception as e:
+        db.rollback()
+        logger.exception("Job %s (%s) failed on attempt %d", job.id, job.kind, job.attempts)
+        error = f"{type(e).__name__}: {e}"
+        if job.attempts < job.max_attempts:
+            delay = JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+            _finish(db, job.id, status="queued", error=error, run_after=datetime.now() + timedelta(seconds=delay))
+        else:
+            _finish(db, job.id, status="failed", error=error, finished_at=localnow())
+        return job
+
+    _finish(db, job.id, status="succeeded", result=result, error=None, finished_at=localnow())
+    return job
+
+def run_due(db: Session) -> List[ClaimedJob]:
+    # Runs jobs until none is due; returns the ones that ran.
+    ran = []
+    while True:
+        job = run_next(db)
+        if job is None:
+            return ran
+        ran.append(job)
+
+def prune_finished(db: Session, retention_days: float = JOB_RETENTION_DAYS) -> int:
+    Job = models.Job
+    deleted = db.execute(
+        delete(Job).where(
+            Job.status.in_(["succeeded", "failed"]),
+            Job.finished_at < datetime.now() - timedelta(days=retention_days),
+        )
+    ).rowcount
+    db.commit()
+    return deleted
+
+def _in_session(work):
+    from api.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return work(db)
+    finally:
+        db.close()
+
+_wakeup: Optional[asyncio.Event] = None
+
+def wake():
+    # Starts this process's worker on a job queued here right away, instead
+    # of at its next poll.
+    if _wakeup is not None:
+        _wakeup.set()
+
+async def run_worker(interval: float = JOB_POLL_INTERVAL):
+    global _wakeup
+    from api.cache import analytics_cache
+
+    _wakeup = asyncio.Event()
+    pruned_at = 0.0
+    while True:
+        _wakeup.clear()
+        try:
+            for user_id in {job.user_id for job in await run_in_threadpool(_in_session, run_due)}:
+                await analytics_cache.invalidate(user_id)
+            if time.monotonic() - pruned_at >= PRUNE_INTERVAL:
+                await run_in_threadpool(_in_session, prune_finished)
+                pruned_at = time.monotonic()
+        except Exception:
+            logger.exception("Running jobs failed")
+        with suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(_wakeup.wait(), interval)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run queued background jobs")
+    parser.add_argument("--worker", action="store_true", help=f"keep polling every {JOB_POLL_INTERVAL:g}s")
+    args = parser.parse_args()
+
+    if args.worker:
+        logging.basicConfig(level=logging.INFO)
+        asyncio.run(run_worker())
+    else:
+        ran = _in_session(run_due)
+        print(f"Ran {len(ran)} jobs")
+        print("Jobs run successfully!")
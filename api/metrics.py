@@ -0,0 +1,300 @@
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+from sqlalchemy import event
+
+slow_query_logger = logging.getLogger("api.slow_queries")
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+# Milliseconds; 0 disables the slow-query log.
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "0"))
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "true").lower() in ("1", "true", "yes")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Only statements whose plan can be shown without running them.
+EXPLAINABLE = ("select", "with", "insert", "update", "delete")
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Metric:
+    # A family of series keyed by label values. Updates come from the event
+    # loop and from worker threads (run_sync, run_in_threadpool), so they
+    # take a lock.
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.series: Dict[Tuple[str, ...], object] = {}
+        self.lock = threading.Lock()
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        with self.lock:
+            self.series[labels] = self.series.get(labels, 0) + amount
+
+    def render(self):
+        lines = self.header()
+        with self.lock:
+            for labels, value in sorted(self.series.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}")
+        return lines
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels):
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                # Per-bucket counts (the last one is +Inf), then sum.
+                series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def render(self):
+        lines = self.header()
+        with self.lock:
+            for labels, (counts, total) in sorted(self.series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = 'le="' + _format_value(bound) + '"'
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labels, labels, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, labels)} {_format_value(total)}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, labels)} {cumulative}")
+        return lines
+
+class Gauge(Metric):
+    # Read when scraped from a callback returning {label values: value}.
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...], collect):
+        super().__init__(name, documentation, labels)
+        self.collect = collect
+
+    def render(self):
+        lines = self.header()
+        for labels, value in sorted(self.collect().items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    "studyflow_http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"),
+))
+http_duration = registry.register(Histogram(
+    "studyflow_http_request_duration_seconds",
+    "Time from receiving a request to sending its response headers.",
+    ("method", "route"),
+))
+request_db_queries = registry.register(Histogram(
+    "studyflow_http_request_db_queries", "Database queries run per request.", ("method", "route"), COUNT_BUCKETS,
+))
+request_db_time = registry.register(Histogram(
+    "studyflow_http_request_db_seconds", "Time spent in database queries per request.", ("method", "route"),
+))
+serialization_time = registry.register(Histogram(
+    "studyflow_response_serialization_seconds", "Time spent encoding orjson response bodies.", ("route",),
+))
+db_queries = registry.register(Histogram(
+    "studyflow_db_query_duration_seconds", "Database query latency by engine and statement type.", ("engine", "operation"),
+))
+pool_wait = registry.register(Histogram(
+    "studyflow_db_pool_checkout_wait_seconds", "Time spent waiting for a pooled database connection.", ("engine",),
+))
+slow_queries = registry.register(Counter(
+    "studyflow_db_slow_queries_total", "Queries slower than SLOW_QUERY_MS.", ("engine",),
+))
+
+class RequestStats:
+    __slots__ = ("scope", "queries", "db_seconds")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.queries = 0
+        self.db_seconds = 0.0
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+def _route_label(scope) -> str:
+    # The route template, not the raw path, keeps label cardinality bounded.
+    # Depending on the FastAPI version an included router's route reports its
+    # path with or without the include prefix; the prefix is taken from the
+    # leading segments of the request path the template does not cover.
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if not template:
+        return "unmatched"
+    if ":path}" in template:
+        return template
+    segments = scope["path"].strip("/").split("/")
+    extra = len(segments) - len(template.strip("/").split("/"))
+    return "/" + "/".join(segments[:extra]) + template if extra > 0 else template
+
+class MetricsMiddleware:
+    # Plain ASGI middleware rather than BaseHTTPMiddleware, so streaming
+    # responses pass through untouched. Latency is measured to the response
+    # headers; for streams (exports, /api/events) the body that follows is
+    # not counted.
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats(scope)
+        token = current_request.set(stats)
+        started = time.perf_counter()
+        method = scope["method"]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                route = _route_label(scope)
+                http_duration.observe(time.perf_counter() - started, method, route)
+                http_requests.inc(method, route, str(message["status"]))
+                request_db_queries.observe(stats.queries, method, route)
+                request_db_time.observe(stats.db_seconds, method, route)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request.reset(token)
+
+def observe_serialization(seconds: float):
+    stats = current_request.get()
+    serialization_time.observe(seconds, _route_label(stats.scope) if stats is not None else "none")
+
+def _operation(statement: str) -> str:
+    words = statement.lstrip().split(None, 1)
+    return words[0].upper() if words else "OTHER"
+
+def _explain(conn, statement, parameters):
+    # Plain EXPLAIN only plans the statement, so it is safe for writes too.
+    # It runs in a savepoint on the same connection (and so sees the same
+    # uncommitted rows), so a failure cannot abort the caller's transaction.
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute("SAVEPOINT slow_query_explain")
+        try:
+            cursor.execute("EXPLAIN " + statement, parameters)
+            return "\n".join(row[0] for row in cursor.fetchall())
+        except Exception as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+            return f"(EXPLAIN failed: {e})"
+        finally:
+            cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+    finally:
+        cursor.close()
+
+def instrument_engine(engine, name: str):
+    # Hooks a (sync) Engine; pass async_engine.sync_engine for the async one.
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        db_queries.observe(elapsed, name, _operation(statement))
+        stats = current_request.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_seconds += elapsed
+
+        if SLOW_QUERY_MS and elapsed * 1000 >= SLOW_QUERY_MS:
+            slow_queries.inc(name)
+            plan = None
+            if (
+                SLOW_QUERY_EXPLAIN and not executemany and conn.in_transaction()
+                and conn.dialect.name == "postgresql"
+                and statement.lstrip()[:6].lower().startswith(EXPLAINABLE)
+            ):
+                plan = _explain(conn, statement, parameters)
+            slow_query_logger.warning(
+                "Slow query (%.1f ms, %s engine):\n%s%s",
+                elapsed * 1000, name, statement, f"\nPlan:\n{plan}" if plan else "",
+            )
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        started = context.connection.info.get("query_started") if context.connection is not None else None
+        if started:
+            started.pop()
+
+    # Pools have no "before checkout" event, so the blocking part of a
+    # checkout is timed by wrapping the pool's own method.
+    pool = engine.pool
+    do_get = pool._do_get
+
+    def timed_do_get():
+        started = time.perf_counter()
+        try:
+            return do_get()
+        finally:
+            pool_wait.observe(time.perf_counter() - started, name)
+
+    pool._do_get = timed_do_get
+
+def pool_usage(engines):
+    def collect():
+        usage = {}
+        for name, engine in engines.items():
+            pool = engine.pool
+            if hasattr(pool, "checkedout"):
+                usage[(name, "checked_out")] = pool.checkedout()
+                usage[(name, "idle")] = pool.checkedin()
+        return usage
+    return collect
+
+def instrument(engines: dict):
+    for name, engine in engines.items():
+        instrument_engine(engine, name)
+    registry.register(Gauge(
+        "studyflow_db_pool_connections", "Pooled database connections by state.", ("engine", "state"), pool_usage(engines),
+    ))
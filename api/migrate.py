@@ -0,0 +1,61 @@
+import logging
+import os
+from sqlalchemy import inspect, text
+from api import database
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "migrations")
+STATEMENT_BREAKPOINT = "--> statement-breakpoint"
+# First line of a statement that reads a column only older databases have
+# (one the models no longer declare); it is skipped where the column is missing.
+REQUIRES_COLUMN = "-- requires column:"
+
+logger = logging.getLogger(__name__)
+
+def migrations_dir(dialect: str) -> str:
+    # SQLite databases start from create_all, so they have their own, much
+    # shorter, history of the pieces it cannot express (the triggers).
+    return os.path.join(MIGRATIONS_DIR, "sqlite") if dialect == "sqlite" else MIGRATIONS_DIR
+
+def statement_applies(connection, statement: str) -> bool:
+    first_line = statement.strip().splitlines()[0]
+    if not first_line.startswith(REQUIRES_COLUMN):
+        return True
+    table_name, column_name = first_line[len(REQUIRES_COLUMN):].strip().split(".")
+    return column_name in {column["name"] for column in inspect(connection).get_columns(table_name)}
+
+def run_migrations(bind=None):
+    bind = bind if bind is not None else database.engine
+    directory = migrations_dir(bind.dialect.name)
+    with bind.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version text PRIMARY KEY, "
+            "applied_at timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+        ))
+        applied = set(connection.execute(text("SELECT version FROM schema_migrations")).scalars())
+        
+        for filename in sorted(os.listdir(directory)):
+            version, ext = os.path.splitext(filename)
+            if ext != ".sql" or version in applied:
+                continue
+            
+            with open(os.path.join(directory, filename)) as f:
+                statements = f.read().split(STATEMENT_BREAKPOINT)
+            
+            for statement in statements:
+                if statement.strip() and statement_applies(connection, statement):
+                    connection.exec_driver_sql(statement)
+            
+            connection.execute(
+                text("INSERT INTO schema_migrations (version) VALUES (:version)"),
+                {"version": version},
+            )
+            logger.info("Applied migration %s", version)
+
+if __name__ == "__main__":
+    from api import models
+    
+    logging.basicConfig(level=logging.INFO)
+    models.Base.metadata.create_all(bind=database.engine)
+    run_migrations()
+    print("Migrations applied successfully!")
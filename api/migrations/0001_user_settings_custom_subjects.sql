@@ -0,0 +1 @@
+ALTER TABLE "user_settings" ADD COLUMN IF NOT EXISTS "custom_subjects" text[] DEFAULT '{"Math","Physics","Chemistry","Biology","History","English","Computer Science","Other"}';
@@ -0,0 +1,14 @@
+-- 0004_multi_user replaces these with indexes that lead with user_id, under
+-- the names the models declare; tests/test_indexes.py checks that the hot
+-- queries use them.
+CREATE INDEX IF NOT EXISTS "ix_tasks_status_completed_at" ON "tasks" ("status", "completed_at");
+--> statement-breakpoint
+CREATE INDEX IF NOT EXISTS "ix_tasks_completed_subject" ON "tasks" ("subject") INCLUDE ("actual_duration") WHERE "status" = 'completed';
+--> statement-breakpoint
+CREATE INDEX IF NOT EXISTS "ix_tasks_parent_task_id" ON "tasks" ("parent_task_id") WHERE "parent_task_id" IS NOT NULL;
+--> statement-breakpoint
+CREATE INDEX IF NOT EXISTS "ix_tasks_created_at_id" ON "tasks" ("created_at", "id");
+--> statement-breakpoint
+CREATE INDEX IF NOT EXISTS "ix_tasks_deadline_id" ON "tasks" ("deadline", "id");
+--> statement-breakpoint
+CREATE INDEX IF NOT EXISTS "ix_pomodoro_sessions_completed_at" ON "pomodoro_sessions" ("completed_at") INCLUDE ("focus_duration") WHERE "was_completed";
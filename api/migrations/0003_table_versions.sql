@@ -0,0 +1,31 @@
+CREATE TABLE IF NOT EXISTS "table_versions" (
+	"table_name" text PRIMARY KEY NOT NULL,
+	"version" bigint DEFAULT 0 NOT NULL,
+	"updated_at" timestamp DEFAULT (now() AT TIME ZONE 'UTC') NOT NULL
+);
+--> statement-breakpoint
+CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$
+BEGIN
+	INSERT INTO table_versions (table_name, version, updated_at)
+	VALUES (TG_TABLE_NAME, 1, now() AT TIME ZONE 'UTC')
+	ON CONFLICT (table_name) DO UPDATE
+	SET version = table_versions.version + 1, updated_at = now() AT TIME ZONE 'UTC';
+	RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+--> statement-breakpoint
+DROP TRIGGER IF EXISTS "tasks_bump_version" ON "tasks";
+--> statement-breakpoint
+CREATE TRIGGER "tasks_bump_version" AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON "tasks" FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+--> statement-breakpoint
+DROP TRIGGER IF EXISTS "goals_bump_version" ON "goals";
+--> statement-breakpoint
+CREATE TRIGGER "goals_bump_version" AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON "goals" FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+--> statement-breakpoint
+DROP TRIGGER IF EXISTS "pomodoro_sessions_bump_version" ON "pomodoro_sessions";
+--> statement-breakpoint
+CREATE TRIGGER "pomodoro_sessions_bump_version" AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON "pomodoro_sessions" FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+--> statement-breakpoint
+DROP TRIGGER IF EXISTS "user_settings_bump_version" ON "user_settings";
+--> statement-breakpoint
+CREATE TRIGGER "user_settings_bump_version" AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON "user_settings" FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
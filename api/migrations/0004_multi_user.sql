@@ -0,0 +1,141 @@
+-- The single-user version triggers are replaced at the end of this file.
+DROP TRIGGER IF EXISTS "tasks_bump_version" ON "tasks";
+--> statement-breakpoint
+DROP TRIGGER IF EXISTS "goals_bump_version" ON "goals";
+--> statement-breakpoint
+DROP TRIGGER IF EXISTS "pomodoro_sessions_bump_version" ON "pomodoro_sessions";
+--> statement-breakpoint
+DROP TRIGGER IF EXISTS "user_settings_bump_version" ON "user_settings";
+--> statement-breakpoint
+DROP FUNCTION IF EXISTS bump_table_version();
+--> statement-breakpoint
+ALTER TABLE "tasks" ADD COLUMN IF NOT EXISTS "user_id" text NOT NULL DEFAULT 'default';
+--> statement-breakpoint
+ALTER TABLE "tasks" ALTER COLUMN "user_id" DROP DEFAULT;
+--> statement-breakpoint
+ALTER TABLE "goals" ADD COLUMN IF NOT EXISTS "user_id" text NOT NULL DEFAULT 'default';
+--> statement-breakpoint
+ALTER TABLE "goals" ALTER COLUMN "user_id" DROP DEFAULT;
+--> statement-breakpoint
+ALTER TABLE "pomodoro_sessions" ADD COLUMN IF NOT EXISTS "user_id" text NOT NULL DEFAULT 'default';
+--> statement-breakpoint
+ALTER TABLE "pomodoro_sessions" ALTER COLUMN "user_id" DROP DEFAULT;
+--> statement-breakpoint
+ALTER TABLE "user_settings" ADD COLUMN IF NOT EXISTS "user_id" text NOT NULL DEFAULT 'default';
+--> statement-breakpoint
+ALTER TABLE "user_settings" ALTER COLUMN "user_id" DROP DEFAULT;
+--> statement-breakpoint
+ALTER TABLE "daily_stats" ADD COLUMN IF NOT EXISTS "user_id" text NOT NULL DEFAULT 'default';
+--> statement-breakpoint
+ALTER TABLE "daily_stats" ALTER COLUMN "user_id" DROP DEFAULT;
+--> statement-breakpoint
+ALTER TABLE "daily_stats" DROP CONSTRAINT IF EXISTS "daily_stats_pkey";
+--> statement-breakpoint
+ALTER TABLE "daily_stats" ADD CONSTRAINT "daily_stats_pkey" PRIMARY KEY ("user_id", "date", "subject");
+--> statement-breakpoint
+ALTER TABLE "table_versions" ADD COLUMN IF NOT EXISTS "user_id" text NOT NULL DEFAULT 'default';
+--> statement-breakpoint
+ALTER TABLE "table_versions" ALTER COLUMN "user_id" DROP DEFAULT;
+--> statement-breakpoint
+ALTER TABLE "table_versions" DROP CONSTRAINT IF EXISTS "table_versions_pkey";
+--> statement-breakpoint
+ALTER TABLE "table_versions" ADD CONSTRAINT "table_versions_pkey" PRIMARY KEY ("table_name", "user_id");
+--> statement-breakpoint
+-- Settings used to be read with LIMIT 1; keep that row if there are several.
+DELETE FROM "user_settings" a USING "user_settings" b WHERE a."user_id" = b."user_id" AND a.ctid > b.ctid;
+--> statement-breakpoint
+CREATE UNIQUE INDEX IF NOT EXISTS "ix_user_settings_user_id" ON "user_settings" ("user_id");
+--> statement-breakpoint
+DROP INDEX IF EXISTS "ix_tasks_status_completed_at";
+--> statement-breakpoint
+DROP INDEX IF EXISTS "ix_tasks_completed_subject";
+--> statement-breakpoint
+DROP INDEX IF EXISTS "ix_tasks_parent_task_id";
+--> statement-breakpoint
+DROP INDEX IF EXISTS "ix_tasks_created_at_id";
+--> statement-breakpoint
+DROP INDEX IF EXISTS "ix_tasks_deadline_id";
+--> statement-breakpoint
+DROP INDEX IF EXISTS "ix_pomodoro_sessions_completed_at";
+--> statement-breakpoint
+CREATE INDEX IF NOT EXISTS "ix_tasks_user_status_completed_at" ON "tasks" ("user_id", "status", "completed_at");
+--> statement-breakpoint
+CREATE INDEX IF NOT EXISTS "ix_tasks_user_completed_subject" ON "tasks" ("user_id", "subject") INCLUDE ("actual_duration") WHERE "status" = 'completed';
+--> statement-breakpoint
+CREATE INDEX IF NOT EXISTS "ix_tasks_user_parent_task_id" ON "tasks" ("user_id", "parent_task_id") WHERE "parent_task_id" IS NOT NULL;
+--> statement-breakpoint
+CREATE INDEX IF NOT EXISTS "ix_tasks_user_created_at_id" ON "tasks" ("user_id", "created_at", "id");
+--> statement-breakpoint
+CREATE INDEX IF NOT EXISTS "ix_tasks_user_deadline_id" ON "tasks" ("user_id", "deadline", "id");
+--> statement-breakpoint
+CREATE INDEX IF NOT EXISTS "ix_goals_user_created_at" ON "goals" ("user_id", "created_at");
+--> statement-breakpoint
+CREATE INDEX IF NOT EXISTS "ix_pomodoro_sessions_user_completed_at" ON "pomodoro_sessions" ("user_id", "completed_at") INCLUDE ("focus_duration") WHERE "was_completed";
+--> statement-breakpoint
+CREATE INDEX IF NOT EXISTS "ix_pomodoro_sessions_user_created_at" ON "pomodoro_sessions" ("user_id", "created_at");
+--> statement-breakpoint
+-- Versions are now tracked per (table, user). Transition tables tell the
+-- statement trigger which users a write touched; PostgreSQL only allows them
+-- on single-event triggers, hence one trigger per event.
+CREATE OR REPLACE FUNCTION bump_user_table_versions_new() RETURNS trigger AS $$
+BEGIN
+	INSERT INTO table_versions (table_name, user_id, version, updated_at)
+	SELECT TG_TABLE_NAME, changed.user_id, 1, now() AT TIME ZONE 'UTC'
+	FROM (SELECT DISTINCT user_id FROM new_rows) changed
+	ON CONFLICT (table_name, user_id) DO UPDATE
+	SET version = table_versions.version + 1, updated_at = now() AT TIME ZONE 'UTC';
+	RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+--> statement-breakpoint
+CREATE OR REPLACE FUNCTION bump_user_table_versions_old() RETURNS trigger AS $$
+BEGIN
+	INSERT INTO table_versions (table_name, user_id, version, updated_at)
+	SELECT TG_TABLE_NAME, changed.user_id, 1, now() AT TIME ZONE 'UTC'
+	FROM (SELECT DISTINCT user_id FROM old_rows) changed
+	ON CONFLICT (table_name, user_id) DO UPDATE
+	SET version = table_versions.version + 1, updated_at = now() AT TIME ZONE 'UTC';
+	RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+--> statement-breakpoint
+CREATE OR REPLACE FUNCTION bump_all_table_versions() RETURNS trigger AS $$
+BEGIN
+	UPDATE table_versions
+	SET version = version + 1, updated_at = now() AT TIME ZONE 'UTC'
+	WHERE table_name = TG_TABLE_NAME;
+	RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+--> statement-breakpoint
+CREATE TRIGGER "tasks_bump_version_insert" AFTER INSERT ON "tasks" REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION bump_user_table_versions_new();
+--> statement-breakpoint
+CREATE TRIGGER "tasks_bump_version_update" AFTER UPDATE ON "tasks" REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION bump_user_table_versions_new();
+--> statement-breakpoint
+CREATE TRIGGER "tasks_bump_version_delete" AFTER DELETE ON "tasks" REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION bump_user_table_versions_old();
+--> statement-breakpoint
+CREATE TRIGGER "tasks_bump_version_truncate" AFTER TRUNCATE ON "tasks" FOR EACH STATEMENT EXECUTE FUNCTION bump_all_table_versions();
+--> statement-breakpoint
+CREATE TRIGGER "goals_bump_version_insert" AFTER INSERT ON "goals" REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION bump_user_table_versions_new();
+--> statement-breakpoint
+CREATE TRIGGER "goals_bump_version_update" AFTER UPDATE ON "goals" REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION bump_user_table_versions_new();
+--> statement-breakpoint
+CREATE TRIGGER "goals_bump_version_delete" AFTER DELETE ON "goals" REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION bump_user_table_versions_old();
+--> statement-breakpoint
+CREATE TRIGGER "goals_bump_version_truncate" AFTER TRUNCATE ON "goals" FOR EACH STATEMENT EXECUTE FUNCTION bump_all_table_versions();
+--> statement-breakpoint
+CREATE TRIGGER "pomodoro_sessions_bump_version_insert" AFTER INSERT ON "pomodoro_sessions" REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION bump_user_table_versions_new();
+--> statement-breakpoint
+CREATE TRIGGER "pomodoro_sessions_bump_version_update" AFTER UPDATE ON "pomodoro_sessions" REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION bump_user_table_versions_new();
+--> statement-breakpoint
+CREATE TRIGGER "pomodoro_sessions_bump_version_delete" AFTER DELETE ON "pomodoro_sessions" REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION bump_user_table_versions_old();
+--> statement-breakpoint
+CREATE TRIGGER "pomodoro_sessions_bump_version_truncate" AFTER TRUNCATE ON "pomodoro_sessions" FOR EACH STATEMENT EXECUTE FUNCTION bump_all_table_versions();
+--> statement-breakpoint
+CREATE TRIGGER "user_settings_bump_version_insert" AFTER INSERT ON "user_settings" REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION bump_user_table_versions_new();
+--> statement-breakpoint
+CREATE TRIGGER "user_settings_bump_version_update" AFTER UPDATE ON "user_settings" REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION bump_user_table_versions_new();
+--> statement-breakpoint
+CREATE TRIGGER "user_settings_bump_version_delete" AFTER DELETE ON "user_settings" REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION bump_user_table_versions_old();
+--> statement-breakpoint
+CREATE TRIGGER "user_settings_bump_version_truncate" AFTER TRUNCATE ON "user_settings" FOR EACH STATEMENT EXECUTE FUNCTION bump_all_table_versions();
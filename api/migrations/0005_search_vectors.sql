@@ -0,0 +1,7 @@
+ALTER TABLE "tasks" ADD COLUMN IF NOT EXISTS "search_vector" tsvector GENERATED ALWAYS AS (setweight(to_tsvector('english', coalesce(title, '')), 'A') || setweight(to_tsvector('english', coalesce(subject, '')), 'B') || setweight(to_tsvector('english', coalesce(description, '')), 'C')) STORED;
+--> statement-breakpoint
+ALTER TABLE "goals" ADD COLUMN IF NOT EXISTS "search_vector" tsvector GENERATED ALWAYS AS (setweight(to_tsvector('english', coalesce(title, '')), 'A') || setweight(to_tsvector('english', coalesce(description, '')), 'C')) STORED;
+--> statement-breakpoint
+CREATE INDEX IF NOT EXISTS "ix_tasks_search_vector" ON "tasks" USING gin ("search_vector");
+--> statement-breakpoint
+CREATE INDEX IF NOT EXISTS "ix_goals_search_vector" ON "goals" USING gin ("search_vector");
@@ -0,0 +1,9 @@
+ALTER TABLE "tasks" ADD COLUMN IF NOT EXISTS "recurring_task_id" varchar;
+--> statement-breakpoint
+ALTER TABLE "tasks" ADD COLUMN IF NOT EXISTS "occurrence_date" date;
+--> statement-breakpoint
+ALTER TABLE "tasks" ADD COLUMN IF NOT EXISTS "next_occurrence_at" timestamp;
+--> statement-breakpoint
+CREATE UNIQUE INDEX IF NOT EXISTS "ix_tasks_recurring_task_occurrence" ON "tasks" ("recurring_task_id", "occurrence_date");
+--> statement-breakpoint
+CREATE INDEX IF NOT EXISTS "ix_tasks_next_occurrence_at" ON "tasks" ("next_occurrence_at") WHERE is_recurring AND recurring_schedule IS NOT NULL;
@@ -0,0 +1,2 @@
+-- requires column: goals.related_task_ids
+CREATE INDEX IF NOT EXISTS "ix_goals_related_task_ids" ON "goals" USING gin ("related_task_ids");
@@ -0,0 +1,70 @@
+-- goal_tasks and subjects (created by create_all) replace the
+-- related_task_ids and custom_subjects arrays. The backfill is plain
+-- INSERT ... SELECT: it reads goals and user_settings without blocking their
+-- writers, and ON CONFLICT makes it safe to run again. The arrays are left in
+-- place, no longer written, so the previous release keeps working during a
+-- rolling deploy; a later migration drops them.
+CREATE OR REPLACE FUNCTION bump_goal_versions_new() RETURNS trigger AS $$
+BEGIN
+	INSERT INTO table_versions (table_name, user_id, version, updated_at)
+	SELECT 'goals', changed.user_id, 1, now() AT TIME ZONE 'UTC'
+	FROM (SELECT DISTINCT goals.user_id FROM goals JOIN new_rows ON new_rows.goal_id = goals.id) changed
+	ON CONFLICT (table_name, user_id) DO UPDATE
+	SET version = table_versions.version + 1, updated_at = now() AT TIME ZONE 'UTC';
+	RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+--> statement-breakpoint
+CREATE OR REPLACE FUNCTION bump_goal_versions_old() RETURNS trigger AS $$
+BEGIN
+	INSERT INTO table_versions (table_name, user_id, version, updated_at)
+	SELECT 'goals', changed.user_id, 1, now() AT TIME ZONE 'UTC'
+	FROM (SELECT DISTINCT goals.user_id FROM goals JOIN old_rows ON old_rows.goal_id = goals.id) changed
+	ON CONFLICT (table_name, user_id) DO UPDATE
+	SET version = table_versions.version + 1, updated_at = now() AT TIME ZONE 'UTC';
+	RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+--> statement-breakpoint
+-- A goal's related tasks are part of the goal, so link changes bump the
+-- goals version.
+DROP TRIGGER IF EXISTS "goal_tasks_bump_version_insert" ON "goal_tasks";
+--> statement-breakpoint
+CREATE TRIGGER "goal_tasks_bump_version_insert" AFTER INSERT ON "goal_tasks" REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION bump_goal_versions_new();
+--> statement-breakpoint
+DROP TRIGGER IF EXISTS "goal_tasks_bump_version_update" ON "goal_tasks";
+--> statement-breakpoint
+CREATE TRIGGER "goal_tasks_bump_version_update" AFTER UPDATE ON "goal_tasks" REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION bump_goal_versions_new();
+--> statement-breakpoint
+DROP TRIGGER IF EXISTS "goal_tasks_bump_version_delete" ON "goal_tasks";
+--> statement-breakpoint
+CREATE TRIGGER "goal_tasks_bump_version_delete" AFTER DELETE ON "goal_tasks" REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION bump_goal_versions_old();
+--> statement-breakpoint
+-- requires column: goals.related_task_ids
+-- Links keep the array's order; ids that are not tasks of the goal's owner
+-- are dropped.
+INSERT INTO goal_tasks (goal_id, task_id, position)
+SELECT goals.id, related.task_id, min(related.position) - 1
+FROM goals
+CROSS JOIN LATERAL unnest(goals.related_task_ids) WITH ORDINALITY AS related(task_id, position)
+JOIN tasks ON tasks.id = related.task_id AND tasks.user_id = goals.user_id
+GROUP BY goals.id, related.task_id
+ON CONFLICT DO NOTHING;
+--> statement-breakpoint
+-- Declared on SQLite only in the model: create_all runs before 0004 has
+-- added user_settings.user_id to older databases.
+ALTER TABLE "subjects" ADD CONSTRAINT "subjects_user_id_fkey" FOREIGN KEY ("user_id") REFERENCES "user_settings" ("user_id") ON DELETE CASCADE;
+--> statement-breakpoint
+-- requires column: user_settings.custom_subjects
+INSERT INTO subjects (user_id, name, position)
+SELECT user_settings.user_id, subject.name, min(subject.position) - 1
+FROM user_settings
+CROSS JOIN LATERAL unnest(user_settings.custom_subjects) WITH ORDINALITY AS subject(name, position)
+WHERE subject.name IS NOT NULL
+GROUP BY user_settings.user_id, subject.name
+ON CONFLICT DO NOTHING;
+--> statement-breakpoint
+-- Reverse lookups from a task to its goals go through goal_tasks now.
+DROP INDEX IF EXISTS "ix_goals_related_task_ids";
+--> statement-breakpoint
+CREATE INDEX IF NOT EXISTS "ix_tasks_user_subject" ON "tasks" ("user_id", "subject");
@@ -0,0 +1,62 @@
+-- Pomodoro sessions are partitioned by the month of created_at, so range
+-- queries read only the months they cover and old months are dropped whole
+-- (api.pomodoro). Sessions outside every monthly partition land in the
+-- default partition until their month is created, which moves them over
+-- first: attaching a partition fails while the default one holds its rows.
+CREATE OR REPLACE FUNCTION create_pomodoro_sessions_partition(month timestamp) RETURNS boolean AS $$
+DECLARE
+	start_at timestamp := date_trunc('month', month);
+	end_at timestamp := start_at + interval '1 month';
+	partition_name text := 'pomodoro_sessions_' || to_char(start_at, 'YYYY_MM');
+BEGIN
+	-- Workers maintaining the partitions at the same time take turns.
+	PERFORM pg_advisory_xact_lock(hashtext('pomodoro_sessions_partitions'));
+	IF to_regclass(partition_name) IS NOT NULL THEN
+		RETURN false;
+	END IF;
+	-- Built with quote_ident/quote_literal: the migration runner's driver
+	-- would read format()'s placeholders as query parameters.
+	EXECUTE 'CREATE TABLE ' || quote_ident(partition_name) || ' (LIKE pomodoro_sessions INCLUDING DEFAULTS)';
+	EXECUTE 'WITH moved AS (DELETE FROM pomodoro_sessions_default'
+		|| ' WHERE created_at >= ' || quote_literal(start_at) || ' AND created_at < ' || quote_literal(end_at)
+		|| ' RETURNING *) INSERT INTO ' || quote_ident(partition_name) || ' SELECT * FROM moved';
+	EXECUTE 'ALTER TABLE pomodoro_sessions ATTACH PARTITION ' || quote_ident(partition_name)
+		|| ' FOR VALUES FROM (' || quote_literal(start_at) || ') TO (' || quote_literal(end_at) || ')';
+	RETURN true;
+END;
+$$ LANGUAGE plpgsql;
+--> statement-breakpoint
+-- Databases created before this migration have a plain table: it is
+-- replaced by a partitioned one, with a partition for every month it has
+-- sessions in, and its rows are copied over. Its indexes and primary key
+-- go first, as their names are taken by the new table's.
+DO $$
+BEGIN
+	IF (SELECT relkind FROM pg_class WHERE oid = 'pomodoro_sessions'::regclass) = 'r' THEN
+		ALTER TABLE pomodoro_sessions RENAME TO pomodoro_sessions_unpartitioned;
+		ALTER TABLE pomodoro_sessions_unpartitioned DROP CONSTRAINT pomodoro_sessions_pkey;
+		DROP INDEX IF EXISTS ix_pomodoro_sessions_user_completed_at;
+		DROP INDEX IF EXISTS ix_pomodoro_sessions_user_created_at;
+
+		CREATE TABLE pomodoro_sessions (LIKE pomodoro_sessions_unpartitioned INCLUDING DEFAULTS)
+		PARTITION BY RANGE (created_at);
+		ALTER TABLE pomodoro_sessions ADD PRIMARY KEY (id, created_at);
+		CREATE TABLE pomodoro_sessions_default PARTITION OF pomodoro_sessions DEFAULT;
+		PERFORM create_pomodoro_sessions_partition(month)
+		FROM (SELECT DISTINCT date_trunc('month', created_at) AS month FROM pomodoro_sessions_unpartitioned) months;
+		INSERT INTO pomodoro_sessions SELECT * FROM pomodoro_sessions_unpartitioned;
+		DROP TABLE pomodoro_sessions_unpartitioned;
+
+		CREATE TRIGGER pomodoro_sessions_bump_version_insert AFTER INSERT ON pomodoro_sessions REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION bump_user_table_versions_new();
+		CREATE TRIGGER pomodoro_sessions_bump_version_update AFTER UPDATE ON pomodoro_sessions REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION bump_user_table_versions_new();
+		CREATE TRIGGER pomodoro_sessions_bump_version_delete AFTER DELETE ON pomodoro_sessions REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION bump_user_table_versions_old();
+		CREATE TRIGGER pomodoro_sessions_bump_version_truncate AFTER TRUNCATE ON pomodoro_sessions FOR EACH STATEMENT EXECUTE FUNCTION bump_all_table_versions();
+	END IF;
+END;
+$$;
+--> statement-breakpoint
+CREATE TABLE IF NOT EXISTS "pomodoro_sessions_default" PARTITION OF "pomodoro_sessions" DEFAULT;
+--> statement-breakpoint
+CREATE INDEX IF NOT EXISTS "ix_pomodoro_sessions_user_completed_at" ON "pomodoro_sessions" ("user_id", "completed_at") INCLUDE ("focus_duration") WHERE "was_completed";
+--> statement-breakpoint
+CREATE INDEX IF NOT EXISTS "ix_pomodoro_sessions_user_created_at" ON "pomodoro_sessions" ("user_id", "created_at");
@@ -0,0 +1,5 @@
+-- The jobs table (created by create_all) is a queue: each row is updated a
+-- few times and deleted a week after it finishes, so autovacuum should clean
+-- it up long before a fifth of the table (the default) is dead rows, and updates
+-- leave room on the page for the new row version.
+ALTER TABLE "jobs" SET (autovacuum_vacuum_scale_factor = 0.01, autovacuum_vacuum_threshold = 100, fillfactor = 70);
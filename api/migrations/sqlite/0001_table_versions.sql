@@ -0,0 +1,97 @@
+-- Row-level counterparts of the statement triggers from migration 0004:
+-- every write to a tracked table bumps that user's version of it.
+CREATE TRIGGER IF NOT EXISTS "tasks_bump_version_insert" AFTER INSERT ON "tasks" FOR EACH ROW
+BEGIN
+	INSERT INTO table_versions (table_name, user_id, version, updated_at)
+	VALUES ('tasks', NEW.user_id, 1, strftime('%Y-%m-%d %H:%M:%f', 'now'))
+	ON CONFLICT (table_name, user_id) DO UPDATE
+	SET version = table_versions.version + 1, updated_at = excluded.updated_at;
+END;
+--> statement-breakpoint
+CREATE TRIGGER IF NOT EXISTS "tasks_bump_version_update" AFTER UPDATE ON "tasks" FOR EACH ROW
+BEGIN
+	INSERT INTO table_versions (table_name, user_id, version, updated_at)
+	VALUES ('tasks', NEW.user_id, 1, strftime('%Y-%m-%d %H:%M:%f', 'now'))
+	ON CONFLICT (table_name, user_id) DO UPDATE
+	SET version = table_versions.version + 1, updated_at = excluded.updated_at;
+END;
+--> statement-breakpoint
+CREATE TRIGGER IF NOT EXISTS "tasks_bump_version_delete" AFTER DELETE ON "tasks" FOR EACH ROW
+BEGIN
+	INSERT INTO table_versions (table_name, user_id, version, updated_at)
+	VALUES ('tasks', OLD.user_id, 1, strftime('%Y-%m-%d %H:%M:%f', 'now'))
+	ON CONFLICT (table_name, user_id) DO UPDATE
+	SET version = table_versions.version + 1, updated_at = excluded.updated_at;
+END;
+--> statement-breakpoint
+CREATE TRIGGER IF NOT EXISTS "goals_bump_version_insert" AFTER INSERT ON "goals" FOR EACH ROW
+BEGIN
+	INSERT INTO table_versions (table_name, user_id, version, updated_at)
+	VALUES ('goals', NEW.user_id, 1, strftime('%Y-%m-%d %H:%M:%f', 'now'))
+	ON CONFLICT (table_name, user_id) DO UPDATE
+	SET version = table_versions.version + 1, updated_at = excluded.updated_at;
+END;
+--> statement-breakpoint
+CREATE TRIGGER IF NOT EXISTS "goals_bump_version_update" AFTER UPDATE ON "goals" FOR EACH ROW
+BEGIN
+	INSERT INTO table_versions (table_name, user_id, version, updated_at)
+	VALUES ('goals', NEW.user_id, 1, strftime('%Y-%m-%d %H:%M:%f', 'now'))
+	ON CONFLICT (table_name, user_id) DO UPDATE
+	SET version = table_versions.version + 1, updated_at = excluded.updated_at;
+END;
+--> statement-breakpoint
+CREATE TRIGGER IF NOT EXISTS "goals_bump_version_delete" AFTER DELETE ON "goals" FOR EACH ROW
+BEGIN
+	INSERT INTO table_versions (table_name, user_id, version, updated_at)
+	VALUES ('goals', OLD.user_id, 1, strftime('%Y-%m-%d %H:%M:%f', 'now'))
+	ON CONFLICT (table_name, user_id) DO UPDATE
+	SET version = table_versions.version + 1, updated_at = excluded.updated_at;
+END;
+--> statement-breakpoint
+CREATE TRIGGER IF NOT EXISTS "pomodoro_sessions_bump_version_insert" AFTER INSERT ON "pomodoro_sessions" FOR EACH ROW
+BEGIN
+	INSERT INTO table_versions (table_name, user_id, version, updated_at)
+	VALUES ('pomodoro_sessions', NEW.user_id, 1, strftime('%Y-%m-%d %H:%M:%f', 'now'))
+	ON CONFLICT (table_name, user_id) DO UPDATE
+	SET version = table_versions.version + 1, updated_at = excluded.updated_at;
+END;
+--> statement-breakpoint
+CREATE TRIGGER IF NOT EXISTS "pomodoro_sessions_bump_version_update" AFTER UPDATE ON "pomodoro_sessions" FOR EACH ROW
+BEGIN
+	INSERT INTO table_versions (table_name, user_id, version, updated_at)
+	VALUES ('pomodoro_sessions', NEW.user_id, 1, strftime('%Y-%m-%d %H:%M:%f', 'now'))
+	ON CONFLICT (table_name, user_id) DO UPDATE
+	SET version = table_versions.version + 1, updated_at = excluded.updated_at;
+END;
+--> statement-breakpoint
+CREATE TRIGGER IF NOT EXISTS "pomodoro_sessions_bump_version_delete" AFTER DELETE ON "pomodoro_sessions" FOR EACH ROW
+BEGIN
+	INSERT INTO table_versions (table_name, user_id, version, updated_at)
+	VALUES ('pomodoro_sessions', OLD.user_id, 1, strftime('%Y-%m-%d %H:%M:%f', 'now'))
+	ON CONFLICT (table_name, user_id) DO UPDATE
+	SET version = table_versions.version + 1, updated_at = excluded.updated_at;
+END;
+--> statement-breakpoint
+CREATE TRIGGER IF NOT EXISTS "user_settings_bump_version_insert" AFTER INSERT ON "user_settings" FOR EACH ROW
+BEGIN
+	INSERT INTO table_versions (table_name, user_id, version, updated_at)
+	VALUES ('user_settings', NEW.user_id, 1, strftime('%Y-%m-%d %H:%M:%f', 'now'))
+	ON CONFLICT (table_name, user_id) DO UPDATE
+	SET version = table_versions.version + 1, updated_at = excluded.updated_at;
+END;
+--> statement-breakpoint
+CREATE TRIGGER IF NOT EXISTS "user_settings_bump_version_update" AFTER UPDATE ON "user_settings" FOR EACH ROW
+BEGIN
+	INSERT INTO table_versions (table_name, user_id, version, updated_at)
+	VALUES ('user_settings', NEW.user_id, 1, strftime('%Y-%m-%d %H:%M:%f', 'now'))
+	ON CONFLICT (table_name, user_id) DO UPDATE
+	SET version = table_versions.version + 1, updated_at = excluded.updated_at;
+END;
+--> statement-breakpoint
+CREATE TRIGGER IF NOT EXISTS "user_settings_bump_version_delete" AFTER DELETE ON "user_settings" FOR EACH ROW
+BEGIN
+	INSERT INTO table_versions (table_name, user_id, version, updated_at)
+	VALUES ('user_settings', OLD.user_id, 1, strftime('%Y-%m-%d %H:%M:%f', 'now'))
+	ON CONFLICT (table_name, user_id) DO UPDATE
+	SET version = table_versions.version + 1, updated_at = excluded.updated_at;
+END;
@@ -0,0 +1,47 @@
+-- Counterpart of migration 0008: link changes bump the goals version, and
+-- databases created before goal_tasks and subjects get their arrays
+-- backfilled. The arrays are left in place, no longer written.
+CREATE TRIGGER IF NOT EXISTS "goal_tasks_bump_version_insert" AFTER INSERT ON "goal_tasks" FOR EACH ROW
+BEGIN
+	INSERT INTO table_versions (table_name, user_id, version, updated_at)
+	SELECT 'goals', user_id, 1, strftime('%Y-%m-%d %H:%M:%f', 'now') FROM goals WHERE id = NEW.goal_id
+	ON CONFLICT (table_name, user_id) DO UPDATE
+	SET version = table_versions.version + 1, updated_at = excluded.updated_at;
+END;
+--> statement-breakpoint
+CREATE TRIGGER IF NOT EXISTS "goal_tasks_bump_version_update" AFTER UPDATE ON "goal_tasks" FOR EACH ROW
+BEGIN
+	INSERT INTO table_versions (table_name, user_id, version, updated_at)
+	SELECT 'goals', user_id, 1, strftime('%Y-%m-%d %H:%M:%f', 'now') FROM goals WHERE id = NEW.goal_id
+	ON CONFLICT (table_name, user_id) DO UPDATE
+	SET version = table_versions.version + 1, updated_at = excluded.updated_at;
+END;
+--> statement-breakpoint
+CREATE TRIGGER IF NOT EXISTS "goal_tasks_bump_version_delete" AFTER DELETE ON "goal_tasks" FOR EACH ROW
+BEGIN
+	INSERT INTO table_versions (table_name, user_id, version, updated_at)
+	SELECT 'goals', user_id, 1, strftime('%Y-%m-%d %H:%M:%f', 'now') FROM goals WHERE id = OLD.goal_id
+	ON CONFLICT (table_name, user_id) DO UPDATE
+	SET version = table_versions.version + 1, updated_at = excluded.updated_at;
+END;
+--> statement-breakpoint
+-- requires column: goals.related_task_ids
+INSERT INTO goal_tasks (goal_id, task_id, position)
+SELECT goals.id, related.value, min(related.key)
+FROM goals
+CROSS JOIN json_each(goals.related_task_ids) AS related
+CROSS JOIN tasks ON tasks.id = related.value AND tasks.user_id = goals.user_id
+WHERE goals.related_task_ids IS NOT NULL
+GROUP BY goals.id, related.value
+ON CONFLICT DO NOTHING;
+--> statement-breakpoint
+-- requires column: user_settings.custom_subjects
+INSERT INTO subjects (user_id, name, position)
+SELECT user_settings.user_id, subject.value, min(subject.key)
+FROM user_settings
+CROSS JOIN json_each(user_settings.custom_subjects) AS subject
+WHERE subject.value IS NOT NULL
+GROUP BY user_settings.user_id, subject.value
+ON CONFLICT DO NOTHING;
+--> statement-breakpoint
+CREATE INDEX IF NOT EXISTS "ix_tasks_user_subject" ON "tasks" ("user_id", "subject");
@@ -0,0 +1,2 @@
+-- Counterpart of migration 0010. The jobs table comes from create_all, which
+-- runs when a migration is pending; SQLite needs nothing else.
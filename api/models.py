@@ -1,12 +1,27 @@
-from sqlalchemy import Column, String, Text, Integer, Boolean, DateTime, ARRAY, func
+from sqlalchemy import Column, Computed, ForeignKey, ForeignKeyConstraint, JSON, String, Text, Integer, BigInteger, Boolean, Date, DateTime, Index, select, text
 from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import column_property, deferred
 from api.database import Base
+from api.dialects import SearchVector, TextArray, array_of, localnow, search_document, utcnow
 import uuid
 
+# Weighted full-text documents for /api/search; migration 0005 adds the same
+# generated columns to existing databases.
+TASK_SEARCH_DOCUMENT = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(subject, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'C')"
+)
+GOAL_SEARCH_DOCUMENT = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'C')"
+)
+
 class Task(Base):
     __tablename__ = "tasks"
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = Column(Text, nullable=False)
     title = Column(Text, nullable=False)
     description = Column(Text)
     status = Column(Text, nullable=False, default="pending")
@@ -16,41 +31,119 @@ class Task(Base):
     estimated_duration = Column(Integer)
     actual_duration = Column(Integer)
     parent_task_id = Column(String)
-    resources = Column(ARRAY(Text))
+    resources = Column(TextArray)
     is_recurring = Column(Boolean, default=False)
     recurring_schedule = Column(Text)
     completed_at = Column(DateTime)
-    created_at = Column(DateTime, nullable=False, server_default=func.now())
+    created_at = Column(DateTime, nullable=False, server_default=localnow())
+    search_vector = deferred(Column(SearchVector, Computed(search_document(TASK_SEARCH_DOCUMENT), persisted=True)))
+    # Set on tasks the recurrence scheduler materialized from a recurring
+    # task; together they are the idempotency key of an occurrence.
+    recurring_task_id = Column(String)
+    occurrence_date = Column(Date)
+    # Scheduler state on recurring tasks: the next occurrence not yet
+    # materialized, or NULL until the scheduler first picks the task up.
+    next_occurrence_at = Column(DateTime, info={"internal": True})
+    
+    # Every query is scoped to one user, so all indexes lead with user_id.
+    __table_args__ = (
+        Index("ix_tasks_user_status_completed_at", "user_id", "status", "completed_at"),
+        Index(
+            "ix_tasks_user_completed_subject", "user_id", "subject",
+            postgresql_include=["actual_duration"],
+            postgresql_where=(status == "completed"),
+            sqlite_where=(status == "completed"),
+        ),
+        Index(
+            "ix_tasks_user_parent_task_id", "user_id", "parent_task_id",
+            postgresql_where=parent_task_id.isnot(None),
+            sqlite_where=parent_task_id.isnot(None),
+        ),
+        Index("ix_tasks_user_created_at_id", "user_id", "created_at", "id"),
+        Index("ix_tasks_user_deadline_id", "user_id", "deadline", "id"),
+        # Subject renames rewrite every task of the old subject in one update.
+        Index("ix_tasks_user_subject", "user_id", "subject"),
+        Index("ix_tasks_search_vector", "search_vector", postgresql_using="gin").ddl_if(dialect="postgresql"),
+        Index("ix_tasks_recurring_task_occurrence", "recurring_task_id", "occurrence_date", unique=True),
+        Index(
+            "ix_tasks_next_occurrence_at", "next_occurrence_at",
+            postgresql_where=text("is_recurring AND recurring_schedule IS NOT NULL"),
+            # SQLite only uses a partial index whose terms appear in the
+            # query as written, and is_(True) renders as "IS 1" there.
+            sqlite_where=is_recurring.is_(True) & recurring_schedule.isnot(None),
+        ),
+    )
 
 class Goal(Base):
     __tablename__ = "goals"
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = Column(Text, nullable=False)
     title = Column(Text, nullable=False)
     description = Column(Text)
     type = Column(Text, nullable=False)
     target_date = Column(DateTime, nullable=False)
     status = Column(Text, nullable=False, default="active")
     progress = Column(Integer, nullable=False, default=0)
-    related_task_ids = Column(ARRAY(Text))
     completed_at = Column(DateTime)
-    created_at = Column(DateTime, nullable=False, server_default=func.now())
+    created_at = Column(DateTime, nullable=False, server_default=localnow())
+    search_vector = deferred(Column(SearchVector, Computed(search_document(GOAL_SEARCH_DOCUMENT), persisted=True)))
+    
+    __table_args__ = (
+        Index("ix_goals_user_created_at", "user_id", "created_at"),
+        Index("ix_goals_search_vector", "search_vector", postgresql_using="gin").ddl_if(dialect="postgresql"),
+    )
+
+class GoalTask(Base):
+    __tablename__ = "goal_tasks"
+    
+    # A goal's related tasks, in the order the client listed them. Both ends
+    # cascade, so deleting a task or a goal drops its links.
+    goal_id = Column(String, ForeignKey("goals.id", ondelete="CASCADE"), primary_key=True)
+    task_id = Column(String, ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True)
+    position = Column(Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        # Reverse lookup from a task to the goals that list it.
+        Index("ix_goal_tasks_task_id", "task_id"),
+    )
 
 class PomodoroSession(Base):
     __tablename__ = "pomodoro_sessions"
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = Column(Text, nullable=False)
     task_id = Column(String)
     focus_duration = Column(Integer, nullable=False)
     break_duration = Column(Integer, nullable=False)
     was_completed = Column(Boolean, nullable=False, default=False)
     completed_at = Column(DateTime)
-    created_at = Column(DateTime, nullable=False, server_default=func.now())
+    # PostgreSQL partitions sessions by the month of created_at (see
+    # api.pomodoro), and a partitioned table's primary key has to include the
+    # partition key. Rows are still identified by their id.
+    created_at = Column(DateTime, primary_key=True, nullable=False, server_default=localnow())
+    
+    __table_args__ = (
+        Index(
+            "ix_pomodoro_sessions_user_completed_at", "user_id", "completed_at",
+            postgresql_include=["focus_duration"],
+            postgresql_where=was_completed,
+            sqlite_where=was_completed.is_(True),
+        ),
+        Index("ix_pomodoro_sessions_user_created_at", "user_id", "created_at"),
+        # SQLite has no partitions, so ids stay unique there. On PostgreSQL
+        # the writers keep them unique: new sessions get a fresh uuid, and the
+        # importer skips ids that exist (api.importer.DEDUPED_BY_ID).
+        Index("ix_pomodoro_sessions_id", "id", unique=True).ddl_if(dialect="sqlite"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+    __mapper_args__ = {"primary_key": [id]}
 
 class UserSettings(Base):
     __tablename__ = "user_settings"
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = Column(Text, nullable=False)
     pomodoro_focus_duration = Column(Integer, nullable=False, default=25)
     pomodoro_break_duration = Column(Integer, nullable=False, default=5)
     theme = Column(Text, nullable=False, default="dark")
@@ -59,5 +152,85 @@ class UserSettings(Base):
     current_streak = Column(Integer, nullable=False, default=0)
     longest_streak = Column(Integer, nullable=False, default=0)
     last_study_date = Column(DateTime)
-    custom_subjects = Column(ARRAY(Text), default=lambda: ["Math", "Physics", "Chemistry", "Biology", "History", "English", "Computer Science", "Other"])
-    updated_at = Column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now())
+    updated_at = Column(DateTime, nullable=False, server_default=localnow(), onupdate=localnow())
+    
+    __table_args__ = (
+        Index("ix_user_settings_user_id", "user_id", unique=True),
+    )
+
+class Subject(Base):
+    __tablename__ = "subjects"
+    
+    # A user's subject list, in display order; see api.subjects.
+    user_id = Column(Text, primary_key=True)
+    name = Column(Text, primary_key=True)
+    position = Column(Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        # On PostgreSQL migration 0008 adds the foreign key: create_all runs
+        # before the migrations, and on older databases user_settings.user_id
+        # only exists once 0004 has added it.
+        ForeignKeyConstraint(["user_id"], ["user_settings.user_id"], ondelete="CASCADE").ddl_if(dialect="sqlite"),
+    )
+
+# The lists the API exposes as arrays, read from the relation tables in the
+# same query as their row. They are read-only: writes go through
+# api.goal_progress.set_related_tasks and api.subjects.
+Goal.related_task_ids = column_property(array_of(
+    select(GoalTask.task_id.label("item")).where(GoalTask.goal_id == Goal.id).order_by(GoalTask.position).scalar_subquery()
+))
+UserSettings.custom_subjects = column_property(array_of(
+    select(Subject.name.label("item")).where(Subject.user_id == UserSettings.user_id)
+    .order_by(Subject.position, Subject.name).scalar_subquery()
+))
+
+class DailyStats(Base):
+    __tablename__ = "daily_stats"
+    
+    user_id = Column(Text, primary_key=True)
+    date = Column(Date, primary_key=True)
+    subject = Column(Text, primary_key=True, default="")
+    minutes_studied = Column(Integer, nullable=False, default=0)
+    tasks_completed = Column(Integer, nullable=False, default=0)
+    pomodoro_sessions_completed = Column(Integer, nullable=False, default=0)
+
+class TableVersion(Base):
+    __tablename__ = "table_versions"
+    
+    # Bumped per (table, user) by the statement triggers from migration 0004
+    # (row triggers on SQLite) on every write to the tracked tables; drives ETag/Last-Modified.
+    # updated_at is UTC so it can be sent as an HTTP date as-is.
+    table_name = Column(Text, primary_key=True)
+    user_id = Column(Text, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False, server_default=utcnow())
+
+# Jobs a worker may claim, written the same way in the partial index and in
+# the claim query so SQLite can use the index.
+JOB_PENDING = "status IN ('queued', 'running')"
+
+class Job(Base):
+    __tablename__ = "jobs"
+    
+    # Work run outside the request by api.jobs: queued -> running ->
+    # succeeded | failed, and back to queued while retries are left. For a
+    # queued job run_after is when it may run; for a running one, when its
+    # worker's lease runs out and another worker may take it over.
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = Column(Text, nullable=False)
+    kind = Column(Text, nullable=False)
+    payload = Column(JSON)
+    status = Column(Text, nullable=False, default="queued")
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    run_after = Column(DateTime, nullable=False, server_default=localnow())
+    error = Column(Text)
+    result = Column(JSON)
+    created_at = Column(DateTime, nullable=False, server_default=localnow())
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    
+    __table_args__ = (
+        Index("ix_jobs_pending", "run_after", postgresql_where=text(JOB_PENDING), sqlite_where=text(JOB_PENDING)),
+        Index("ix_jobs_user_created_at", "user_id", "created_at"),
+    )
@@ -0,0 +1,70 @@
+import base64
+import json
+from datetime import datetime
+from fastapi import HTTPException
+from sqlalchemy import and_, or_, tuple_
+
+SORT_COLUMNS = ("created_at", "deadline")
+SORT_ORDERS = ("asc", "desc")
+MAX_PAGE_SIZE = 500
+
+def encode_cursor(sort: str, order: str, value, row_id: str) -> str:
+    payload = {
+        "s": sort,
+        "o": order,
+        "v": value.isoformat() if value is not None else None,
+        "id": row_id,
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, sort: str, order: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value = datetime.fromisoformat(payload["v"]) if payload["v"] is not None else None
+        row_id = payload["id"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if payload.get("s") != sort or payload.get("o") != order:
+        raise HTTPException(status_code=400, detail="Cursor does not match sort order")
+
+    return value, row_id
+
+def order_by_clauses(sort_column, id_column, order: str):
+    # A NOT NULL sort key is ordered plainly: PostgreSQL can only walk a
+    # (user_id, key, id) index backwards as DESC NULLS FIRST.
+    if not sort_column.nullable:
+        if order == "desc":
+            return [sort_column.desc(), id_column.desc()]
+        return [sort_column.asc(), id_column.asc()]
+    if order == "desc":
+        return [sort_column.desc().nulls_last(), id_column.desc()]
+    return [sort_column.asc().nulls_last(), id_column.asc()]
+
+def keyset_filter(sort_column, id_column, order: str, value, row_id: str):
+    # Without NULLs to place, one row-value comparison, which both backends
+    # turn into a range on the (user_id, key, id) index.
+    if not sort_column.nullable and value is not None:
+        if order == "desc":
+            return tuple_(sort_column, id_column) < tuple_(value, row_id)
+        return tuple_(sort_column, id_column) > tuple_(value, row_id)
+
+    # Rows with a NULL sort key always come last, in id order, whichever
+    # direction the sort runs in.
+    if value is None:
+        after_id = id_column < row_id if order == "desc" else id_column > row_id
+        return and_(sort_column.is_(None), after_id)
+
+    if order == "desc":
+        return or_(
+            sort_column < value,
+            and_(sort_column == value, id_column < row_id),
+            sort_column.is_(None),
+        )
+    return or_(
+        sort_column > value,
+        and_(sort_column == value, id_column > row_id),
+        sort_column.is_(None),
+    )
@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import os
+from datetime import date, datetime, time, timedelta
+from typing import List, NamedTuple, Optional
+from sqlalchemy import delete, func, select, text, update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from api import models
+from api.dialects import date_bucket, is_true, utcnow
+
+logger = logging.getLogger(__name__)
+
+# On PostgreSQL pomodoro_sessions is partitioned by the month of created_at
+# (migration 0009): range queries read only the partitions they cover, and
+# pruning drops whole months instead of deleting rows. SQLite keeps one
+# table, read through the (user_id, created_at) index, and prunes by DELETE.
+SESSION_MAINTENANCE = os.getenv("SESSION_MAINTENANCE", "true").lower() in ("1", "true", "yes")
+SESSION_MAINTENANCE_INTERVAL = float(os.getenv("SESSION_MAINTENANCE_INTERVAL", "3600"))
+# Monthly partitions kept ready beyond the current month.
+SESSION_PARTITIONS_AHEAD = int(os.getenv("SESSION_PARTITIONS_AHEAD", "3"))
+# Sessions from before this many months ago are pruned; 0 keeps them all.
+SESSION_RETENTION_MONTHS = int(os.getenv("SESSION_RETENTION_MONTHS", "0"))
+
+PARTITION_PREFIX = "pomodoro_sessions_"
+DEFAULT_PARTITION = "pomodoro_sessions_default"
+
+class Maintenance(NamedTuple):
+    created: List[date]
+    dropped: List[date]
+    deleted: int
+
+def session_filters(
+    user_id: str,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    task_id: Optional[str] = None,
+    completed: Optional[bool] = None,
+) -> list:
+    # Sessions are placed in time by created_at, the partition key; both
+    # ends of the range are inclusive days.
+    Pomodoro = models.PomodoroSession
+    filters = [Pomodoro.user_id == user_id]
+    if date_from is not None:
+        filters.append(Pomodoro.created_at >= datetime.combine(date_from, time.min))
+    if date_to is not None:
+        filters.append(Pomodoro.created_at < datetime.combine(date_to + timedelta(days=1), time.min))
+    if task_id is not None:
+        filters.append(Pomodoro.task_id == task_id)
+    if completed is not None:
+        filters.append(is_true(Pomodoro.was_completed) if completed else Pomodoro.was_completed.is_(False))
+    return filters
+
+def stats_query(filters: list, bucket: str, by_task: bool = False):
+    # One row per day, week or month (and task, if asked) with sessions.
+    Pomodoro = models.PomodoroSession
+    groups = [date_bucket(bucket, Pomodoro.created_at).label("period")]
+    order = list(groups)
+    if by_task:
+        groups.append(Pomodoro.task_id)
+        # Sessions without a task come last on both backends.
+        order.append(Pomodoro.task_id.nulls_last())
+    return (
+        select(
+            *groups,
+            func.count().label("sessions"),
+            func.count().filter(Pomodoro.was_completed.is_(True)).label("completed_sessions"),
+            func.coalesce(func.sum(Pomodoro.focus_duration), 0).label("focus_minutes"),
+            func.coalesce(func.sum(Pomodoro.break_duration), 0).label("break_minutes"),
+        )
+        .where(*filters)
+        .group_by(*groups)
+        .order_by(*order)
+    )
+
+def _month(day: date, offset: int = 0) -> date:
+    index = day.year * 12 + day.month - 1 + offset
+    return date(index // 12, index % 12 + 1, 1)
+
+def partition_months(db: Session) -> List[date]:
+    names = db.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = 'pomodoro_sessions'::regclass"
+    )).scalars()
+    return sorted(
+        datetime.strptime(name[len(PARTITION_PREFIX):], "%Y_%m").date()
+        for name in names if name != DEFAULT_PARTITION
+    )
+
+def maintain_sessions(
+    db: Session,
+    today: Optional[date] = None,
+    ahead: int = SESSION_PARTITIONS_AHEAD,
+    retention_months: int = SESSION_RETENTION_MONTHS,
+) -> Maintenance:
+    # Creates the partitions for this month, the next `ahead` ones and any
+    # month that has sessions waiting in the default partition (imported
+    # history, say), then prunes what is past the retention. Each partition
+    # is created in its own transaction, so the default partition is locked
+    # only while one month's rows move out of it.
+    today = today or date.today()
+    cutoff = _month(today, -retention_months) if retention_months > 0 else None
+    postgresql = db.get_bind().dialect.name == "postgresql"
+    created, dropped = [], []
+
+    if postgresql:
+        months = {_month(today, offset) for offset in range(ahead + 1)}
+        months.update(
+            month.date() for month in
+            db.execute(text(f"SELECT DISTINCT date_trunc('month', created_at) FROM {DEFAULT_PARTITION}")).scalars()
+        )
+        for month in sorted(months):
+            if cutoff is not None and month < cutoff:
+                continue
+            if db.execute(select(func.create_pomodoro_sessions_partition(month))).scalar():
+                created.append(month)
+            db.commit()
+
+    if cutoff is None:
+        return Maintenance(created, dropped, 0)
+
+    if postgresql:
+        for month in partition_months(db):
+            if month < cutoff:
+                db.execute(text(f'DROP TABLE "{PARTITION_PREFIX}{month:%Y_%m}"'))
+                dropped.append(month)
+        if dropped:
+            # Dropping a partition fires no trigger; every user's sessions
+            # may have changed, as after a TRUNCATE.
+            TableVersion = models.TableVersion
+            db.execute(
+                update(TableVersion)
+                .where(TableVersion.table_name == models.PomodoroSession.__tablename__)
+                .values(version=TableVersion.version + 1, updated_at=utcnow())
+            )
+    # What is left: older sessions in the default partition, or on SQLite.
+    deleted = db.execute(
+        delete(models.PomodoroSession).where(models.PomodoroSession.created_at < datetime.combine(cutoff, time.min))
+    ).rowcount
+    db.commit()
+    return Maintenance(created, dropped, deleted)
+
+def _maintain_in_session() -> Maintenance:
+    from api.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return maintain_sessions(db)
+    finally:
+        db.close()
+
+async def run_maintainer(interval: float = SESSION_MAINTENANCE_INTERVAL):
+    while True:
+        try:
+            maintenance = await run_in_threadpool(_maintain_in_session)
+            if maintenance.created or maintenance.dropped or maintenance.deleted:
+                logger.info(
+                    "Pomodoro sessions: created partitions %s, dropped partitions %s, deleted %d sessions",
+                    maintenance.created, maintenance.dropped, maintenance.deleted,
+                )
+        except Exception:
+            logger.exception("Maintaining pomodoro sessions failed")
+        await asyncio.sleep(interval)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Create upcoming pomodoro session partitions and prune old sessions")
+    parser.add_argument("--ahead", type=int, default=SESSION_PARTITIONS_AHEAD, help="months of partitions to create ahead")
+    parser.add_argument("--retention-months", type=int, default=SESSION_RETENTION_MONTHS, help="months of sessions to keep (0 keeps all)")
+    args = parser.parse_args()
+
+    from api.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        maintenance = maintain_sessions(db, ahead=args.ahead, retention_months=args.retention_months)
+    finally:
+        db.close()
+    print(f"Created {len(maintenance.created)} partitions, dropped {len(maintenance.dropped)}, deleted {maintenance.deleted} sessions")
+    print("Pomodoro sessions maintained successfully!")
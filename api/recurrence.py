@@ -0,0 +1,230 @@
+import asyncio
+import calendar
+import logging
+import os
+import re
+import uuid
+from datetime import datetime, time, timedelta
+from typing import FrozenSet, NamedTuple, Optional
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from api import events, models
+from api.dialects import is_true
+
+logger = logging.getLogger(__name__)
+
+RECURRENCE_SCHEDULER = os.getenv("RECURRENCE_SCHEDULER", "true").lower() in ("1", "true", "yes")
+RECURRENCE_INTERVAL = float(os.getenv("RECURRENCE_INTERVAL", "60"))
+RECURRENCE_HORIZON_DAYS = int(os.getenv("RECURRENCE_HORIZON_DAYS", "14"))
+RECURRENCE_BATCH_SIZE = int(os.getenv("RECURRENCE_BATCH_SIZE", "500"))
+
+# A schedule the scheduler cannot parse parks its task here until the
+# schedule is edited, instead of being retried every tick.
+PARKED = datetime(9999, 12, 31)
+
+WEEKDAYS = {"mon": 0, "tue": 1, "wed": 2, "thu": 3, "fri": 4, "sat": 5, "sun": 6}
+NAMED_SCHEDULES = {
+    "daily": ("day", 1),
+    "weekly": ("week", 1),
+    "monthly": ("month", 1),
+    "yearly": ("month", 12),
+}
+EVERY = re.compile(r"^every (\d{1,3}) (day|week|month)s?$")
+
+class Schedule(NamedTuple):
+    unit: str
+    interval: int
+    weekdays: Optional[FrozenSet[int]] = None
+
+def parse_schedule(schedule: str) -> Schedule:
+    # Accepts "daily", "weekly", "monthly", "yearly", "weekdays",
+    # "every N days|weeks|months" and "weekly:mon,wed,fri".
+    value = schedule.strip().lower()
+    if value in NAMED_SCHEDULES:
+        return Schedule(*NAMED_SCHEDULES[value])
+    if value == "weekdays":
+        return Schedule("week", 1, frozenset(range(5)))
+    if value.startswith("weekly:"):
+        days = [day.strip()[:3] for day in value[len("weekly:"):].split(",")]
+        if days and all(day in WEEKDAYS for day in days):
+            return Schedule("week", 1, frozenset(WEEKDAYS[day] for day in days))
+    match = EVERY.match(value)
+    if match and int(match.group(1)) > 0:
+        return Schedule(match.group(2), int(match.group(1)))
+    raise ValueError(f"Unsupported recurring schedule {schedule!r}")
+
+# Changing any of these re-anchors a recurring task: its next_occurrence_at
+# is cleared and the scheduler computes it again.
+SCHEDULE_FIELDS = {"is_recurring", "recurring_schedule", "deadline"}
+
+def validate_schedule(schedule: Optional[str]) -> Optional[str]:
+    if schedule is not None and schedule.strip():
+        parse_schedule(schedule)
+    return schedule
+
+def _add_months(value: datetime, months: int) -> datetime:
+    month = value.month - 1 + months
+    year = value.year + month // 12
+    month = month % 12 + 1
+    # Clamp to the end of shorter months (Jan 31 -> Feb 28).
+    day = min(value.day, calendar.monthrange(year, month)[1])
+    return value.replace(year=year, month=month, day=day)
+
+def next_occurrence(schedule: Schedule, anchor: datetime, after: datetime) -> datetime:
+    # The first occurrence strictly after both `after` and the anchor; the
+    # recurring task itself is the anchor occurrence.
+    after = max(after, anchor)
+    if schedule.weekdays is not None:
+        day = after.date()
+        while True:
+            candidate = datetime.combine(day, anchor.time())
+            if candidate > after and candidate.weekday() in schedule.weekdays:
+                return candidate
+            day += timedelta(days=1)
+    if schedule.unit == "month":
+        elapsed = (after.year - anchor.year) * 12 + after.month - anchor.month
+        months = max(schedule.interval, elapsed // schedule.interval * schedule.interval)
+        while _add_months(anchor, months) <= after:
+            months += schedule.interval
+        return _add_months(anchor, months)
+    step = timedelta(days=schedule.interval * (7 if schedule.unit == "week" else 1))
+    return anchor + ((after - anchor) // step + 1) * step
+
+def _occurrence(template, occurs_at: datetime) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "user_id": template.user_id,
+        "title": template.title,
+        "description": template.description,
+        "status": "pending",
+        "priority": template.priority,
+        "subject": template.subject,
+        "deadline": occurs_at,
+        "estimated_duration": template.estimated_duration,
+        "parent_task_id": template.parent_task_id,
+        "resources": template.resources,
+        "is_recurring": False,
+        "recurring_task_id": template.id,
+        "occurrence_date": occurs_at.date(),
+    }
+
+def materialize_batch(db: Session, now: datetime, horizon: timedelta, batch_size: int):
+    # Claims up to batch_size recurring tasks whose next occurrence falls
+    # inside the horizon (or that were never scheduled), inserts all of their
+    # occurrences up to the horizon and moves each next_occurrence_at past it.
+    # SKIP LOCKED lets several workers split the due tasks between them, and
+    # the unique (recurring_task_id, occurrence_date) index makes a repeated
+    # insert of an occurrence a no-op.
+    Task = models.Task
+    horizon_end = now + horizon
+    templates = db.execute(
+        select(Task)
+        .where(
+            is_true(Task.is_recurring),
+            Task.recurring_schedule.isnot(None),
+            or_(Task.next_occurrence_at.is_(None), Task.next_occurrence_at <= horizon_end),
+        )
+        .order_by(Task.next_occurrence_at.asc().nulls_first())
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ).scalars().all()
+
+    # The last occurrence already materialized for each task that is being
+    # (re)scheduled, read through ix_tasks_recurring_task_occurrence.
+    unscheduled = [template.id for template in templates if template.next_occurrence_at is None]
+    last_dates = dict(db.execute(
+        select(Task.recurring_task_id, func.max(Task.occurrence_date))
+        .where(Task.recurring_task_id.in_(unscheduled))
+        .group_by(Task.recurring_task_id)
+    ).all()) if unscheduled else {}
+
+    occurrences = []
+    schedules = []
+    for template in templates:
+        try:
+            schedule = parse_schedule(template.recurring_schedule)
+        except ValueError:
+            schedules.append({"id": template.id, "next_occurrence_at": PARKED})
+            continue
+        anchor = template.deadline or template.created_at
+        # A task picked up for the first time starts from now; one already
+        # scheduled also catches up on occurrences missed while no worker ran.
+        # A re-anchored task starts after the occurrences materialized on its
+        # old schedule: the unique key only covers the exact date, so the new
+        # cadence would otherwise add one next to each of them.
+        occurs_at = template.next_occurrence_at
+        if occurs_at is None:
+            after = now
+            if template.id in last_dates:
+                after = max(now, datetime.combine(last_dates[template.id], time.max))
+            occurs_at = next_occurrence(schedule, anchor, after)
+        while occurs_at <= horizon_end:
+            occurrences.append(_occurrence(template, occurs_at))
+            occurs_at = next_occurrence(schedule, anchor, occurs_at)
+        schedules.append({"id": template.id, "next_occurrence_at": occurs_at})
+
+    if occurrences:
+        db.execute(
+            pg_insert(Task).on_conflict_do_nothing(index_elements=["recurring_task_id", "occurrence_date"]),
+            occurrences,
+        )
+    if schedules:
+        db.execute(update(Task), schedules)
+    users = {template.user_id for template in templates}
+    for user_id in {occurrence["user_id"] for occurrence in occurrences}:
+        events.publish(db, user_id, "task.created")
+    db.commit()
+    return len(templates), users
+
+def materialize_due(
+    db: Session,
+    now: Optional[datetime] = None,
+    horizon: timedelta = timedelta(days=RECURRENCE_HORIZON_DAYS),
+    batch_size: int = RECURRENCE_BATCH_SIZE,
+) -> set:
+    # Runs batches until no due recurring task is left; each batch is its own
+    # transaction, so locks are held only for one batch. Returns the ids of
+    # the users whose tasks changed.
+    now = now or datetime.now()
+    users = set()
+    while True:
+        claimed, batch_users = materialize_batch(db, now, horizon, batch_size)
+        users |= batch_users
+        if claimed < batch_size:
+            return users
+
+def _materialize_in_session() -> set:
+    from api.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return materialize_due(db)
+    finally:
+        db.close()
+
+async def run_scheduler(interval: float = RECURRENCE_INTERVAL):
+    from api.cache import analytics_cache
+
+    while True:
+        try:
+            for user_id in await run_in_threadpool(_materialize_in_session):
+                await analytics_cache.invalidate(user_id)
+        except Exception:
+            logger.exception("Materializing recurring tasks failed")
+        await asyncio.sleep(interval)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Materialize upcoming occurrences of recurring tasks")
+    parser.add_argument("--worker", action="store_true", help=f"keep running every {RECURRENCE_INTERVAL:g}s")
+    args = parser.parse_args()
+
+    if args.worker:
+        logging.basicConfig(level=logging.INFO)
+        asyncio.run(run_scheduler())
+    else:
+        _materialize_in_session()
+        print("Recurring tasks materialized successfully!")
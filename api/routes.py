@@ -1,113 +1,389 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List
-from datetime import datetime, timedelta
-from api import models, schemas
-from api.database import get_db
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import delete, insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from typing import Any, List, Optional, Union
+from datetime import date, datetime
+from api import models, schemas, pagination, analytics, export, importer, etags, streaks, task_tree, recurrence, events, goal_progress, metrics, subjects, pomodoro, jobs
+from api.search import MAX_SEARCH_LIMIT, search_engine
+from api.serialization import ColumnProjection, json_response
+from api.database import get_async_db
+from api.cache import analytics_cache
+from api.users import get_current_user
 
 router = APIRouter()
 
-def update_streak(db: Session):
-    settings = db.query(models.UserSettings).first()
-    if not settings:
-        return
-    
-    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+task_projection = ColumnProjection(models.Task, schemas.Task)
+goal_projection = ColumnProjection(models.Goal, schemas.Goal)
+session_projection = ColumnProjection(models.PomodoroSession, schemas.PomodoroSession)
+
+async def get_owned(db: AsyncSession, model, object_id: str, user_id: str):
+    # Rows of other users are reported as missing rather than forbidden.
+    return await db.scalar(select(model).where(model.id == object_id, model.user_id == user_id))
+
+async def get_user_settings(db: AsyncSession, user_id: str):
+    return await db.scalar(select(models.UserSettings).where(models.UserSettings.user_id == user_id))
+
+async def get_or_create_settings(db: AsyncSession, user_id: str):
+    settings = await get_user_settings(db, user_id)
+    if settings:
+        return settings
+    
+    # A new user's first requests can race to create the row; the one that
+    # creates it also gives the user the default subjects.
+    created = (await db.execute(
+        pg_insert(models.UserSettings)
+        .values(user_id=user_id)
+        .on_conflict_do_nothing(index_elements=[models.UserSettings.user_id])
+        .returning(models.UserSettings.user_id)
+    )).first()
+    if created:
+        await db.run_sync(subjects.replace_subjects, user_id)
+    await db.commit()
+    return await get_user_settings(db, user_id)
+
+@router.get("/tasks", response_model=Union[schemas.TaskPage, List[schemas.Task]])
+async def get_tasks(
+    request: Request,
+    response: Response,
+    status: Optional[str] = None,
+    priority: Optional[str] = None,
+    subject: Optional[str] = None,
+    parent_task_id: Optional[str] = Query(None, alias="parentTaskId"),
+    deadline_from: Optional[schemas.LocalDateTime] = Query(None, alias="deadlineFrom"),
+    deadline_to: Optional[schemas.LocalDateTime] = Query(None, alias="deadlineTo"),
+    sort: str = Query("created_at", pattern="^(created_at|deadline)$"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    limit: Optional[int] = Query(None, ge=1, le=pagination.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    user_id: str = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    not_modified = await etags.not_modified(request, response, db, models.Task, user_id)
+    if not_modified:
+        return not_modified
+    
+    query = select(*task_projection.columns).where(models.Task.user_id == user_id)
+    
+    if status is not None:
+        query = query.where(models.Task.status == status)
+    if priority is not None:
+        query = query.where(models.Task.priority == priority)
+    if subject is not None:
+        query = query.where(models.Task.subject == subject)
+    if parent_task_id is not None:
+        query = query.where(models.Task.parent_task_id == parent_task_id)
+    if deadline_from is not None:
+        query = query.where(models.Task.deadline >= deadline_from)
+    if deadline_to is not None:
+        query = query.where(models.Task.deadline < deadline_to)
+    
+    sort_column = getattr(models.Task, sort)
+    query = query.order_by(*pagination.order_by_clauses(sort_column, models.Task.id, order))
+    
+    # Without a page size the endpoint keeps returning the plain list so
+    # existing clients are unaffected.
+    if limit is None and cursor is None:
+        rows = (await db.execute(query)).all()
+        return json_response(task_projection.to_dicts(rows), response)
+    
+    page_size = limit or pagination.MAX_PAGE_SIZE
+    if cursor:
+        value, row_id = pagination.decode_cursor(cursor, sort, order)
+        query = query.where(pagination.keyset_filter(sort_column, models.Task.id, order, value, row_id))
+    
+    rows = (await db.execute(query.limit(page_size + 1))).all()
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = pagination.encode_cursor(sort, order, getattr(last, sort), last.id)
+    
+    return json_response({"items": task_projection.to_dicts(rows), "nextCursor": next_cursor}, response)
+
+def validate_bulk_items(items: List[Any], schema, errors: List[schemas.BulkItemError]):
+    valid = []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, schema.model_validate(item)))
+        except ValidationError as e:
+            errors.append(schemas.BulkItemError(
+                index=index,
+                id=item.get("id") if isinstance(item, dict) else None,
+                detail=e.errors(include_url=False, include_context=False, include_input=False),
+            ))
+    return valid
+
+@router.post("/tasks/bulk", response_model=schemas.TaskBulkResult, status_code=201)
+async def create_tasks_bulk(
+    items: List[Any] = Body(..., max_length=schemas.MAX_BULK_ITEMS),
+    user_id: str = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    errors = []
+    valid = validate_bulk_items(items, schemas.TaskCreate, errors)
+    if not valid:
+        return schemas.TaskBulkResult(items=[], errors=errors)
+    
+    rows = [dict(task.model_dump(), user_id=user_id) for _, task in valid]
+    created = (await db.scalars(
+        insert(models.Task).returning(models.Task, sort_by_parameter_order=True),
+        rows,
+    )).all()
+    await db.run_sync(
+        analytics.record_task_changes,
+        [(None, analytics.task_contribution(task)) for task in created],
+    )
+    events.publish(db, user_id, "task.created", [task.id for task in created])
+    await db.commit()
+    await analytics_cache.invalidate(user_id)
+    return schemas.TaskBulkResult(items=created, errors=errors)
+
+@router.patch("/tasks/bulk", response_model=schemas.TaskBulkResult)
+async def update_tasks_bulk(
+    items: List[Any] = Body(..., max_length=schemas.MAX_BULK_ITEMS),
+    user_id: str = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    errors = []
+    valid = validate_bulk_items(items, schemas.TaskBulkUpdate, errors)
+    
+    ids = {task_update.id for _, task_update in valid}
+    tasks = {}
+    if ids:
+        tasks = {task.id: task for task in (await db.scalars(
+            select(models.Task).where(models.Task.user_id == user_id, models.Task.id.in_(ids))
+        )).all()}
     
-    if settings.last_study_date:
-        last_study = settings.last_study_date.replace(hour=0, minute=0, second=0, microsecond=0)
-        days_diff = (today - last_study).days
+    now = datetime.now()
+    updated = {}
+    changes = []
+    progress_task_ids = []
+    newly_completed = False
+    for index, task_update in valid:
+        db_task = tasks.get(task_update.id)
+        if not db_task:
+            errors.append(schemas.BulkItemError(index=index, id=task_update.id, detail="Task not found"))
+            continue
+        
+        update_data = task_update.model_dump(exclude_unset=True, exclude={"id"})
+        before = analytics.task_contribution(db_task)
         
-        if days_diff == 0:
-            return
-        elif days_diff == 1:
-            settings.current_streak += 1
-            settings.longest_streak = max(settings.longest_streak, settings.current_streak)
-        else:
-            settings.current_streak = 1
-    else:
-        settings.current_streak = 1
-        settings.longest_streak = 1
-    
-    settings.last_study_date = datetime.now()
-    db.commit()
-
-@router.get("/tasks", response_model=List[schemas.Task])
-def get_tasks(db: Session = Depends(get_db)):
-    tasks = db.query(models.Task).all()
-    return tasks
+        if update_data.get("status") == "completed" and db_task.status != "completed":
+            update_data["completed_at"] = now
+            newly_completed = True
+        if recurrence.SCHEDULE_FIELDS & update_data.keys():
+            update_data["next_occurrence_at"] = None
+        
+        for key, value in update_data.items():
+            setattr(db_task, key, value)
+        
+        changes.append((before, analytics.task_contribution(db_task)))
+        updated[db_task.id] = db_task
+        if goal_progress.PROGRESS_FIELDS & update_data.keys():
+            progress_task_ids.append(db_task.id)
+    
+    await db.run_sync(analytics.record_task_changes, changes)
+    goal_ids = await db.run_sync(goal_progress.tasks_changed, user_id, progress_task_ids)
+    if goal_ids:
+        events.publish(db, user_id, "goal.updated", goal_ids)
+    # The streak only moves once per day, so one call covers the whole batch.
+    if newly_completed:
+        await db.run_sync(streaks.record_study_day, user_id)
+        events.publish(db, user_id, "settings.updated")
+    if updated:
+        events.publish(db, user_id, "task.updated", list(updated))
+    await db.commit()
+    await analytics_cache.invalidate(user_id)
+    
+    errors.sort(key=lambda error: error.index)
+    return schemas.TaskBulkResult(items=list(updated.values()), errors=errors)
+
+@router.delete("/tasks/bulk", response_model=schemas.TaskBulkDeleteResult)
+async def delete_tasks_bulk(
+    payload: schemas.TaskBulkDelete,
+    user_id: str = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    goal_ids = await db.run_sync(goal_progress.tasks_deleted, user_id, set(payload.ids))
+    result = await db.execute(
+        delete(models.Task)
+        .where(models.Task.user_id == user_id, models.Task.id.in_(set(payload.ids)))
+        .returning(models.Task.id, models.Task.user_id, models.Task.completed_at, models.Task.subject, models.Task.actual_duration)
+        .execution_options(synchronize_session=False)
+    )
+    rows = result.all()
+    await db.run_sync(analytics.record_task_changes, [(analytics.task_contribution(row), None) for row in rows])
+    if goal_ids:
+        events.publish(db, user_id, "goal.updated", goal_ids)
+    if rows:
+        events.publish(db, user_id, "task.deleted", [row.id for row in rows])
+    await db.commit()
+    await analytics_cache.invalidate(user_id)
+    
+    deleted = {row.id for row in rows}
+    errors = [
+        schemas.BulkItemError(index=index, id=task_id, detail="Task not found")
+        for index, task_id in enumerate(payload.ids)
+        if task_id not in deleted
+    ]
+    return schemas.TaskBulkDeleteResult(deleted=[row.id for row in rows], errors=errors)
 
 @router.get("/tasks/{task_id}", response_model=schemas.Task)
-def get_task(task_id: str, db: Session = Depends(get_db)):
-    task = db.query(models.Task).filter(models.Task.id == task_id).first()
+async def get_task(task_id: str, user_id: str = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    task = await get_owned(db, models.Task, task_id, user_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     return task
 
+@router.get("/tasks/{task_id}/tree", response_model=schemas.TaskTree)
+async def get_task_tree(
+    task_id: str,
+    request: Request,
+    response: Response,
+    max_depth: int = Query(task_tree.MAX_TREE_DEPTH, ge=0, le=task_tree.MAX_TREE_DEPTH, alias="maxDepth"),
+    user_id: str = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    not_modified = await etags.not_modified(request, response, db, models.Task, user_id)
+    if not_modified:
+        return not_modified
+    
+    tree = await task_tree.fetch_task_tree(db, task_projection, user_id, task_id, max_depth)
+    if tree is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return json_response(tree, response)
+
 @router.post("/tasks", response_model=schemas.Task, status_code=201)
-def create_task(task: schemas.TaskCreate, db: Session = Depends(get_db)):
-    db_task = models.Task(**task.model_dump())
+async def create_task(task: schemas.TaskCreate, user_id: str = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    db_task = models.Task(**task.model_dump(), user_id=user_id)
     db.add(db_task)
-    db.commit()
-    db.refresh(db_task)
+    await db.flush()
+    await db.run_sync(analytics.record_task_change, None, analytics.task_contribution(db_task))
+    events.publish(db, user_id, "task.created", [db_task.id])
+    await db.commit()
+    await analytics_cache.invalidate(user_id)
+    await db.refresh(db_task)
     return db_task
 
 @router.patch("/tasks/{task_id}", response_model=schemas.Task)
-def update_task(task_id: str, task_update: schemas.TaskUpdate, db: Session = Depends(get_db)):
-    db_task = db.query(models.Task).filter(models.Task.id == task_id).first()
+async def update_task(
+    task_id: str,
+    task_update: schemas.TaskUpdate,
+    user_id: str = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    db_task = await get_owned(db, models.Task, task_id, user_id)
     if not db_task:
         raise HTTPException(status_code=404, detail="Task not found")
     
     update_data = task_update.model_dump(exclude_unset=True)
+    before = analytics.task_contribution(db_task)
+    newly_completed = update_data.get("status") == "completed" and db_task.status != "completed"
     
-    if update_data.get("status") == "completed" and db_task.status != "completed":
+    if newly_completed:
         update_data["completed_at"] = datetime.now()
-        update_streak(db)
+    if recurrence.SCHEDULE_FIELDS & update_data.keys():
+        update_data["next_occurrence_at"] = None
     
-    db.query(models.Task).filter(models.Task.id == task_id).update(update_data)
-    db.commit()
-    db_task = db.query(models.Task).filter(models.Task.id == task_id).first()
-    db.refresh(db_task)
+    for key, value in update_data.items():
+        setattr(db_task, key, value)
+    
+    await db.run_sync(analytics.record_task_change, before, analytics.task_contribution(db_task))
+    if goal_progress.PROGRESS_FIELDS & update_data.keys():
+        goal_ids = await db.run_sync(goal_progress.tasks_changed, user_id, [task_id])
+        if goal_ids:
+            events.publish(db, user_id, "goal.updated", goal_ids)
+    # Rollup rows are always locked before goal rows and goal rows before the
+    # settings row, in every handler, so concurrent writers for one user
+    # cannot deadlock.
+    if newly_completed:
+        await db.run_sync(streaks.record_study_day, user_id)
+        events.publish(db, user_id, "settings.updated")
+    events.publish(db, user_id, "task.updated", [task_id])
+    await db.commit()
+    await analytics_cache.invalidate(user_id)
+    await db.refresh(db_task)
     return db_task
 
 @router.delete("/tasks/{task_id}", status_code=204)
-def delete_task(task_id: str, db: Session = Depends(get_db)):
-    db_task = db.query(models.Task).filter(models.Task.id == task_id).first()
+async def delete_task(task_id: str, user_id: str = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    db_task = await get_owned(db, models.Task, task_id, user_id)
     if not db_task:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    db.delete(db_task)
-    db.commit()
+    await db.run_sync(analytics.record_task_change, analytics.task_contribution(db_task), None)
+    goal_ids = await db.run_sync(goal_progress.tasks_deleted, user_id, [task_id])
+    await db.delete(db_task)
+    if goal_ids:
+        events.publish(db, user_id, "goal.updated", goal_ids)
+    events.publish(db, user_id, "task.deleted", [task_id])
+    await db.commit()
+    await analytics_cache.invalidate(user_id)
     return None
 
+async def check_related_tasks(db: AsyncSession, user_id: str, task_ids: Optional[List[str]]):
+    unknown = await db.run_sync(goal_progress.unknown_tasks, user_id, task_ids or [])
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown related task ids: {', '.join(unknown[:10])}")
+
 @router.get("/goals", response_model=List[schemas.Goal])
-def get_goals(db: Session = Depends(get_db)):
-    goals = db.query(models.Goal).all()
-    return goals
+async def get_goals(
+    request: Request,
+    response: Response,
+    user_id: str = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    not_modified = await etags.not_modified(request, response, db, models.Goal, user_id)
+    if not_modified:
+        return not_modified
+    
+    rows = (await db.execute(select(*goal_projection.columns).where(models.Goal.user_id == user_id))).all()
+    return json_response(goal_projection.to_dicts(rows), response)
 
 @router.get("/goals/{goal_id}", response_model=schemas.Goal)
-def get_goal(goal_id: str, db: Session = Depends(get_db)):
-    goal = db.query(models.Goal).filter(models.Goal.id == goal_id).first()
+async def get_goal(goal_id: str, user_id: str = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    goal = await get_owned(db, models.Goal, goal_id, user_id)
     if not goal:
         raise HTTPException(status_code=404, detail="Goal not found")
     return goal
 
 @router.post("/goals", response_model=schemas.Goal, status_code=201)
-def create_goal(goal: schemas.GoalCreate, db: Session = Depends(get_db)):
-    db_goal = models.Goal(**goal.model_dump())
+async def create_goal(goal: schemas.GoalCreate, user_id: str = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    goal_data = goal.model_dump()
+    related_task_ids = goal_data.pop("related_task_ids")
+    await check_related_tasks(db, user_id, related_task_ids)
+    
+    db_goal = models.Goal(**goal_data, user_id=user_id)
     db.add(db_goal)
-    db.commit()
-    db.refresh(db_goal)
+    await db.flush()
+    if related_task_ids:
+        await db.run_sync(goal_progress.set_related_tasks, db_goal.id, related_task_ids)
+        await db.run_sync(goal_progress.recompute_goal_progress, user_id, [db_goal.id])
+    events.publish(db, user_id, "goal.created", [db_goal.id])
+    await db.commit()
+    await db.refresh(db_goal)
     return db_goal
 
 @router.patch("/goals/{goal_id}", response_model=schemas.Goal)
-def update_goal(goal_id: str, goal_update: schemas.GoalUpdate, db: Session = Depends(get_db)):
-    db_goal = db.query(models.Goal).filter(models.Goal.id == goal_id).first()
+async def update_goal(
+    goal_id: str,
+    goal_update: schemas.GoalUpdate,
+    user_id: str = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    db_goal = await get_owned(db, models.Goal, goal_id, user_id)
     if not db_goal:
         raise HTTPException(status_code=404, detail="Goal not found")
     
     update_data = goal_update.model_dump(exclude_unset=True)
+    related_task_ids = db_goal.related_task_ids
+    if "related_task_ids" in update_data:
+        related_task_ids = update_data.pop("related_task_ids")
+        await check_related_tasks(db, user_id, related_task_ids)
+        await db.run_sync(goal_progress.set_related_tasks, goal_id, related_task_ids)
     
     if update_data.get("status") == "completed" and db_goal.status != "completed":
         update_data["completed_at"] = datetime.now()
@@ -115,218 +391,296 @@ def update_goal(goal_id: str, goal_update: schemas.GoalUpdate, db: Session = Dep
     for key, value in update_data.items():
         setattr(db_goal, key, value)
     
-    db.commit()
-    db.refresh(db_goal)
+    # Progress is derived for goals with related tasks; a PATCHed value
+    # only sticks on goals without them.
+    if related_task_ids:
+        await db.run_sync(goal_progress.recompute_goal_progress, user_id, [goal_id])
+    events.publish(db, user_id, "goal.updated", [goal_id])
+    await db.commit()
+    await db.refresh(db_goal)
     return db_goal
 
 @router.delete("/goals/{goal_id}", status_code=204)
-def delete_goal(goal_id: str, db: Session = Depends(get_db)):
-    db_goal = db.query(models.Goal).filter(models.Goal.id == goal_id).first()
+async def delete_goal(goal_id: str, user_id: str = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    db_goal = await get_owned(db, models.Goal, goal_id, user_id)
     if not db_goal:
         raise HTTPException(status_code=404, detail="Goal not found")
     
-    db.delete(db_goal)
-    db.commit()
+    await db.delete(db_goal)
+    events.publish(db, user_id, "goal.deleted", [goal_id])
+    await db.commit()
     return None
 
 @router.get("/pomodoro-sessions", response_model=List[schemas.PomodoroSession])
-def get_pomodoro_sessions(db: Session = Depends(get_db)):
-    sessions = db.query(models.PomodoroSession).all()
-    return sessions
+async def get_pomodoro_sessions(
+    request: Request,
+    response: Response,
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    task_id: Optional[str] = Query(None, alias="taskId"),
+    completed: Optional[bool] = None,
+    user_id: str = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    not_modified = await etags.not_modified(request, response, db, models.PomodoroSession, user_id)
+    if not_modified:
+        return not_modified
+    
+    filters = pomodoro.session_filters(user_id, date_from, date_to, task_id, completed)
+    rows = (await db.execute(
+        select(*session_projection.columns).where(*filters).order_by(models.PomodoroSession.created_at)
+    )).all()
+    return json_response(session_projection.to_dicts(rows), response)
+
+@router.get("/pomodoro-sessions/stats", response_model=List[schemas.PomodoroSessionStats])
+async def get_pomodoro_session_stats(
+    request: Request,
+    response: Response,
+    bucket: str = Query("day", pattern="^(day|week|month)$"),
+    by_task: bool = Query(False, alias="byTask"),
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    task_id: Optional[str] = Query(None, alias="taskId"),
+    completed: Optional[bool] = None,
+    user_id: str = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    not_modified = await etags.not_modified(request, response, db, models.PomodoroSession, user_id)
+    if not_modified:
+        return not_modified
+    
+    filters = pomodoro.session_filters(user_id, date_from, date_to, task_id, completed)
+    rows = (await db.execute(pomodoro.stats_query(filters, bucket, by_task))).mappings().all()
+    return [schemas.PomodoroSessionStats.model_validate(row) for row in rows]
 
 @router.post("/pomodoro-sessions", response_model=schemas.PomodoroSession, status_code=201)
-def create_pomodoro_session(session: schemas.PomodoroSessionCreate, db: Session = Depends(get_db)):
-    db_session = models.PomodoroSession(**session.model_dump())
+async def create_pomodoro_session(
+    session: schemas.PomodoroSessionCreate,
+    user_id: str = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    db_session = models.PomodoroSession(**session.model_dump(), user_id=user_id)
     db.add(db_session)
-    db.commit()
-    db.refresh(db_session)
-    
+    await db.flush()
+    await db.run_sync(analytics.record_session, db_session)
     if db_session.was_completed:
-        update_streak(db)
-    
+        await db.run_sync(streaks.record_study_day, user_id)
+        events.publish(db, user_id, "settings.updated")
+    events.publish(db, user_id, "pomodoro-session.created", [db_session.id])
+    await db.commit()
+    await analytics_cache.invalidate(user_id)
+    await db.refresh(db_session)
     return db_session
 
 @router.get("/settings", response_model=schemas.UserSettings)
-def get_settings(db: Session = Depends(get_db)):
-    settings = db.query(models.UserSettings).first()
-    if not settings:
-        settings = models.UserSettings()
-        db.add(settings)
-        db.commit()
-        db.refresh(settings)
-    return settings
+async def get_settings(
+    request: Request,
+    response: Response,
+    user_id: str = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    not_modified = await etags.not_modified(request, response, db, models.UserSettings, user_id)
+    if not_modified:
+        return not_modified
+    
+    return await get_or_create_settings(db, user_id)
 
 @router.patch("/settings", response_model=schemas.UserSettings)
-def update_settings(settings_update: schemas.UserSettingsUpdate, db: Session = Depends(get_db)):
-    db_settings = db.query(models.UserSettings).first()
-    if not db_settings:
-        db_settings = models.UserSettings()
-        db.add(db_settings)
+async def update_settings(
+    settings_update: schemas.UserSettingsUpdate,
+    user_id: str = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    db_settings = await get_or_create_settings(db, user_id)
     
     update_data = settings_update.model_dump(exclude_unset=True)
+    if "custom_subjects" in update_data:
+        await db.run_sync(subjects.replace_subjects, user_id, update_data.pop("custom_subjects") or [])
     for key, value in update_data.items():
         setattr(db_settings, key, value)
     
     db_settings.updated_at = datetime.now()
-    db.commit()
-    db.refresh(db_settings)
+    events.publish(db, user_id, "settings.updated")
+    await db.commit()
+    await analytics_cache.invalidate(user_id)
+    await db.refresh(db_settings)
     return db_settings
 
+@router.post("/settings/recompute-streak", response_model=schemas.UserSettings)
+async def recompute_streak(user_id: str = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    settings = await get_or_create_settings(db, user_id)
+    events.publish(db, user_id, "settings.updated")
+    await db.run_sync(streaks.recompute_streaks, user_id)
+    await db.commit()
+    await analytics_cache.invalidate(user_id)
+    await db.refresh(settings)
+    return settings
+
 @router.get("/analytics/summary", response_model=schemas.AnalyticsSummary)
-def get_analytics_summary(db: Session = Depends(get_db)):
-    now = datetime.now()
-    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    week_ago = today - timedelta(days=7)
-    
-    tasks = db.query(models.Task).all()
-    sessions = db.query(models.PomodoroSession).all()
-    settings = db.query(models.UserSettings).first()
-    
-    total_study_time = sum(s.focus_duration for s in sessions if s.was_completed)
-    
-    today_study_time = sum(
-        s.focus_duration for s in sessions 
-        if s.was_completed and s.completed_at and s.completed_at >= today
+async def get_analytics_summary(user_id: str = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    return await analytics_cache.get_or_compute(
+        user_id,
+        "summary",
+        lambda: db.run_sync(analytics.compute_summary, user_id),
     )
-    
-    week_study_time = sum(
-        s.focus_duration for s in sessions 
-        if s.was_completed and s.completed_at and s.completed_at >= week_ago
+
+@router.get("/analytics/daily", response_model=List[schemas.DailyStats])
+async def get_daily_stats(
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    user_id: str = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    return await analytics_cache.get_or_compute(
+        user_id,
+        f"daily:{date_from}:{date_to}",
+        lambda: db.run_sync(analytics.get_daily_stats, user_id, date_from, date_to),
     )
-    
-    tasks_completed_today = len([
-        t for t in tasks 
-        if t.status == "completed" and t.completed_at and t.completed_at >= today
-    ])
-    
-    tasks_completed_week = len([
-        t for t in tasks 
-        if t.status == "completed" and t.completed_at and t.completed_at >= week_ago
-    ])
-    
-    subject_map = {}
-    for task in tasks:
-        if task.subject and task.status == "completed" and task.actual_duration:
-            subject_map[task.subject] = subject_map.get(task.subject, 0) + task.actual_duration
-    
-    subject_distribution = [
-        schemas.SubjectDistribution(subject=subject, minutes=minutes)
-        for subject, minutes in subject_map.items()
-    ]
-    
-    completed_tasks = len([t for t in tasks if t.status == "completed"])
-    completion_rate = round((completed_tasks / len(tasks) * 100)) if tasks else 0
-    
-    total_sessions = len(sessions)
-    completed_sessions = len([s for s in sessions if s.was_completed])
-    focus_efficiency = round((completed_sessions / total_sessions * 100)) if total_sessions else 0
-    
-    current_streak = settings.current_streak if settings else 0
-    
-    return schemas.AnalyticsSummary(
-        total_study_time=total_study_time,
-        today_study_time=today_study_time,
-        week_study_time=week_study_time,
-        tasks_completed_today=tasks_completed_today,
-        tasks_completed_week=tasks_completed_week,
-        current_streak=current_streak,
-        subject_distribution=subject_distribution,
-        completion_rate=completion_rate,
-        focus_efficiency=focus_efficiency
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    if not metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return Response(metrics.registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@router.get("/events")
+async def stream_events(user_id: str = Depends(get_current_user)):
+    return StreamingResponse(
+        events.stream(user_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
-@router.get("/analytics/daily", response_model=List[schemas.DailyStats])
-def get_daily_stats(db: Session = Depends(get_db)):
-    tasks = db.query(models.Task).all()
-    sessions = db.query(models.PomodoroSession).all()
-    
-    stats_map = {}
-    
-    for task in tasks:
-        if task.completed_at:
-            date = task.completed_at.strftime("%Y-%m-%d")
-            if date not in stats_map:
-                stats_map[date] = {
-                    "date": date,
-                    "total_minutes_studied": 0,
-                    "tasks_completed": 0,
-                    "pomodoro_sessions_completed": 0,
-                    "subject_breakdown": {}
-                }
-            stats_map[date]["tasks_completed"] += 1
-            if task.actual_duration:
-                stats_map[date]["total_minutes_studied"] += task.actual_duration
-                if task.subject:
-                    stats_map[date]["subject_breakdown"][task.subject] = \
-                        stats_map[date]["subject_breakdown"].get(task.subject, 0) + task.actual_duration
-    
-    for session in sessions:
-        if session.was_completed and session.completed_at:
-            date = session.completed_at.strftime("%Y-%m-%d")
-            if date not in stats_map:
-                stats_map[date] = {
-                    "date": date,
-                    "total_minutes_studied": 0,
-                    "tasks_completed": 0,
-                    "pomodoro_sessions_completed": 0,
-                    "subject_breakdown": {}
-                }
-            stats_map[date]["pomodoro_sessions_completed"] += 1
-            stats_map[date]["total_minutes_studied"] += session.focus_duration
-    
-    daily_stats = [schemas.DailyStats(**stats) for stats in stats_map.values()]
-    daily_stats.sort(key=lambda x: x.date)
-    
-    return daily_stats
+@router.get("/search", response_model=schemas.SearchResults)
+async def search(
+    q: str = Query(..., min_length=1, max_length=256),
+    type: str = Query("all", pattern="^(all|tasks|goals)$"),
+    limit: int = Query(20, ge=1, le=MAX_SEARCH_LIMIT),
+    offset: int = Query(0, ge=0),
+    user_id: str = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    return await search_engine.search(db, user_id, q, type, limit, offset)
+
+@router.get("/export")
+async def export_data(
+    resource: str = Query("tasks", pattern="^(tasks|goals|pomodoro-sessions)$"),
+    format: str = Query("ndjson", pattern="^(ndjson|csv|parquet)$"),
+    user_id: str = Depends(get_current_user),
+):
+    if format == "parquet" and not export.parquet_available():
+        raise HTTPException(status_code=400, detail="Parquet export requires pyarrow to be installed")
+    
+    media_type, extension = export.EXPORT_FORMATS[format]
+    return StreamingResponse(
+        export.stream_export(resource, format, user_id),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{resource}.{extension}"'},
+    )
+
+@router.post("/import", response_model=schemas.ImportResult)
+async def import_data(
+    request: Request,
+    resource: str = Query(..., pattern="^(tasks|goals|pomodoro-sessions)$"),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    user_id: str = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    events.publish(db, user_id, f"{events.RESOURCE_NAMES[resource]}.imported")
+    result = await importer.import_rows(db, user_id, resource, format, request.stream())
+    if resource in ("tasks", "goals") and result.imported:
+        goal_ids = await db.run_sync(goal_progress.recompute_goal_progress, user_id)
+        if goal_ids:
+            events.publish(db, user_id, "goal.updated", goal_ids)
+        await db.commit()
+    await analytics_cache.invalidate(user_id)
+    return result
 
 @router.post("/subjects", status_code=201)
-def add_subject(subject: str, db: Session = Depends(get_db)):
-    settings = db.query(models.UserSettings).first()
-    if not settings:
-        settings = models.UserSettings()
-        db.add(settings)
-        db.commit()
-        db.refresh(settings)
+async def add_subject(subject: str, user_id: str = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    await get_or_create_settings(db, user_id)
     
-    if not settings.custom_subjects:
-        settings.custom_subjects = []
+    if await db.run_sync(subjects.add_subject, user_id, subject):
+        events.publish(db, user_id, "settings.updated")
+        await db.commit()
     
-    if subject not in settings.custom_subjects:
-        settings.custom_subjects = settings.custom_subjects + [subject]
-        settings.updated_at = datetime.now()
-        db.commit()
-        db.refresh(settings)
-    
-    return {"subject": subject, "subjects": settings.custom_subjects}
+    return {"subject": subject, "subjects": await db.run_sync(subjects.list_subjects, user_id)}
+
+@router.patch("/subjects/{subject}", status_code=200)
+async def rename_subject(
+    subject: str,
+    rename: schemas.SubjectRename,
+    user_id: str = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    await get_or_create_settings(db, user_id)
+    task_ids = await db.run_sync(subjects.rename_subject, user_id, subject, rename.name)
+    if task_ids is None:
+        raise HTTPException(status_code=404, detail="Subject not found")
+    
+    if subject != rename.name:
+        events.publish(db, user_id, "settings.updated")
+        if task_ids:
+            events.publish(db, user_id, "task.updated", task_ids)
+        await db.commit()
+        await analytics_cache.invalidate(user_id)
+    
+    return {
+        "subject": rename.name,
+        "subjects": await db.run_sync(subjects.list_subjects, user_id),
+        "tasksUpdated": len(task_ids),
+    }
 
 @router.delete("/subjects/{subject}", status_code=200)
-def delete_subject(subject: str, db: Session = Depends(get_db)):
-    settings = db.query(models.UserSettings).first()
-    if not settings or not settings.custom_subjects:
+async def delete_subject(subject: str, user_id: str = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    remaining = await db.run_sync(subjects.list_subjects, user_id)
+    if not remaining:
         raise HTTPException(status_code=404, detail="No subjects found")
     
-    if subject in settings.custom_subjects:
-        settings.custom_subjects = [s for s in settings.custom_subjects if s != subject]
-        settings.updated_at = datetime.now()
-        db.commit()
-        db.refresh(settings)
+    if await db.run_sync(subjects.delete_subject, user_id, subject):
+        events.publish(db, user_id, "settings.updated")
+        await db.commit()
+        remaining = [name for name in remaining if name != subject]
     
-    return {"subjects": settings.custom_subjects}
+    return {"subjects": remaining}
 
-@router.post("/reset-all", status_code=200)
-def reset_all_data(db: Session = Depends(get_db)):
-    db.query(models.Task).delete()
-    db.query(models.Goal).delete()
-    db.query(models.PomodoroSession).delete()
-    
-    settings = db.query(models.UserSettings).first()
-    if settings:
-        settings.current_streak = 0
-        settings.longest_streak = 0
-        settings.last_study_date = None
-        settings.custom_subjects = ["Math", "Physics", "Chemistry", "Biology", "History", "English", "Computer Science", "Other"]
-        settings.updated_at = datetime.now()
-    
-    db.commit()
-    
-    return {"message": "All data has been reset successfully"}
+async def enqueue_job(db: AsyncSession, response: Response, user_id: str, kind: str):
+    job = await db.run_sync(jobs.enqueue, user_id, kind)
+    await db.commit()
+    jobs.wake()
+    await db.refresh(job)
+    response.headers["Location"] = f"/api/jobs/{job.id}"
+    return job
+
+@router.post("/reset-all", response_model=schemas.Job, status_code=202)
+async def reset_all_data(
+    response: Response,
+    user_id: str = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    return await enqueue_job(db, response, user_id, "reset-all")
+
+@router.post("/analytics/rebuild", response_model=schemas.Job, status_code=202)
+async def rebuild_analytics(
+    response: Response,
+    user_id: str = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    return await enqueue_job(db, response, user_id, "rebuild-analytics")
+
+@router.get("/jobs", response_model=List[schemas.Job])
+async def get_jobs(
+    limit: int = Query(50, ge=1, le=200),
+    user_id: str = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    return (await db.scalars(
+        select(models.Job).where(models.Job.user_id == user_id).order_by(models.Job.created_at.desc()).limit(limit)
+    )).all()
+
+@router.get("/jobs/{job_id}", response_model=schemas.Job)
+async def get_job(job_id: str, user_id: str = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    job = await get_owned(db, models.Job, job_id, user_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
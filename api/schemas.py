@@ -1,7 +1,20 @@
-from pydantic import BaseModel, ConfigDict
+from pydantic import AfterValidator, BaseModel, ConfigDict, Field
 from pydantic.alias_generators import to_camel
-from typing import Optional, List, Dict
-from datetime import datetime
+from typing import Annotated, Any, Optional, List, Dict, Union
+from datetime import date, datetime
+from api.recurrence import validate_schedule
+
+def to_naive_local(value: datetime) -> datetime:
+    # Columns are TIMESTAMP WITHOUT TIME ZONE, so aware inputs (e.g. the
+    # client's toISOString() values) are stored as server-local time.
+    if value.tzinfo is not None:
+        return value.astimezone().replace(tzinfo=None)
+    return value
+
+LocalDateTime = Annotated[datetime, AfterValidator(to_naive_local)]
+RecurringSchedule = Annotated[Optional[str], AfterValidator(validate_schedule)]
+
+MAX_BULK_ITEMS = 1000
 
 class TaskBase(BaseModel):
     model_config = ConfigDict(populate_by_name=True, alias_generator=to_camel)
@@ -11,17 +24,25 @@ class TaskBase(BaseModel):
     status: str = "pending"
     priority: str = "important"
     subject: Optional[str] = None
-    deadline: Optional[datetime] = None
+    deadline: Optional[LocalDateTime] = None
     estimated_duration: Optional[int] = None
     actual_duration: Optional[int] = None
     parent_task_id: Optional[str] = None
     resources: Optional[List[str]] = None
     is_recurring: Optional[bool] = False
     recurring_schedule: Optional[str] = None
-    completed_at: Optional[datetime] = None
+    completed_at: Optional[LocalDateTime] = None
 
 class TaskCreate(TaskBase):
-    pass
+    # Only new values are checked; schedules stored before the scheduler
+    # existed are free text and still have to load.
+    recurring_schedule: RecurringSchedule = None
+
+class TaskImport(TaskCreate):
+    id: Optional[str] = None
+    recurring_task_id: Optional[str] = None
+    occurrence_date: Optional[date] = None
+    created_at: Optional[LocalDateTime] = None
 
 class TaskUpdate(BaseModel):
     model_config = ConfigDict(populate_by_name=True, alias_generator=to_camel)
@@ -31,20 +52,76 @@ class TaskUpdate(BaseModel):
     status: Optional[str] = None
     priority: Optional[str] = None
     subject: Optional[str] = None
-    deadline: Optional[datetime] = None
+    deadline: Optional[LocalDateTime] = None
     estimated_duration: Optional[int] = None
     actual_duration: Optional[int] = None
     parent_task_id: Optional[str] = None
     resources: Optional[List[str]] = None
     is_recurring: Optional[bool] = None
-    recurring_schedule: Optional[str] = None
-    completed_at: Optional[datetime] = None
+    recurring_schedule: RecurringSchedule = None
+    completed_at: Optional[LocalDateTime] = None
 
 class Task(TaskBase):
     model_config = ConfigDict(from_attributes=True, populate_by_name=True, alias_generator=to_camel)
     
     id: str
-    created_at: datetime
+    # Set on tasks materialized from a recurring task.
+    recurring_task_id: Optional[str] = None
+    occurrence_date: Optional[date] = None
+    created_at: LocalDateTime
+
+class TaskPage(BaseModel):
+    model_config = ConfigDict(populate_by_name=True, alias_generator=to_camel)
+    
+    items: List[Task]
+    next_cursor: Optional[str] = None
+
+class TaskTreeNode(Task):
+    # The *_total, count and percentage fields roll up the whole subtree,
+    # this task included.
+    depth: int
+    estimated_duration_total: int
+    actual_duration_total: int
+    task_count: int
+    completed_count: int
+    completion_percentage: int
+    children: List["TaskTreeNode"] = []
+
+class TaskTree(BaseModel):
+    model_config = ConfigDict(populate_by_name=True, alias_generator=to_camel)
+    
+    root: TaskTreeNode
+    node_count: int
+    max_depth: int
+    truncated: bool
+    cycle_detected: bool
+
+class TaskBulkUpdate(TaskUpdate):
+    id: str
+
+class TaskBulkDelete(BaseModel):
+    model_config = ConfigDict(populate_by_name=True, alias_generator=to_camel)
+    
+    ids: List[str] = Field(max_length=MAX_BULK_ITEMS)
+
+class BulkItemError(BaseModel):
+    model_config = ConfigDict(populate_by_name=True, alias_generator=to_camel)
+    
+    index: int
+    id: Optional[str] = None
+    detail: Union[str, List[Dict[str, Any]]]
+
+class TaskBulkResult(BaseModel):
+    model_config = ConfigDict(populate_by_name=True, alias_generator=to_camel)
+    
+    items: List[Task]
+    errors: List[BulkItemError]
+
+class TaskBulkDeleteResult(BaseModel):
+    model_config = ConfigDict(populate_by_name=True, alias_generator=to_camel)
+    
+    deleted: List[str]
+    errors: List[BulkItemError]
 
 class GoalBase(BaseModel):
     model_config = ConfigDict(populate_by_name=True, alias_generator=to_camel)
@@ -52,32 +129,36 @@ class GoalBase(BaseModel):
     title: str
     description: Optional[str] = None
     type: str
-    target_date: datetime
+    target_date: LocalDateTime
     status: str = "active"
     progress: int = 0
     related_task_ids: Optional[List[str]] = None
-    completed_at: Optional[datetime] = None
+    completed_at: Optional[LocalDateTime] = None
 
 class GoalCreate(GoalBase):
     pass
 
+class GoalImport(GoalCreate):
+    id: Optional[str] = None
+    created_at: Optional[LocalDateTime] = None
+
 class GoalUpdate(BaseModel):
     model_config = ConfigDict(populate_by_name=True, alias_generator=to_camel)
     
     title: Optional[str] = None
     description: Optional[str] = None
     type: Optional[str] = None
-    target_date: Optional[datetime] = None
+    target_date: Optional[LocalDateTime] = None
     status: Optional[str] = None
     progress: Optional[int] = None
     related_task_ids: Optional[List[str]] = None
-    completed_at: Optional[datetime] = None
+    completed_at: Optional[LocalDateTime] = None
 
 class Goal(GoalBase):
     model_config = ConfigDict(from_attributes=True, populate_by_name=True, alias_generator=to_camel)
     
     id: str
-    created_at: datetime
+    created_at: LocalDateTime
 
 class PomodoroSessionBase(BaseModel):
     model_config = ConfigDict(populate_by_name=True, alias_generator=to_camel)
@@ -86,16 +167,31 @@ class PomodoroSessionBase(BaseModel):
     focus_duration: int
     break_duration: int
     was_completed: bool = False
-    completed_at: Optional[datetime] = None
+    completed_at: Optional[LocalDateTime] = None
 
 class PomodoroSessionCreate(PomodoroSessionBase):
     pass
 
+class PomodoroSessionImport(PomodoroSessionCreate):
+    id: Optional[str] = None
+    created_at: Optional[LocalDateTime] = None
+
 class PomodoroSession(PomodoroSessionBase):
     model_config = ConfigDict(from_attributes=True, populate_by_name=True, alias_generator=to_camel)
     
     id: str
-    created_at: datetime
+    created_at: LocalDateTime
+
+class PomodoroSessionStats(BaseModel):
+    model_config = ConfigDict(populate_by_name=True, alias_generator=to_camel)
+    
+    # First day of the day, week (Monday) or month.
+    period: date
+    task_id: Optional[str] = None
+    sessions: int
+    completed_sessions: int
+    focus_minutes: int
+    break_minutes: int
 
 class UserSettingsBase(BaseModel):
     model_config = ConfigDict(populate_by_name=True, alias_generator=to_camel)
@@ -107,7 +203,7 @@ class UserSettingsBase(BaseModel):
     sound_enabled: bool = True
     current_streak: int = 0
     longest_streak: int = 0
-    last_study_date: Optional[datetime] = None
+    last_study_date: Optional[LocalDateTime] = None
     custom_subjects: List[str] = ["Math", "Physics", "Chemistry", "Biology", "History", "English", "Computer Science", "Other"]
 
 class UserSettingsUpdate(BaseModel):
@@ -120,14 +216,19 @@ class UserSettingsUpdate(BaseModel):
     sound_enabled: Optional[bool] = None
     current_streak: Optional[int] = None
     longest_streak: Optional[int] = None
-    last_study_date: Optional[datetime] = None
+    last_study_date: Optional[LocalDateTime] = None
     custom_subjects: Optional[List[str]] = None
 
 class UserSettings(UserSettingsBase):
     model_config = ConfigDict(from_attributes=True, populate_by_name=True, alias_generator=to_camel)
     
     id: str
-    updated_at: datetime
+    updated_at: LocalDateTime
+
+class SubjectRename(BaseModel):
+    model_config = ConfigDict(populate_by_name=True, alias_generator=to_camel)
+    
+    name: str = Field(min_length=1)
 
 class SubjectDistribution(BaseModel):
     model_config = ConfigDict(populate_by_name=True, alias_generator=to_camel)
@@ -156,3 +257,56 @@ class DailyStats(BaseModel):
     tasks_completed: int
     pomodoro_sessions_completed: int
     subject_breakdown: Dict[str, int]
+
+class SearchHit(BaseModel):
+    model_config = ConfigDict(populate_by_name=True, alias_generator=to_camel)
+    
+    type: str
+    id: str
+    title: str
+    subject: Optional[str] = None
+    status: str
+    rank: float
+    # HTML-escaped text with the matched terms wrapped in <mark> tags.
+    title_highlight: str
+    description_highlight: Optional[str] = None
+
+class SearchResults(BaseModel):
+    model_config = ConfigDict(populate_by_name=True, alias_generator=to_camel)
+    
+    items: List[SearchHit]
+    total: int
+    next_offset: Optional[int] = None
+
+class ImportRowError(BaseModel):
+    model_config = ConfigDict(populate_by_name=True, alias_generator=to_camel)
+    
+    line: int
+    detail: Union[str, List[Dict[str, Any]]]
+
+class ImportResult(BaseModel):
+    model_config = ConfigDict(populate_by_name=True, alias_generator=to_camel)
+    
+    resource: str
+    received: int
+    imported: int
+    skipped: int
+    rejected: int
+    errors: List[ImportRowError]
+    elapsed_seconds: float
+    rows_per_second: float
+
+class Job(BaseModel):
+    model_config = ConfigDict(from_attributes=True, populate_by_name=True, alias_generator=to_camel)
+    
+    id: str
+    kind: str
+    # queued, running, succeeded or failed
+    status: str
+    attempts: int
+    max_attempts: int
+    error: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    created_at: LocalDateTime
+    started_at: Optional[LocalDateTime] = None
+    finished_at: Optional[LocalDateTime] = None
@@ -0,0 +1,241 @@
+import html
+import os
+import re
+import sqlite3
+from collections import OrderedDict
+from typing import Optional
+from sqlalchemy import String, func, literal, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from api import etags, models, schemas
+from api.database import IS_SQLITE
+
+# The SQLite backend has no tsvector columns, so it always searches in process.
+SEARCH_ENGINE = os.getenv("SEARCH_ENGINE", "sqlite" if IS_SQLITE else "postgres")
+SEARCH_INDEX_CACHE_SIZE = int(os.getenv("SEARCH_INDEX_CACHE_SIZE", "64"))
+MAX_SEARCH_LIMIT = 100
+
+# The engines mark matches with control characters, which highlighted()
+# turns into <mark> tags once the rest of the text has been HTML-escaped.
+HIGHLIGHT_START = "\x02"
+HIGHLIGHT_STOP = "\x03"
+
+def highlighted(text: Optional[str]) -> Optional[str]:
+    if text is None:
+        return None
+    return html.escape(text).replace(HIGHLIGHT_START, "<mark>").replace(HIGHLIGHT_STOP, "</mark>")
+
+class SearchEngine:
+    async def search(self, db: AsyncSession, user_id: str, q: str, search_type: str, limit: int, offset: int) -> schemas.SearchResults:
+        raise NotImplementedError
+
+def _results(rows, total: int, limit: int, offset: int) -> schemas.SearchResults:
+    next_offset = offset + limit if offset + limit < total else None
+    return schemas.SearchResults(
+        items=[schemas.SearchHit(**row) for row in rows],
+        total=total,
+        next_offset=next_offset,
+    )
+
+class PostgresSearchEngine(SearchEngine):
+    # Matches against the generated search_vector columns (GIN indexed) and
+    # ranks with ts_rank; only the returned page is run through ts_headline,
+    # which is the expensive part.
+    TITLE_HEADLINE = f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}, HighlightAll=true"
+    DESCRIPTION_HEADLINE = f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}, MaxWords=35, MinWords=15"
+
+    async def search(self, db, user_id, q, search_type, limit, offset):
+        query = func.websearch_to_tsquery("english", q)
+        Task = models.Task
+        Goal = models.Goal
+
+        selects = []
+        if search_type in ("all", "tasks"):
+            selects.append(select(
+                literal("task").label("type"),
+                Task.id,
+                Task.title,
+                Task.description,
+                Task.subject,
+                Task.status,
+                func.ts_rank(Task.search_vector, query).label("rank"),
+            ).where(Task.user_id == user_id, Task.search_vector.op("@@")(query)))
+        if search_type in ("all", "goals"):
+            selects.append(select(
+                literal("goal").label("type"),
+                Goal.id,
+                Goal.title,
+                Goal.description,
+                literal(None, String).label("subject"),
+                Goal.status,
+                func.ts_rank(Goal.search_vector, query).label("rank"),
+            ).where(Goal.user_id == user_id, Goal.search_vector.op("@@")(query)))
+        matches = union_all(*selects).subquery() if len(selects) > 1 else selects[0].subquery()
+
+        ordering = (matches.c.rank.desc(), matches.c.type, matches.c.id)
+        page = (
+            select(matches, func.count().over().label("total"))
+            .order_by(*ordering)
+            .limit(limit)
+            .offset(offset)
+            .subquery()
+        )
+        rows = (await db.execute(
+            select(
+                page.c.type,
+                page.c.id,
+                page.c.title,
+                page.c.subject,
+                page.c.status,
+                page.c.rank,
+                page.c.total,
+                func.ts_headline("english", page.c.title, query, self.TITLE_HEADLINE).label("title_highlight"),
+                func.ts_headline("english", page.c.description, query, self.DESCRIPTION_HEADLINE).label("description_highlight"),
+            ).order_by(page.c.rank.desc(), page.c.type, page.c.id)
+        )).all()
+
+        if rows:
+            total = rows[0].total
+        elif offset:
+            # Past the last page: count the matches without fetching them.
+            total = (await db.execute(select(func.count()).select_from(matches))).scalar()
+        else:
+            total = 0
+
+        hits = [
+            {
+                "type": row.type,
+                "id": row.id,
+                "title": row.title,
+                "subject": row.subject,
+                "status": row.status,
+                "rank": float(row.rank),
+                "title_highlight": highlighted(row.title_highlight),
+                "description_highlight": highlighted(row.description_highlight),
+            }
+            for row in rows
+        ]
+        return _results(hits, total, limit, offset)
+
+# Matches quoted phrases, negated words and plain words of a websearch-style
+# query string.
+QUERY_TOKEN = re.compile(r'(-?)"([^"]*)"|(-?)(\S+)')
+WORD = re.compile(r"\w+")
+
+def fts5_query(q: str) -> str:
+    # Rebuilds the user's query with every term quoted, so FTS5 syntax
+    # characters in the input cannot cause a query error. Like
+    # websearch_to_tsquery, "or" between two terms makes them alternatives.
+    groups = []
+    exclude = []
+    alternative = False
+    for negated_phrase, phrase, negated_word, word in QUERY_TOKEN.findall(q):
+        if not phrase and word.lower() == "or":
+            alternative = bool(groups)
+            continue
+        words = WORD.findall(phrase or word)
+        if not words:
+            continue
+        term = '"' + " ".join(words) + '"'
+        if negated_phrase or negated_word:
+            exclude.append(term)
+        elif alternative:
+            groups[-1].append(term)
+        else:
+            groups.append([term])
+        alternative = False
+    if not groups:
+        return ""
+    query = " AND ".join(f"({' OR '.join(group)})" if len(group) > 1 else group[0] for group in groups)
+    if exclude:
+        query = f"({query}) NOT ({' OR '.join(exclude)})"
+    return query
+
+class SqliteSearchEngine(SearchEngine):
+    # Fallback for local and test runs: an in-memory SQLite FTS5 index per
+    # user, built from that user's tasks and goals and rebuilt whenever their
+    # table versions change. Works against any database SQLAlchemy supports.
+    def __init__(self, maxsize: int = SEARCH_INDEX_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.indexes = OrderedDict()
+
+    async def _index(self, db: AsyncSession, user_id: str):
+        version = (
+            (await etags.table_version(db, models.Task, user_id))[0],
+            (await etags.table_version(db, models.Goal, user_id))[0],
+        )
+        entry = self.indexes.get(user_id)
+        if entry is not None and entry[0] == version:
+            self.indexes.move_to_end(user_id)
+            return entry[1]
+
+        Task = models.Task
+        Goal = models.Goal
+        tasks = (await db.execute(
+            select(literal("task"), Task.id, Task.status, Task.title, Task.subject, Task.description)
+            .where(Task.user_id == user_id)
+        )).all()
+        goals = (await db.execute(
+            select(literal("goal"), Goal.id, Goal.status, Goal.title, literal(None, String), Goal.description)
+            .where(Goal.user_id == user_id)
+        )).all()
+
+        index = sqlite3.connect(":memory:", check_same_thread=False)
+        index.execute(
+            "CREATE VIRTUAL TABLE documents USING fts5("
+            "type UNINDEXED, id UNINDEXED, status UNINDEXED, title, subject, description, tokenize='porter')"
+        )
+        index.executemany("INSERT INTO documents VALUES (?, ?, ?, ?, ?, ?)", [tuple(row) for row in tasks + goals])
+
+        self.indexes[user_id] = (version, index)
+        self.indexes.move_to_end(user_id)
+        while len(self.indexes) > self.maxsize:
+            _, (_, evicted) = self.indexes.popitem(last=False)
+            evicted.close()
+        return index
+
+    async def search(self, db, user_id, q, search_type, limit, offset):
+        match = fts5_query(q)
+        if not match:
+            return _results([], 0, limit, offset)
+
+        index = await self._index(db, user_id)
+        where = "documents MATCH ?"
+        params = [match]
+        if search_type != "all":
+            where += " AND type = ?"
+            params.append(search_type[:-1])
+
+        total = index.execute(f"SELECT count(*) FROM documents WHERE {where}", params).fetchone()[0]
+        # bm25 weights mirror the tsvector weights: title A, subject B,
+        # description C. bm25 scores are negative, better matches lower.
+        rows = index.execute(
+            "SELECT type, id, title, subject, status, -bm25(documents, 0, 0, 0, 1.0, 0.4, 0.2) AS rank, "
+            f"highlight(documents, 3, '{HIGHLIGHT_START}', '{HIGHLIGHT_STOP}'), "
+            f"snippet(documents, 5, '{HIGHLIGHT_START}', '{HIGHLIGHT_STOP}', '...', 24) "
+            f"FROM documents WHERE {where} ORDER BY rank DESC, type, id LIMIT ? OFFSET ?",
+            params + [limit, offset],
+        ).fetchall()
+
+        hits = [
+            {
+                "type": row[0],
+                "id": row[1],
+                "title": row[2],
+                "subject": row[3],
+                "status": row[4],
+                "rank": row[5],
+                "title_highlight": highlighted(row[6]),
+                "description_highlight": highlighted(row[7] or None),
+            }
+            for row in rows
+        ]
+        return _results(hits, total, limit, offset)
+
+def create_search_engine(name: str = SEARCH_ENGINE) -> SearchEngine:
+    if name == "sqlite":
+        return SqliteSearchEngine()
+    if name == "postgres":
+        return PostgresSearchEngine()
+    raise RuntimeError(f"Unknown SEARCH_ENGINE {name!r}; expected 'postgres' or 'sqlite'")
+
+search_engine = create_search_engine()
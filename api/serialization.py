@@ -0,0 +1,35 @@
+import time
+import orjson
+from fastapi import Response
+from sqlalchemy import inspect
+from api import metrics
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        started = time.perf_counter()
+        body = orjson.dumps(content)
+        metrics.observe_serialization(time.perf_counter() - started)
+        return body
+
+class ColumnProjection:
+    # Selects just the columns a response schema exposes and maps result rows
+    # straight to its camelCase keys, skipping ORM objects and per-row
+    # Pydantic validation. The schema stays the documented response_model.
+    # Column properties (a goal's related task ids) are selected like columns.
+    def __init__(self, model, schema):
+        attributes = inspect(model).column_attrs
+        names = [name for name in schema.model_fields if name in attributes]
+        self.columns = [getattr(model, name) for name in names]
+        self.keys = [schema.model_fields[name].alias or name for name in names]
+
+    def to_dicts(self, rows):
+        keys = self.keys
+        return [dict(zip(keys, row)) for row in rows]
+
+def json_response(content, response: Response = None, status_code: int = 200) -> FastJSONResponse:
+    # Returning a Response directly skips FastAPI's merge of headers set on
+    # the injected response (e.g. ETag), so carry them over here.
+    headers = dict(response.headers) if response is not None else None
+    return FastJSONResponse(content, status_code=status_code, headers=headers)
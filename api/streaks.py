@@ -0,0 +1,105 @@
+from datetime import date, datetime, timedelta
+from typing import Optional
+from sqlalchemy import case, func, or_, select, text, update
+from sqlalchemy.orm import Session
+from api import models
+from api.dialects import greatest
+
+# Like the analytics helpers these take a sync Session; async route handlers
+# run them through AsyncSession.run_sync inside their own transaction.
+
+def record_study_day(db: Session, user_id: str, now: Optional[datetime] = None):
+    # One UPDATE computes the new streak from the row itself, so concurrent
+    # completions cannot lose or double-count a day: a second writer blocks on
+    # the row lock, then re-checks the WHERE clause against the committed row
+    # and skips it once last_study_date is already today. Days older than the
+    # last study day are ignored rather than restarting the streak.
+    now = now or datetime.now()
+    today = now.date()
+    Settings = models.UserSettings
+    last_day = func.date(Settings.last_study_date)
+    streak = case((last_day == today - timedelta(days=1), Settings.current_streak + 1), else_=1)
+    db.execute(
+        update(Settings)
+        .where(Settings.user_id == user_id, or_(Settings.last_study_date.is_(None), last_day < today))
+        .values(
+            current_streak=streak,
+            longest_streak=greatest(Settings.longest_streak, streak),
+            last_study_date=now,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+# Gaps and islands over the distinct study days: consecutive days share the
+# same (day - row_number) anchor, so each anchor group is one streak. SQLite
+# stores days as text and numbers them with julianday().
+RECOMPUTE_STREAKS = """
+WITH completions AS (
+    SELECT user_id, completed_at FROM tasks
+    WHERE status = 'completed' AND completed_at IS NOT NULL {tasks_filter}
+    UNION ALL
+    SELECT user_id, completed_at FROM pomodoro_sessions
+    WHERE was_completed AND completed_at IS NOT NULL {sessions_filter}
+),
+days AS (
+    SELECT DISTINCT user_id, date(completed_at) AS day FROM completions
+),
+runs AS (
+    SELECT user_id, day, {day_number} - CAST(row_number() OVER (PARTITION BY user_id ORDER BY day) AS integer) AS anchor
+    FROM days
+),
+streaks AS (
+    SELECT user_id, count(*) AS length, max(day) AS last_day FROM runs GROUP BY user_id, anchor
+),
+history AS (
+    SELECT user_id, max(length) AS longest, max(length) FILTER (WHERE last_day >= :yesterday) AS current
+    FROM streaks GROUP BY user_id
+),
+latest AS (
+    SELECT user_id, max(completed_at) AS last_study FROM completions GROUP BY user_id
+)
+UPDATE user_settings SET
+    current_streak = coalesce(history.current, 0),
+    longest_streak = coalesce(history.longest, 0),
+    last_study_date = latest.last_study
+FROM user_settings target
+LEFT JOIN history ON history.user_id = target.user_id
+LEFT JOIN latest ON latest.user_id = target.user_id
+WHERE user_settings.id = target.id {settings_filter}
+"""
+
+def recompute_streaks(db: Session, user_id: Optional[str] = None, today: Optional[date] = None) -> int:
+    # Derives current/longest streaks from completed tasks and pomodoro
+    # sessions, for one user or (user_id=None) everybody, in the caller's
+    # transaction.
+    today = today or date.today()
+    Settings = models.UserSettings
+    params = {"yesterday": today - timedelta(days=1)}
+    filters = {"tasks_filter": "", "sessions_filter": "", "settings_filter": ""}
+    day_number = "julianday(day)" if db.get_bind().dialect.name == "sqlite" else "day"
+    lock = select(Settings.id).with_for_update()
+    if user_id is not None:
+        params["user_id"] = user_id
+        filters = {
+            "tasks_filter": "AND user_id = :user_id",
+            "sessions_filter": "AND user_id = :user_id",
+            "settings_filter": "AND user_settings.user_id = :user_id",
+        }
+        lock = lock.where(Settings.user_id == user_id)
+
+    # Lock the settings rows first: the UPDATE then runs with a snapshot taken
+    # after any in-flight record_study_day has committed, so it sees that
+    # transaction's completions instead of overwriting its streak.
+    db.execute(lock)
+    return db.execute(text(RECOMPUTE_STREAKS.format(day_number=day_number, **filters)), params).rowcount
+
+if __name__ == "__main__":
+    from api.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        recompute_streaks(db)
+        db.commit()
+    finally:
+        db.close()
+    print("Streaks recomputed successfully!")
@@ -0,0 +1,101 @@
+from typing import Iterable, List, Optional
+from sqlalchemy import delete, func, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from api.dialects import localnow
+from api.models import Subject, Task, UserSettings
+
+# A user's subjects are rows of the subjects table, one per name, so adding
+# or removing one touches a single row. Like the analytics helpers these take
+# a sync Session and run inside the caller's transaction. The user's settings
+# row must exist: subjects reference it, and every change bumps its
+# updated_at (and with it the settings ETag).
+
+DEFAULT_SUBJECTS = ["Math", "Physics", "Chemistry", "Biology", "History", "English", "Computer Science", "Other"]
+
+# Folds the old subject's daily_stats rows into the new subject's, which may
+# already have rows for the same days.
+MERGE_DAILY_STATS = """
+INSERT INTO daily_stats (user_id, date, subject, minutes_studied, tasks_completed, pomodoro_sessions_completed)
+SELECT user_id, date, :new, minutes_studied, tasks_completed, pomodoro_sessions_completed
+FROM daily_stats WHERE user_id = :user_id AND subject = :old
+ON CONFLICT (user_id, date, subject) DO UPDATE SET
+minutes_studied = daily_stats.minutes_studied + excluded.minutes_studied,
+tasks_completed = daily_stats.tasks_completed + excluded.tasks_completed,
+pomodoro_sessions_completed = daily_stats.pomodoro_sessions_completed + excluded.pomodoro_sessions_completed
+"""
+
+def _touch_settings(db: Session, user_id: str):
+    db.execute(
+        update(UserSettings).where(UserSettings.user_id == user_id).values(updated_at=localnow())
+        .execution_options(synchronize_session=False)
+    )
+
+def list_subjects(db: Session, user_id: str) -> List[str]:
+    return list(db.execute(
+        select(Subject.name).where(Subject.user_id == user_id).order_by(Subject.position, Subject.name)
+    ).scalars())
+
+def add_subject(db: Session, user_id: str, name: str) -> bool:
+    # Appends the subject; False if the user already has it.
+    next_position = select(func.coalesce(func.max(Subject.position) + 1, 0)).where(Subject.user_id == user_id).scalar_subquery()
+    added = db.execute(
+        pg_insert(Subject)
+        .values(user_id=user_id, name=name, position=next_position)
+        .on_conflict_do_nothing(index_elements=[Subject.user_id, Subject.name])
+        .returning(Subject.name)
+    ).first()
+    if added is None:
+        return False
+    _touch_settings(db, user_id)
+    return True
+
+def delete_subject(db: Session, user_id: str, name: str) -> bool:
+    # Tasks keep their subject; only the list changes.
+    deleted = db.execute(
+        delete(Subject).where(Subject.user_id == user_id, Subject.name == name).returning(Subject.name)
+    ).first()
+    if deleted is None:
+        return False
+    _touch_settings(db, user_id)
+    return True
+
+def replace_subjects(db: Session, user_id: str, names: Optional[Iterable[str]] = None):
+    # Sets the whole list, in order; the defaults when no names are given.
+    names = list(dict.fromkeys(DEFAULT_SUBJECTS if names is None else names))
+    db.execute(delete(Subject).where(Subject.user_id == user_id))
+    if names:
+        db.execute(pg_insert(Subject), [
+            {"user_id": user_id, "name": name, "position": position}
+            for position, name in enumerate(names)
+        ])
+    _touch_settings(db, user_id)
+
+def rename_subject(db: Session, user_id: str, old: str, new: str) -> Optional[List[str]]:
+    # Renames the subject in the list (merging it into `new` if the user
+    # already has that one), on every task (one update through
+    # ix_tasks_user_subject) and in the daily_stats rollup. Returns the ids
+    # of the renamed tasks, or None if the user has no subject `old`.
+    position = db.execute(select(Subject.position).where(Subject.user_id == user_id, Subject.name == old)).scalar()
+    if position is None:
+        return None
+    if old == new:
+        return []
+
+    # The renamed subject keeps its place in the list.
+    if add_subject(db, user_id, new):
+        db.execute(update(Subject).where(Subject.user_id == user_id, Subject.name == new).values(position=position))
+    delete_subject(db, user_id, old)
+
+    task_ids = list(db.execute(
+        update(Task)
+        .where(Task.user_id == user_id, Task.subject == old)
+        .values(subject=new)
+        .returning(Task.id)
+        .execution_options(synchronize_session=False)
+    ).scalars())
+    if task_ids:
+        params = {"user_id": user_id, "old": old, "new": new}
+        db.execute(text(MERGE_DAILY_STATS), params)
+        db.execute(text("DELETE FROM daily_stats WHERE user_id = :user_id AND subject = :old"), params)
+    return task_ids
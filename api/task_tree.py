@@ -0,0 +1,102 @@
+from typing import Optional
+from sqlalchemy import Boolean, Integer, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from api import models
+from api.dialects import id_path, path_append, path_contains
+
+# Each tree level nests two JSON levels (node and children list); orjson
+# refuses documents nested deeper than 255.
+MAX_TREE_DEPTH = 100
+
+def _percentage(part: int, whole: int) -> int:
+    return round((part / whole * 100)) if whole else 0
+
+def tree_query(projection, user_id: str, task_id: str, max_depth: int):
+    Task = models.Task
+    names = [column.key for column in projection.columns]
+
+    # The path of ids from the root marks a task that reappears below itself
+    # (a parent_task_id cycle); it is flagged and not expanded again.
+    tree = select(
+        *projection.columns,
+        literal(0, Integer).label("depth"),
+        id_path(Task.id).label("path"),
+        literal(False, Boolean).label("is_cycle"),
+    ).where(Task.id == task_id, Task.user_id == user_id).cte("tree", recursive=True)
+
+    # Children are joined on (user_id, parent_task_id), which is indexed.
+    # The walk goes one level past max_depth so a cut-off can be reported.
+    child = aliased(Task)
+    tree = tree.union_all(
+        select(
+            *[getattr(child, name) for name in names],
+            tree.c.depth + 1,
+            path_append(tree.c.path, child.id),
+            path_contains(tree.c.path, child.id),
+        ).where(
+            child.user_id == user_id,
+            child.parent_task_id == tree.c.id,
+            tree.c.depth <= max_depth,
+            tree.c.is_cycle.is_(False),
+        )
+    )
+    return select(
+        *[tree.c[name] for name in names],
+        tree.c.depth,
+        tree.c.is_cycle,
+    ).order_by(tree.c.depth, tree.c.created_at, tree.c.id)
+
+async def fetch_task_tree(db: AsyncSession, projection, user_id: str, task_id: str, max_depth: int = MAX_TREE_DEPTH) -> Optional[dict]:
+    rows = (await db.execute(tree_query(projection, user_id, task_id, max_depth))).all()
+
+    nodes = {}
+    parents = {}
+    truncated = False
+    cycle_detected = False
+    # Rows come ordered by depth, so every parent is seen before its children.
+    for row in rows:
+        if row.is_cycle:
+            cycle_detected = True
+            continue
+        if row.depth > max_depth:
+            truncated = True
+            continue
+
+        node = dict(zip(projection.keys, row))
+        completed = row.status == "completed"
+        node.update({
+            "depth": row.depth,
+            "estimatedDurationTotal": row.estimated_duration or 0,
+            "actualDurationTotal": row.actual_duration or 0,
+            "taskCount": 1,
+            "completedCount": int(completed),
+            "completionPercentage": 0,
+            "children": [],
+        })
+        nodes[row.id] = node
+        if row.depth > 0:
+            parents[row.id] = row.parent_task_id
+            nodes[row.parent_task_id]["children"].append(node)
+
+    if not nodes:
+        return None
+
+    # Deepest first, so each subtree total is complete before it is added
+    # to its parent.
+    for node_id, node in reversed(nodes.items()):
+        node["completionPercentage"] = _percentage(node["completedCount"], node["taskCount"])
+        parent_id = parents.get(node_id)
+        if parent_id is not None:
+            parent = nodes[parent_id]
+            for key in ("estimatedDurationTotal", "actualDurationTotal", "taskCount", "completedCount"):
+                parent[key] += node[key]
+
+    root = next(iter(nodes.values()))
+    return {
+        "root": root,
+        "nodeCount": len(nodes),
+        "maxDepth": max(node["depth"] for node in nodes.values()),
+        "truncated": truncated,
+        "cycleDetected": cycle_detected,
+    }
@@ -0,0 +1,25 @@
+import os
+import re
+from typing import Optional
+from fastapi import Header, HTTPException
+
+# Rows created before multi-user support, and requests without a user
+# header, belong to this user.
+DEFAULT_USER_ID = "default"
+
+# The header is trusted as-is: in a multi-user deployment it must be set by
+# the authenticating proxy in front of the API, and REQUIRE_USER_ID should be
+# enabled so that requests without it are rejected instead of falling back.
+USER_ID_HEADER = "X-User-Id"
+REQUIRE_USER_ID = os.getenv("REQUIRE_USER_ID", "false").lower() in ("1", "true", "yes")
+
+USER_ID_PATTERN = re.compile(r"^[A-Za-z0-9_.@:-]{1,128}$")
+
+async def get_current_user(user_id: Optional[str] = Header(None, alias=USER_ID_HEADER)) -> str:
+    if user_id is None:
+        if REQUIRE_USER_ID:
+            raise HTTPException(status_code=401, detail=f"Missing {USER_ID_HEADER} header")
+        return DEFAULT_USER_ID
+    if not USER_ID_PATTERN.match(user_id):
+        raise HTTPException(status_code=400, detail=f"Invalid {USER_ID_HEADER} header")
+    return user_id
@@ -0,0 +1,604 @@
+# Latency, throughput and memory for every API route on a synthetic dataset.
+# Users are seeded with tasks (some with subtasks), goals over those tasks,
+# pomodoro sessions and settings, shaped like the sample data seed_database
+# writes, under "bench-" user ids that are removed afterwards (unless --keep),
+# so point it at a scratch database.
+#
+# By default each route is driven in-process through an ASGI client, one
+# request at a time, and a few extra requests per route are traced with
+# tracemalloc for their peak allocation. --load starts uvicorn with several
+# workers (or uses --base-url) and runs a weighted mix of all routes from
+# concurrent connections for --duration seconds.
+#
+#     python -m benchmarks.api --users 20 --tasks-per-user 200 --output before.json
+#     python -m benchmarks.api --load --workers 4 --concurrency 32 --output load.json
+#     python -m benchmarks.api --compare before.json after.json
+#
+# Results are JSON (with the git commit they were taken at), and --compare
+# prints per-route changes between two result files, exiting non-zero when
+# a p50 or p95 latency regressed by more than --threshold percent.
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Callable, NamedTuple
+
+# Measure the database rather than the analytics cache, and keep scheduler
+# passes out of the timings.
+os.environ.setdefault("ANALYTICS_CACHE_TTL", "0")
+os.environ.setdefault("RECURRENCE_SCHEDULER", "false")
+
+try:
+    import httpx
+except ImportError:
+    raise SystemExit("The benchmark needs httpx: pip install -e '.[bench]'")
+
+from sqlalchemy import delete, insert
+from api import analytics, bootstrap, goal_progress, models, pomodoro, streaks, subjects
+from api.database import SessionLocal
+from api.users import USER_ID_HEADER
+
+USER_PREFIX = "bench-"
+SUBJECTS = ["Math", "Physics", "Chemistry", "Biology", "History", "English", "Computer Science"]
+TOPICS = ["Thermodynamics", "Calculus", "Organic Chemistry", "Genetics", "World War II", "Poetry", "Algorithms"]
+ACTIONS = ["Revise", "Practice", "Read", "Summarize", "Review"]
+SEARCH_TERMS = ["calculus", "revise chapter", "genetics or poetry", "practice -algorithms", '"world war"']
+
+# Long-lived stream: its cost is per event delivered, not per request.
+NOT_BENCHMARKED = {("GET", "/api/events")}
+
+def user_id(index: int) -> str:
+    return f"{USER_PREFIX}{index:05d}"
+
+def task_row(owner: str, i: int, now: datetime, parent_task_id=None) -> dict:
+    completed = i % 4 == 0
+    topic = TOPICS[i % len(TOPICS)]
+    return {
+        "id": str(uuid.uuid4()),
+        "user_id": owner,
+        "title": f"{ACTIONS[i % len(ACTIONS)]} Chapter {i % 20 + 1}: {topic}",
+        "description": f"Complete the {topic.lower()} exercises and solve the practice problems",
+        "status": "completed" if completed else ("pending", "in_progress")[i % 2],
+        "priority": ("critical", "important", "optional")[i % 3],
+        "subject": SUBJECTS[i % len(SUBJECTS)],
+        "deadline": now + timedelta(days=i % 21 - 7),
+        "estimated_duration": (30, 60, 90, 120)[i % 4],
+        "actual_duration": 45 if completed else None,
+        "parent_task_id": parent_task_id,
+        "resources": [f"https://example.com/{topic.lower().replace(' ', '-')}.pdf"] if i % 3 == 0 else None,
+        "is_recurring": False,
+        "completed_at": now - timedelta(days=i % 10) if completed else None,
+        "created_at": now - timedelta(minutes=i),
+    }
+
+def seed_dataset(users: int, tasks_per_user: int, goals_per_user: int, sessions_per_user: int) -> dict:
+    # Every tenth task gets three subtasks so task trees have some depth.
+    now = datetime.now()
+    dataset = {}
+    db = SessionLocal()
+    try:
+        for index in range(users):
+            owner = user_id(index)
+            tasks = []
+            for i in range(tasks_per_user):
+                task = task_row(owner, i, now)
+                tasks.append(task)
+                if i % 10 == 0:
+                    tasks.extend(task_row(owner, i + j, now, task["id"]) for j in range(1, 4))
+            task_ids = [task["id"] for task in tasks]
+            goals = [
+                {
+                    "id": str(uuid.uuid4()),
+                    "user_id": owner,
+                    "title": f"Master {TOPICS[i % len(TOPICS)]}",
+                    "description": "Finish every chapter before the exam",
+                    "type": ("short_term", "long_term")[i % 2],
+                    "target_date": now + timedelta(days=30 + i),
+                    "status": "active",
+                    "progress": 0,
+                }
+                for i in range(goals_per_user)
+            ]
+            goal_tasks = [
+                {"goal_id": goal["id"], "task_id": task_id, "position": position}
+                for goal in goals
+                for position, task_id in enumerate(random.sample(task_ids, min(5, len(task_ids))))
+            ]
+            sessions = [
+                {
+                    "id": str(uuid.uuid4()),
+                    "user_id": owner,
+                    "task_id": task_ids[i % len(task_ids)] if task_ids else None,
+                    "focus_duration": 25,
+                    "break_duration": 5,
+                    "was_completed": i % 5 != 0,
+                    "completed_at": now - timedelta(hours=i * 7),
+                    "created_at": now - timedelta(hours=i * 7),
+                }
+                for i in range(sessions_per_user)
+            ]
+            if tasks:
+                db.execute(insert(models.Task), tasks)
+            if goals:
+                db.execute(insert(models.Goal), goals)
+            if goal_tasks:
+                db.execute(insert(models.GoalTask), goal_tasks)
+            if sessions:
+                db.execute(insert(models.PomodoroSession), sessions)
+            db.execute(insert(models.UserSettings), [{"id": str(uuid.uuid4()), "user_id": owner}])
+            subjects.replace_subjects(db, owner)
+            db.commit()
+            dataset[owner] = {
+                "tasks": task_ids,
+                "parents": [task["id"] for task in tasks if task["parent_task_id"] is None],
+                "goals": [goal["id"] for goal in goals],
+            }
+        analytics.rebuild_daily_stats(db)
+        goal_progress.recompute_goal_progress(db)
+        streaks.recompute_streaks(db)
+        db.commit()
+        # Moves the seeded history out of the default partition, as the
+        # maintainer would.
+        pomodoro.maintain_sessions(db)
+    finally:
+        db.close()
+    return dataset
+
+def remove_dataset():
+    db = SessionLocal()
+    try:
+        for model in (
+            models.Task, models.Goal, models.PomodoroSession, models.UserSettings, models.DailyStats, models.TableVersion,
+            models.Job,
+        ):
+            db.execute(delete(model).where(model.user_id.startswith(USER_PREFIX)))
+        db.commit()
+    finally:
+        db.close()
+
+class Scenario(NamedTuple):
+    # prepare(client, user, data) makes any untimed setup requests and
+    # returns the keyword arguments of the timed one.
+    name: str
+    method: str
+    route: str
+    prepare: Callable
+    weight: int = 1
+
+def new_task(title="Benchmark task"):
+    return {"title": title, "subject": random.choice(SUBJECTS), "estimatedDuration": 60}
+
+async def create_tasks(client, user, count):
+    response = await client.post("/api/tasks/bulk", json=[new_task() for _ in range(count)], headers=headers(user))
+    response.raise_for_status()
+    return [task["id"] for task in response.json()["items"]]
+
+async def create_goal(client, user, data):
+    response = await client.post("/api/goals", json=goal_body(data), headers=headers(user))
+    response.raise_for_status()
+    return response.json()["id"]
+
+def goal_body(data):
+    return {
+        "title": "Benchmark goal",
+        "type": "short_term",
+        "targetDate": (datetime.now() + timedelta(days=30)).isoformat(),
+        "relatedTaskIds": random.sample(data["tasks"], min(5, len(data["tasks"]))),
+    }
+
+def headers(user):
+    return {USER_ID_HEADER: user}
+
+def import_body(count):
+    lines = [json.dumps(dict(new_task(f"Imported {i}"), id=str(uuid.uuid4()))) for i in range(count)]
+    return "\n".join(lines).encode()
+
+def fixed(url, **params):
+    async def prepare(client, user, data):
+        return {"url": url.format(task=random.choice(data["tasks"]), parent=random.choice(data["parents"]),
+                                  goal=random.choice(data["goals"]) if data["goals"] else "none"),
+                "params": params}
+    return prepare
+
+async def post_task(client, user, data):
+    return {"url": "/api/tasks", "json": new_task()}
+
+async def post_tasks_bulk(client, user, data):
+    return {"url": "/api/tasks/bulk", "json": [new_task() for _ in range(50)]}
+
+async def patch_task(client, user, data):
+    return {"url": f"/api/tasks/{random.choice(data['tasks'])}",
+            "json": {"status": random.choice(["pending", "in_progress", "completed"])}}
+
+async def patch_tasks_bulk(client, user, data):
+    ids = random.sample(data["tasks"], min(50, len(data["tasks"])))
+    return {"url": "/api/tasks/bulk",
+            "json": [{"id": task_id, "priority": random.choice(["critical", "important", "optional"])} for task_id in ids]}
+
+async def delete_task(client, user, data):
+    return {"url": f"/api/tasks/{(await create_tasks(client, user, 1))[0]}"}
+
+async def delete_tasks_bulk(client, user, data):
+    return {"url": "/api/tasks/bulk", "json": {"ids": await create_tasks(client, user, 50)}}
+
+async def post_goal(client, user, data):
+    return {"url": "/api/goals", "json": goal_body(data)}
+
+async def patch_goal(client, user, data):
+    goal_id = random.choice(data["goals"]) if data["goals"] else await create_goal(client, user, data)
+    return {"url": f"/api/goals/{goal_id}", "json": {"title": f"Benchmark goal {random.randrange(1000)}"}}
+
+async def delete_goal(client, user, data):
+    return {"url": f"/api/goals/{await create_goal(client, user, data)}"}
+
+async def post_session(client, user, data):
+    return {"url": "/api/pomodoro-sessions",
+            "json": {"taskId": random.choice(data["tasks"]), "focusDuration": 25, "breakDuration": 5,
+                     "wasCompleted": True, "completedAt": datetime.now().isoformat()}}
+
+async def list_sessions_range(client, user, data):
+    today = date.today()
+    return {"url": "/api/pomodoro-sessions",
+            "params": {"from": (today - timedelta(days=30)).isoformat(), "to": today.isoformat(), "completed": "true"}}
+
+async def session_stats(client, user, data):
+    return {"url": "/api/pomodoro-sessions/stats",
+            "params": {"bucket": random.choice(["day", "week", "month"]), "from": (date.today() - timedelta(days=90)).isoformat()}}
+
+async def patch_settings(client, user, data):
+    return {"url": "/api/settings", "json": {"pomodoroFocusDuration": random.choice([25, 30, 45])}}
+
+async def search(client, user, data):
+    return {"url": "/api/search", "params": {"q": random.choice(SEARCH_TERMS)}}
+
+async def import_tasks(client, user, data):
+    return {"url": "/api/import", "params": {"resource": "tasks"}, "content": import_body(100),
+            "headers": {"Content-Type": "application/x-ndjson"}}
+
+async def post_subject(client, user, data):
+    return {"url": "/api/subjects", "params": {"subject": f"Subject {random.randrange(20)}"}}
+
+async def delete_subject(client, user, data):
+    subject = f"Subject {random.randrange(20)}"
+    await client.post("/api/subjects", params={"subject": subject}, headers=headers(user))
+    return {"url": f"/api/subjects/{subject}"}
+
+async def rename_subject(client, user, data):
+    # Renames a subject on a throwaway user's tasks, so the seeded subjects stay in place.
+    throwaway = f"{USER_PREFIX}rename-{uuid.uuid4().hex[:12]}"
+    await create_tasks(client, throwaway, 50)
+    subject = random.choice(SUBJECTS)
+    return {"url": f"/api/subjects/{subject}", "json": {"name": f"{subject} II"}, "headers": headers(throwaway)}
+
+async def reset_all(client, user, data):
+    # Runs against a throwaway user so the seeded data stays in place.
+    throwaway = f"{USER_PREFIX}reset-{uuid.uuid4().hex[:12]}"
+    await create_tasks(client, throwaway, 20)
+    return {"url": "/api/reset-all", "headers": headers(throwaway)}
+
+async def get_job(client, user, data):
+    response = await client.post("/api/analytics/rebuild", headers=headers(user))
+    response.raise_for_status()
+    return {"url": response.headers["Location"]}
+
+SCENARIOS = [
+    Scenario("list tasks", "GET", "/api/tasks", fixed("/api/tasks"), 10),
+    Scenario("list tasks page", "GET", "/api/tasks", fixed("/api/tasks", limit=50, sort="deadline"), 10),
+    Scenario("create tasks bulk", "POST", "/api/tasks/bulk", post_tasks_bulk),
+    Scenario("update tasks bulk", "PATCH", "/api/tasks/bulk", patch_tasks_bulk),
+    Scenario("delete tasks bulk", "DELETE", "/api/tasks/bulk", delete_tasks_bulk),
+    Scenario("get task", "GET", "/api/tasks/{task_id}", fixed("/api/tasks/{task}"), 5),
+    Scenario("task tree", "GET", "/api/tasks/{task_id}/tree", fixed("/api/tasks/{parent}/tree"), 3),
+    Scenario("create task", "POST", "/api/tasks", post_task, 3),
+    Scenario("update task", "PATCH", "/api/tasks/{task_id}", patch_task, 5),
+    Scenario("delete task", "DELETE", "/api/tasks/{task_id}", delete_task),
+    Scenario("list goals", "GET", "/api/goals", fixed("/api/goals"), 5),
+    Scenario("get goal", "GET", "/api/goals/{goal_id}", fixed("/api/goals/{goal}"), 2),
+    Scenario("create goal", "POST", "/api/goals", post_goal),
+    Scenario("update goal", "PATCH", "/api/goals/{goal_id}", patch_goal),
+    Scenario("delete goal", "DELETE", "/api/goals/{goal_id}", delete_goal),
+    Scenario("list sessions", "GET", "/api/pomodoro-sessions", fixed("/api/pomodoro-sessions"), 5),
+    Scenario("list sessions range", "GET", "/api/pomodoro-sessions", list_sessions_range, 3),
+    Scenario("session stats", "GET", "/api/pomodoro-sessions/stats", session_stats, 3),
+    Scenario("create session", "POST", "/api/pomodoro-sessions", post_session, 3),
+    Scenario("get settings", "GET", "/api/settings", fixed("/api/settings"), 5),
+    Scenario("update settings", "PATCH", "/api/settings", patch_settings),
+    Scenario("recompute streak", "POST", "/api/settings/recompute-streak", fixed("/api/settings/recompute-streak")),
+    Scenario("analytics summary", "GET", "/api/analytics/summary", fixed("/api/analytics/summary"), 5),
+    Scenario("analytics daily", "GET", "/api/analytics/daily", fixed("/api/analytics/daily"), 5),
+    Scenario("rebuild analytics", "POST", "/api/analytics/rebuild", fixed("/api/analytics/rebuild")),
+    Scenario("list jobs", "GET", "/api/jobs", fixed("/api/jobs")),
+    Scenario("get job", "GET", "/api/jobs/{job_id}", get_job),
+    Scenario("metrics", "GET", "/api/metrics", fixed("/api/metrics")),
+    Scenario("search", "GET", "/api/search", search, 5),
+    Scenario("export tasks", "GET", "/api/export", fixed("/api/export", resource="tasks")),
+    Scenario("import tasks", "POST", "/api/import", import_tasks),
+    Scenario("add subject", "POST", "/api/subjects", post_subject),
+    Scenario("rename subject", "PATCH", "/api/subjects/{subject}", rename_subject),
+    Scenario("delete subject", "DELETE", "/api/subjects/{subject}", delete_subject),
+    Scenario("reset all", "POST", "/api/reset-all", reset_all),
+]
+
+def check_coverage(app):
+    # Lists API routes no scenario drives, so new routes are not silently
+    # left out of the numbers.
+    covered = {(scenario.method, scenario.route) for scenario in SCENARIOS} | NOT_BENCHMARKED
+    routes = {(method.upper(), path) for path, item in app.openapi()["paths"].items() for method in item}
+    for method, path in sorted(routes - covered):
+        print(f"warning: {method} {path} is not benchmarked")
+
+async def timed_request(client, scenario: Scenario, user: str, data: dict, trace: bool = False):
+    # Returns the request's latency, or with trace its peak traced allocation
+    # (setup requests are neither timed nor traced).
+    kwargs = await scenario.prepare(client, user, data)
+    kwargs["headers"] = dict(headers(user), **kwargs.get("headers", {}))
+    if trace:
+        tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        response = await client.request(scenario.method, **kwargs)
+        elapsed = time.perf_counter() - started
+        if trace:
+            elapsed = tracemalloc.get_traced_memory()[1]
+    finally:
+        if trace:
+            tracemalloc.stop()
+    if response.status_code >= 400:
+        raise RuntimeError(f"{scenario.name}: {scenario.method} {kwargs['url']} returned {response.status_code}: {response.text[:200]}")
+    return elapsed
+
+def summarize(values, elapsed=None):
+    values = sorted(value * 1000 for value in values)
+    summary = {
+        "requests": len(values),
+        "mean_ms": round(statistics.fmean(values), 3),
+        "p50_ms": round(percentile(values, 50), 3),
+        "p95_ms": round(percentile(values, 95), 3),
+        "p99_ms": round(percentile(values, 99), 3),
+    }
+    if elapsed:
+        summary["requests_per_second"] = round(len(values) / elapsed, 1)
+    return summary
+
+def percentile(values, p):
+    # Nearest-rank on sorted values.
+    return values[max(0, -(-len(values) * p // 100) - 1)]
+
+async def run_in_process(app, dataset, args):
+    users = list(dataset)
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        for scenario in SCENARIOS:
+            for _ in range(args.warmup):
+                user = random.choice(users)
+                await timed_request(client, scenario, user, dataset[user])
+
+            timings = []
+            for _ in range(args.requests):
+                user = random.choice(users)
+                timings.append(await timed_request(client, scenario, user, dataset[user]))
+            # Sequential requests, so throughput is one connection's.
+            summary = summarize(timings, sum(timings))
+
+            # tracemalloc slows everything down, so memory is traced on
+            # separate requests from the timed ones.
+            peaks = []
+            for _ in range(args.memory_samples):
+                user = random.choice(users)
+                peaks.append(await timed_request(client, scenario, user, dataset[user], trace=True))
+            if peaks:
+                summary["peak_alloc_kib"] = round(max(peaks) / 1024, 1)
+            results[scenario.name] = summary
+            print(f"{scenario.name:>20} p50 {summary['p50_ms']:>8.2f}ms  p95 {summary['p95_ms']:>8.2f}ms  "
+                  f"p99 {summary['p99_ms']:>8.2f}ms  {summary.get('peak_alloc_kib', 0):>9.1f}KiB")
+    return results
+
+def rss_kib(pid: int):
+    # Resident memory from /proc (Linux only).
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+
+def worker_pids(pid: int):
+    # uvicorn's worker processes, without multiprocessing's resource tracker.
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            children = [int(child) for child in f.read().split()]
+        workers = []
+        for child in children:
+            with open(f"/proc/{child}/cmdline", "rb") as f:
+                if b"resource_tracker" not in f.read():
+                    workers.append(child)
+        return workers
+    except OSError:
+        return []
+
+def start_server(args):
+    command = [
+        sys.executable, "-m", "uvicorn", "api.main:app",
+        "--host", "127.0.0.1", "--port", str(args.port), "--workers", str(args.workers), "--log-level", "warning",
+    ]
+    # The workers inherit the cache and scheduler settings above.
+    return subprocess.Popen(command)
+
+async def wait_until_ready(client, server, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server is not None and server.poll() is not None:
+            raise SystemExit("uvicorn exited before it started serving")
+        try:
+            if (await client.get("/api/settings")).status_code < 500:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.5)
+    raise SystemExit("Timed out waiting for the server to start")
+
+async def run_load(dataset, base_url, server, args):
+    users = list(dataset)
+    weighted = [scenario for scenario in SCENARIOS for _ in range(scenario.weight)]
+    timings = {scenario.name: [] for scenario in SCENARIOS}
+    errors = []
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        await wait_until_ready(client, server)
+
+        async def connection(stop_at):
+            while time.monotonic() < stop_at:
+                scenario = random.choice(weighted)
+                user = random.choice(users)
+                try:
+                    elapsed = await timed_request(client, scenario, user, dataset[user])
+                except Exception as e:
+                    errors.append(repr(e))
+                    continue
+                timings[scenario.name].append(elapsed)
+
+        # A short warm-up lets every worker open its pools first.
+        await asyncio.gather(*[connection(time.monotonic() + args.warmup_seconds) for _ in range(args.concurrency)])
+        for values in timings.values():
+            values.clear()
+        errors.clear()
+
+        started = time.monotonic()
+        await asyncio.gather(*[connection(started + args.duration) for _ in range(args.concurrency)])
+        elapsed = time.monotonic() - started
+
+    results = {name: summarize(values, elapsed) for name, values in timings.items() if values}
+    total = sum(len(values) for values in timings.values())
+    overall = summarize([value for values in timings.values() for value in values], elapsed) if total else {}
+    memory = None
+    if server is not None:
+        workers = worker_pids(server.pid)
+        memory = {"server_rss_kib": rss_kib(server.pid), "worker_rss_kib": [rss_kib(pid) for pid in workers]}
+
+    print(f"{total} requests in {elapsed:.1f}s ({total / elapsed:.0f}/s), {len(errors)} errors")
+    for name, summary in results.items():
+        print(f"{name:>20} {summary['requests']:>7} req  p50 {summary['p50_ms']:>8.2f}ms  "
+              f"p95 {summary['p95_ms']:>8.2f}ms  p99 {summary['p99_ms']:>8.2f}ms")
+    for error in errors[:10]:
+        print(f"  error: {error}")
+    return {"overall": overall, "routes": results, "errors": len(errors), "memory": memory}
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def route_results(report):
+    return report["results"]["routes"] if report["mode"] == "load" else report["results"]
+
+def compare(baseline_path, current_path, threshold):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    with open(current_path) as f:
+        current = json.load(f)
+    print(f"{baseline.get('commit')} -> {current.get('commit')}")
+    print(f"{'route':>20} {'p50 ms':>20} {'p95 ms':>20}")
+    old_routes = route_results(baseline)
+    regressions = 0
+    for name, new in route_results(current).items():
+        old = old_routes.get(name)
+        if old is None:
+            continue
+        cells = []
+        for key in ("p50_ms", "p95_ms"):
+            change = (new[key] - old[key]) / old[key] * 100 if old[key] else 0
+            regressed = change > threshold
+            regressions += regressed
+            cells.append(f"{old[key]:.2f} -> {new[key]:.2f} {change:+.0f}%{'!' if regressed else ' '}".rjust(20))
+        print(f"{name:>20} " + " ".join(cells))
+    if regressions:
+        print(f"{regressions} latencies regressed by more than {threshold:g}%")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency, throughput and memory of every API route")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--tasks-per-user", type=int, default=200)
+    parser.add_argument("--goals-per-user", type=int, default=20)
+    parser.add_argument("--sessions-per-user", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=100, help="timed requests per route (in-process)")
+    parser.add_argument("--warmup", type=int, default=5, help="untimed requests per route (in-process)")
+    parser.add_argument("--memory-samples", type=int, default=3, help="tracemalloc-traced requests per route (in-process)")
+    parser.add_argument("--load", action="store_true", help="run a concurrent load test against uvicorn workers")
+    parser.add_argument("--workers", type=int, default=4, help="uvicorn workers (--load)")
+    parser.add_argument("--port", type=int, default=8765, help="port for the uvicorn workers (--load)")
+    parser.add_argument("--base-url", help="load test a running server instead of starting uvicorn (--load)")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent connections (--load)")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of measured load (--load)")
+    parser.add_argument("--warmup-seconds", type=float, default=5, help="seconds of unmeasured load (--load)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the dataset and request mix")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--keep", action="store_true", help="leave the seeded users in the database")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"), help="compare two result files and exit")
+    parser.add_argument("--threshold", type=float, default=10, help="regression threshold in percent (--compare)")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+
+    random.seed(args.seed)
+    from api.main import app
+    check_coverage(app)
+    # The ASGI client does not run the app's lifespan.
+    bootstrap.bootstrap(seed=False)
+
+    remove_dataset()
+    server = None
+    try:
+        started = time.perf_counter()
+        dataset = seed_dataset(args.users, args.tasks_per_user, args.goals_per_user, args.sessions_per_user)
+        print(f"Seeded {args.users} users in {time.perf_counter() - started:.1f}s")
+
+        if args.load:
+            base_url = args.base_url
+            if not base_url:
+                server = start_server(args)
+                base_url = f"http://127.0.0.1:{args.port}"
+            results = asyncio.run(run_load(dataset, base_url, server, args))
+        else:
+            results = asyncio.run(run_in_process(app, dataset, args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        if not args.keep:
+            remove_dataset()
+
+    report = {
+        "commit": git_commit(),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "mode": "load" if args.load else "in-process",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "args": {key: value for key, value in vars(args).items() if key != "compare"},
+        # ru_maxrss is KiB on Linux, bytes on macOS.
+        "max_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# Compares the ORM + Pydantic list serialization path with the column
+# projection + orjson path used by the list endpoints. Rows are built in
+# memory, so nothing is read from the database:
+#
+#     python -m benchmarks.serialization --sizes 1000 10000 100000
+import argparse
+import json
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+from pydantic import TypeAdapter
+from api import models, schemas
+from api.serialization import ColumnProjection, FastJSONResponse
+
+def make_tasks(count: int):
+    now = datetime.now()
+    tasks = []
+    for i in range(count):
+        tasks.append(models.Task(
+            id=str(uuid.uuid4()),
+            title=f"Task {i}",
+            description="Solve the practice problems at the end of the chapter",
+            status=("pending", "in_progress", "completed")[i % 3],
+            priority=("critical", "important", "optional")[i % 3],
+            subject=("Math", "Physics", "Chemistry")[i % 3],
+            deadline=now + timedelta(days=i % 30),
+            estimated_duration=60,
+            actual_duration=45 if i % 3 == 2 else None,
+            resources=["https://example.com/notes.pdf"] if i % 2 else None,
+            is_recurring=False,
+            completed_at=now if i % 3 == 2 else None,
+            created_at=now,
+        ))
+    return tasks
+
+def orm_path(tasks):
+    # What FastAPI does for response_model=List[schemas.Task].
+    adapter = TypeAdapter(List[schemas.Task])
+    validated = adapter.validate_python(tasks, from_attributes=True)
+    content = adapter.dump_python(validated, mode="json", by_alias=True)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+def projection_path(projection, rows):
+    return FastJSONResponse(projection.to_dicts(rows)).body
+
+def best_of(repeat: int, fn, *args):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark list endpoint serialization")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    projection = ColumnProjection(models.Task, schemas.Task)
+    print(f"{'rows':>8} {'orm+pydantic':>14} {'projection':>12} {'speedup':>8}")
+    for size in args.sizes:
+        tasks = make_tasks(size)
+        rows = [tuple(getattr(task, column.key) for column in projection.columns) for task in tasks]
+        old = best_of(args.repeat, orm_path, tasks)
+        new = best_of(args.repeat, projection_path, projection, rows)
+        print(f"{size:>8} {old * 1000:>12.1f}ms {new * 1000:>10.1f}ms {old / new:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
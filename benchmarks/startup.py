@@ -0,0 +1,89 @@
+# Worker boot time: how long a fresh process takes to import the app, run
+# its lifespan startup (the bootstrap, the change feed listener) and serve a
+# first request. Each run is a new interpreter, so nothing is warm but the
+# OS file cache and the database. --parallel boots that many processes at
+# once, as an autoscaler adding workers would:
+#
+#     python -m benchmarks.startup --runs 5
+#     python -m benchmarks.startup --runs 3 --parallel 8 --output startup.json
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Runs in each child process; prints its timings as JSON.
+CHILD = """
+import asyncio, json, time
+started = time.perf_counter()
+from api.main import app
+imported = time.perf_counter()
+
+async def boot():
+    import httpx
+    async with app.router.lifespan_context(app):
+        ready = time.perf_counter()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://startup") as client:
+            (await client.get("/api/settings")).raise_for_status()
+        served = time.perf_counter()
+    return ready, served
+
+ready, served = asyncio.run(boot())
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "startup_ms": (ready - imported) * 1000,
+    "first_request_ms": (served - ready) * 1000,
+    "total_ms": (served - started) * 1000,
+}))
+"""
+
+CONFIGS = {
+    "bootstrap on startup": {"BOOTSTRAP_ON_STARTUP": "true"},
+    "bootstrap skipped": {"BOOTSTRAP_ON_STARTUP": "false"},
+}
+
+def boot(env):
+    result = subprocess.run([sys.executable, "-c", CHILD], env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise SystemExit(f"Worker failed to start:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Time a worker's import, startup and first request")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--parallel", type=int, default=1, help="processes booted at once per run")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault("RECURRENCE_SCHEDULER", "false")
+    # One untimed boot brings the schema up to date, so every timed run
+    # measures a worker joining an existing deployment.
+    boot(dict(env, BOOTSTRAP_ON_STARTUP="true"))
+
+    results = {}
+    print(f"{'':>22} {'import':>10} {'startup':>10} {'1st req':>10} {'total':>10}  (median ms)")
+    for name, overrides in CONFIGS.items():
+        config_env = dict(env, **overrides)
+        runs = []
+        for _ in range(args.runs):
+            with ThreadPoolExecutor(args.parallel) as pool:
+                runs.extend(pool.map(boot, [config_env] * args.parallel))
+        summary = {key: round(statistics.median(run[key] for run in runs), 1) for key in runs[0]}
+        summary["max_total_ms"] = round(max(run["total_ms"] for run in runs), 1)
+        results[name] = summary
+        print(
+            f"{name:>22} {summary['import_ms']:>10.1f} {summary['startup_ms']:>10.1f} "
+            f"{summary['first_request_ms']:>10.1f} {summary['total_ms']:>10.1f}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+# Load test for multi-user tenancy: seeds users in growing steps and measures
+# per-request latency for randomly chosen users at each step. With user-leading
+# indexes the latencies should stay flat as the total user count grows.
+#
+# Rows are written straight into DATABASE_URL under "loadtest-" user ids and
+# removed afterwards (unless --keep), so point it at a scratch database:
+#
+#     python -m benchmarks.tenancy --users 10 100 1000 5000
+#     python -m benchmarks.tenancy --base-url http://localhost:5000   # running server
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta
+
+# Measure the database, not the analytics cache (in-process runs only).
+os.environ.setdefault("ANALYTICS_CACHE_TTL", "0")
+
+try:
+    import httpx
+except ImportError:
+    raise SystemExit("The load test needs httpx: pip install -e '.[bench]'")
+
+from sqlalchemy import delete, insert
+from api import analytics, bootstrap, models
+from api.database import SessionLocal
+from api.users import USER_ID_HEADER
+
+USER_PREFIX = "loadtest-"
+SUBJECTS = ["Math", "Physics", "Chemistry", "Biology", "History"]
+ENDPOINTS = {
+    "tasks": "/api/tasks?limit=50",
+    "sessions": "/api/pomodoro-sessions",
+    "settings": "/api/settings",
+    "summary": "/api/analytics/summary",
+}
+
+def user_id(index: int) -> str:
+    return f"{USER_PREFIX}{index:07d}"
+
+def seed_users(start: int, stop: int, tasks_per_user: int, sessions_per_user: int):
+    now = datetime.now()
+    db = SessionLocal()
+    try:
+        for first in range(start, stop, 500):
+            owners = [user_id(index) for index in range(first, min(first + 500, stop))]
+            tasks, sessions, settings = [], [], []
+            for owner in owners:
+                for i in range(tasks_per_user):
+                    completed = i % 3 == 0
+                    tasks.append({
+                        "id": str(uuid.uuid4()),
+                        "user_id": owner,
+                        "title": f"Task {i}",
+                        "status": "completed" if completed else "pending",
+                        "priority": "important",
+                        "subject": SUBJECTS[i % len(SUBJECTS)],
+                        "deadline": now + timedelta(days=i % 14),
+                        "actual_duration": 30 if completed else None,
+                        "completed_at": now - timedelta(days=i % 7) if completed else None,
+                        "created_at": now - timedelta(minutes=i),
+                    })
+                for i in range(sessions_per_user):
+                    sessions.append({
+                        "id": str(uuid.uuid4()),
+                        "user_id": owner,
+                        "focus_duration": 25,
+                        "break_duration": 5,
+                        "was_completed": True,
+                        "completed_at": now - timedelta(hours=i),
+                        "created_at": now - timedelta(hours=i),
+                    })
+                settings.append({"id": str(uuid.uuid4()), "user_id": owner})
+            db.execute(insert(models.Task), tasks)
+            db.execute(insert(models.PomodoroSession), sessions)
+            db.execute(insert(models.UserSettings), settings)
+            # The rollup of just these users; earlier steps' rows stay.
+            analytics.rebuild_daily_stats(db, user_ids=owners)
+            db.commit()
+    finally:
+        db.close()
+
+def remove_users():
+    db = SessionLocal()
+    try:
+        for model in (models.Task, models.PomodoroSession, models.UserSettings, models.DailyStats, models.TableVersion):
+            db.execute(delete(model).where(model.user_id.startswith(USER_PREFIX)))
+        db.commit()
+    finally:
+        db.close()
+
+async def measure(client, user_count: int, requests: int, concurrency: int):
+    timings = {name: [] for name in ENDPOINTS}
+    jobs = [(name, random.randrange(user_count)) for name in ENDPOINTS for _ in range(requests)]
+    random.shuffle(jobs)
+    queue = asyncio.Queue()
+    for job in jobs:
+        queue.put_nowait(job)
+
+    async def worker():
+        while not queue.empty():
+            name, index = queue.get_nowait()
+            started = time.perf_counter()
+            response = await client.get(ENDPOINTS[name], headers={USER_ID_HEADER: user_id(index)})
+            response.raise_for_status()
+            timings[name].append((time.perf_counter() - started) * 1000)
+
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return {name: summarize(values) for name, values in timings.items()}
+
+def summarize(values):
+    values = sorted(values)
+    return {
+        "p50_ms": round(statistics.median(values), 2),
+        "p95_ms": round(values[int(len(values) * 0.95) - 1], 2),
+        "p99_ms": round(values[int(len(values) * 0.99) - 1], 2),
+    }
+
+def make_client(app, base_url):
+    if base_url:
+        return httpx.AsyncClient(base_url=base_url, timeout=60)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest", timeout=60)
+
+async def run(app, args):
+    results = []
+    seeded = 0
+    async with make_client(app, args.base_url) as client:
+        for user_count in sorted(args.users):
+            started = time.perf_counter()
+            seed_users(seeded, user_count, args.tasks_per_user, args.sessions_per_user)
+            seeded = user_count
+            print(f"Seeded {user_count} users in {time.perf_counter() - started:.1f}s")
+
+            # One warm-up pass so pool setup is not counted.
+            await measure(client, user_count, 5, args.concurrency)
+            latencies = await measure(client, user_count, args.requests, args.concurrency)
+            results.append({"users": user_count, "latency": latencies})
+
+    print(f"{'users':>8} " + " ".join(f"{name + ' p50/p95 ms':>22}" for name in ENDPOINTS))
+    for result in results:
+        cells = [
+            f"{latency['p50_ms']:.1f}/{latency['p95_ms']:.1f}".rjust(22)
+            for latency in result["latency"].values()
+        ]
+        print(f"{result['users']:>8} " + " ".join(cells))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-user latency as the number of users grows")
+    parser.add_argument("--users", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    parser.add_argument("--tasks-per-user", type=int, default=30)
+    parser.add_argument("--sessions-per-user", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint per step")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--base-url", help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--keep", action="store_true", help="leave the seeded users in the database")
+    args = parser.parse_args()
+
+    app = None
+    if not args.base_url:
+        from api.main import app
+    # The ASGI client does not run the app's lifespan, and the users are
+    # seeded directly in either case.
+    bootstrap.bootstrap(seed=False)
+
+    remove_users()
+    try:
+        results = asyncio.run(run(app, args))
+    finally:
+        if not args.keep:
+            remove_users()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
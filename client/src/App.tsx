@@ -14,6 +14,7 @@ import Goals from "@/pages/goals";
 import Analytics from "@/pages/analytics";
 import Settings from "@/pages/settings";
 import NotFound from "@/pages/not-found";
+import { useChangeFeed } from "@/hooks/use-change-feed";
 
 function Router() {
   return (
@@ -30,6 +31,8 @@ function Router() {
 }
 
 function App() {
+  useChangeFeed();
+
   const style = {
     "--sidebar-width": "16rem",
     "--sidebar-width-icon": "3rem",
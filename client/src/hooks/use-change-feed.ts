@@ -0,0 +1,55 @@
+import * as React from "react"
+import { queryClient } from "@/lib/queryClient"
+
+// Queries each server event type makes stale. Task and session changes also
+// move the analytics, and completions move the streak in settings.
+const ANALYTICS = ["/api/analytics/summary", "/api/analytics/daily"]
+const INVALIDATES: Record<string, string[]> = {
+  task: ["/api/tasks", ...ANALYTICS],
+  goal: ["/api/goals"],
+  "pomodoro-session": ["/api/pomodoro-sessions", ...ANALYTICS],
+  settings: ["/api/settings"],
+}
+
+function invalidate(keys: string[]) {
+  for (const key of keys) {
+    queryClient.invalidateQueries({ queryKey: [key] })
+  }
+}
+
+// Keeps cached queries fresh from the /api/events stream instead of polling.
+// After a reconnect or a "resync" event everything is refetched, since
+// events sent in between are not replayed.
+export function useChangeFeed() {
+  React.useEffect(() => {
+    const source = new EventSource("/api/events", { withCredentials: true })
+    let connected = false
+
+    source.onopen = () => {
+      if (connected) {
+        queryClient.invalidateQueries()
+      }
+      connected = true
+    }
+    const onChange = (event: MessageEvent) => {
+      const { type } = JSON.parse(event.data) as { type: string }
+      const keys = INVALIDATES[type.split(".")[0]]
+      if (keys) {
+        invalidate(keys)
+      } else {
+        queryClient.invalidateQueries()
+      }
+    }
+
+    const types = [
+      "task.created", "task.updated", "task.deleted", "task.imported",
+      "goal.created", "goal.updated", "goal.deleted", "goal.imported",
+      "pomodoro-session.created", "pomodoro-session.imported",
+      "settings.updated", "data.reset", "resync",
+    ]
+    for (const type of types) {
+      source.addEventListener(type, onChange)
+    }
+    return () => source.close()
+  }, [])
+}
@@ -1,4 +1,5 @@
 import { QueryClient, QueryFunction } from "@tanstack/react-query";
+import type { Job } from "@shared/schema";
 
 async function throwIfResNotOk(res: Response) {
   if (!res.ok) {
@@ -23,6 +24,19 @@ export async function apiRequest(
   return res;
 }
 
+// Polls the job a 202 response started until it finishes; throws if it failed.
+export async function waitForJob(res: Response, intervalMs = 500): Promise<Job> {
+  let job: Job = await res.json();
+  while (job.status === "queued" || job.status === "running") {
+    await new Promise((resolve) => setTimeout(resolve, intervalMs));
+    job = await (await apiRequest("GET", `/api/jobs/${job.id}`)).json();
+  }
+  if (job.status === "failed") {
+    throw new Error(job.error || "Job failed");
+  }
+  return job;
+}
+
 type UnauthorizedBehavior = "returnNull" | "throw";
 export const getQueryFn: <T>(options: {
   on401: UnauthorizedBehavior;
@@ -17,7 +17,7 @@ import {
 } from "@/components/ui/alert-dialog";
 import { Settings as SettingsIcon, Plus, X, RotateCcw } from "lucide-react";
 import type { UserSettings } from "@shared/schema";
-import { apiRequest, queryClient } from "@/lib/queryClient";
+import { apiRequest, queryClient, waitForJob } from "@/lib/queryClient";
 import { useToast } from "@/hooks/use-toast";
 
 export default function Settings() {
@@ -68,7 +68,7 @@ export default function Settings() {
   });
 
   const resetAllMutation = useMutation({
-    mutationFn: () => apiRequest("POST", "/api/reset-all"),
+    mutationFn: async () => waitForJob(await apiRequest("POST", "/api/reset-all")),
     onSuccess: () => {
       queryClient.invalidateQueries({ queryKey: ["/api/tasks"] });
       queryClient.invalidateQueries({ queryKey: ["/api/goals"] });
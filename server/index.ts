@@ -84,12 +84,37 @@ if (isProduction) {
     app.use("/api", async (req, res) => {
       const targetUrl = `http://127.0.0.1:${apiPort}/api${req.url}`;
       try {
+        const abort = new AbortController();
+        res.on("close", () => abort.abort());
         const response = await fetch(targetUrl, {
           method: req.method,
           headers: req.headers as HeadersInit,
           body: req.method !== "GET" && req.method !== "HEAD" ? JSON.stringify(req.body) : undefined,
+          signal: abort.signal,
         });
         
+        // Server-sent events (/api/events) never end, so pass them through
+        // as they arrive instead of buffering the body.
+        if (response.headers.get("content-type")?.startsWith("text/event-stream") && response.body) {
+          res.status(response.status);
+          response.headers.forEach((value, key) => {
+            res.setHeader(key, value);
+          });
+          res.flushHeaders();
+          const reader = response.body.getReader();
+          try {
+            for (;;) {
+              const { done, value } = await reader.read();
+              if (done) break;
+              res.write(value);
+            }
+          } catch {
+            // The browser went away and the upstream request was aborted.
+          }
+          res.end();
+          return;
+        }
+        
         const data = await response.text();
         res.status(response.status);
         response.headers.forEach((value, key) => {
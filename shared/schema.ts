@@ -118,3 +118,17 @@ export type AnalyticsSummary = {
   completionRate: number; // percentage
   focusEfficiency: number; // percentage based on pomodoro completion
 };
+
+// Background job, returned with 202 by long-running endpoints
+export type Job = {
+  id: string;
+  kind: string;
+  status: "queued" | "running" | "succeeded" | "failed";
+  attempts: number;
+  maxAttempts: number;
+  error: string | null;
+  result: Record<string, unknown> | null;
+  createdAt: string;
+  startedAt: string | null;
+  finishedAt: string | null;
+};
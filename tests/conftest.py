@@ -0,0 +1,105 @@
+import os
+import uuid
+from typing import NamedTuple
+
+# Read when the api modules are imported: the background loops stay off so
+# tests run them by hand, and change events stay in-process on both backends.
+os.environ.update(
+    BOOTSTRAP_ON_STARTUP="false",
+    SEED_SAMPLE_DATA="false",
+    RECURRENCE_SCHEDULER="false",
+    SESSION_MAINTENANCE="false",
+    JOB_WORKER="false",
+    EVENTS_TRANSPORT="memory",
+)
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from api import bootstrap, database, jobs, routes, search
+from api.cache import analytics_cache
+from api.main import app
+from api.users import USER_ID_HEADER
+
+# Every test runs on SQLite, in a temporary database file, and on
+# PostgreSQL when TEST_DATABASE_URL names a scratch database. Its public
+# schema is dropped when the suite starts.
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+BACKENDS = ["sqlite", "postgresql"]
+
+class Backend(NamedTuple):
+    name: str
+    client: TestClient
+
+def use_database(url: str):
+    # Points the app at another database, as if it had started with that
+    # DATABASE_URL: the engines are created again on first use, and search
+    # switches to the backend's default engine.
+    backend = make_url(url).get_backend_name()
+    database.DATABASE_URL = url
+    database.DB_BACKEND = backend
+    database.IS_SQLITE = backend == "sqlite"
+    database._engines.cache_clear()
+    routes.search_engine = search.create_search_engine("sqlite" if database.IS_SQLITE else "postgres")
+
+@pytest.fixture(scope="session", params=BACKENDS)
+def backend(request, tmp_path_factory):
+    if request.param == "postgresql":
+        if not TEST_DATABASE_URL:
+            pytest.skip("TEST_DATABASE_URL is not set")
+        use_database(TEST_DATABASE_URL)
+        with database.engine.begin() as connection:
+            connection.execute(text("DROP SCHEMA public CASCADE"))
+            connection.execute(text("CREATE SCHEMA public"))
+    else:
+        use_database(f"sqlite:///{tmp_path_factory.mktemp('sqlite') / 'studyflow.db'}")
+    bootstrap.bootstrap(seed=False)
+
+    with TestClient(app) as client:
+        yield Backend(request.param, client)
+        # Pooled async connections belong to the client's event loop.
+        client.portal.call(database.async_engine.dispose)
+    database.engine.dispose()
+
+@pytest.fixture
+def user():
+    # Each test gets a user of its own, so tests share the database but
+    # never see each other's rows.
+    return f"test-{uuid.uuid4().hex[:12]}"
+
+@pytest.fixture
+def client(backend, user):
+    backend.client.headers[USER_ID_HEADER] = user
+    return backend.client
+
+@pytest.fixture
+def db(backend):
+    session = database.SessionLocal()
+    yield session
+    session.close()
+
+@pytest.fixture
+def run_jobs(backend, db):
+    # Runs the queued jobs as the worker would, analytics cache included.
+    def run():
+        ran = jobs.run_due(db)
+        for user_id in {job.user_id for job in ran}:
+            backend.client.portal.call(analytics_cache.invalidate, user_id)
+        return ran
+    return run
+
+@pytest.fixture(scope="session")
+def _backend_results():
+    return {}
+
+@pytest.fixture
+def same_on_all_backends(request, backend, _backend_results):
+    # Records a result of the current test; whichever backend runs the test
+    # later has to produce the same one.
+    def check(value, key: str = ""):
+        results = _backend_results.setdefault((request.node.originalname, key), {})
+        results[backend.name] = value
+        for other, expected in results.items():
+            assert value == expected, f"{key or request.node.originalname}: {backend.name} differs from {other}"
+    return check
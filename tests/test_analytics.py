@@ -0,0 +1,138 @@
+import random
+from datetime import datetime, timedelta
+import pytest
+from api import analytics, models, schemas
+
+def python_summary(db, user_id):
+    # The summary as get_analytics_summary computed it before it moved to SQL
+    # aggregates: every row loaded, then counted and summed in Python.
+    now = datetime.now()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    week_ago = today - timedelta(days=7)
+
+    tasks = db.query(models.Task).filter(models.Task.user_id == user_id).all()
+    sessions = db.query(models.PomodoroSession).filter(models.PomodoroSession.user_id == user_id).all()
+    settings = db.query(models.UserSettings).filter(models.UserSettings.user_id == user_id).first()
+
+    total_study_time = sum(s.focus_duration for s in sessions if s.was_completed)
+    today_study_time = sum(
+        s.focus_duration for s in sessions
+        if s.was_completed and s.completed_at and s.completed_at >= today
+    )
+    week_study_time = sum(
+        s.focus_duration for s in sessions
+        if s.was_completed and s.completed_at and s.completed_at >= week_ago
+    )
+    tasks_completed_today = len([
+        t for t in tasks
+        if t.status == "completed" and t.completed_at and t.completed_at >= today
+    ])
+    tasks_completed_week = len([
+        t for t in tasks
+        if t.status == "completed" and t.completed_at and t.completed_at >= week_ago
+    ])
+
+    subject_map = {}
+    for task in tasks:
+        if task.subject and task.status == "completed" and task.actual_duration:
+            subject_map[task.subject] = subject_map.get(task.subject, 0) + task.actual_duration
+
+    completed_tasks = len([t for t in tasks if t.status == "completed"])
+    total_sessions = len(sessions)
+    completed_sessions = len([s for s in sessions if s.was_completed])
+
+    return schemas.AnalyticsSummary(
+        total_study_time=total_study_time,
+        today_study_time=today_study_time,
+        week_study_time=week_study_time,
+        tasks_completed_today=tasks_completed_today,
+        tasks_completed_week=tasks_completed_week,
+        current_streak=settings.current_streak if settings else 0,
+        subject_distribution=[
+            schemas.SubjectDistribution(subject=subject, minutes=minutes)
+            for subject, minutes in subject_map.items()
+        ],
+        completion_rate=round((completed_tasks / len(tasks) * 100)) if tasks else 0,
+        focus_efficiency=round((completed_sessions / total_sessions * 100)) if total_sessions else 0,
+    )
+
+def comparable(summary):
+    # The SQL version orders the subject distribution by subject; the old one
+    # kept the order tasks were loaded in.
+    data = summary.model_dump()
+    data["subject_distribution"].sort(key=lambda item: item["subject"])
+    return data
+
+def timestamps(rng):
+    # Around the day and week boundaries compute_summary counts from, to the
+    # microsecond, plus NULL and anywhere in the last two weeks.
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    week_ago = today - timedelta(days=7)
+    boundaries = [
+        today, today - timedelta(microseconds=1), today + timedelta(microseconds=1),
+        week_ago, week_ago - timedelta(microseconds=1), week_ago + timedelta(microseconds=1),
+        None,
+    ]
+    if rng.random() < 0.5:
+        return rng.choice(boundaries)
+    return today - timedelta(days=14) + timedelta(seconds=rng.randrange(15 * 24 * 3600))
+
+def generate(db, user_id, seed, tasks, sessions):
+    rng = random.Random(seed)
+    for _ in range(tasks):
+        db.add(models.Task(
+            user_id=user_id,
+            title="Task",
+            status=rng.choice(["pending", "in_progress", "completed", "completed"]),
+            subject=rng.choice([None, "", "Math", "Physics", "History"]),
+            actual_duration=rng.choice([None, 0, rng.randint(1, 180)]),
+            completed_at=timestamps(rng),
+        ))
+    for _ in range(sessions):
+        db.add(models.PomodoroSession(
+            user_id=user_id,
+            focus_duration=rng.choice([0, 25, 50, rng.randint(1, 90)]),
+            break_duration=5,
+            was_completed=rng.random() < 0.7,
+            completed_at=timestamps(rng),
+        ))
+    if rng.random() < 0.5:
+        db.add(models.UserSettings(user_id=user_id, current_streak=rng.randint(0, 30)))
+    db.commit()
+
+@pytest.mark.parametrize("seed, tasks, sessions", [
+    (0, 0, 0),
+    (1, 0, 12),
+    (2, 12, 0),
+    (3, 40, 40),
+    (4, 200, 150),
+    (5, 500, 500),
+])
+def test_summary_matches_python_implementation(db, user, same_on_all_backends, seed, tasks, sessions):
+    generate(db, user, seed, tasks, sessions)
+    summary = comparable(analytics.compute_summary(db, user))
+    assert summary == comparable(python_summary(db, user))
+    same_on_all_backends(summary, key=str(seed))
+
+def test_summary_of_rows_with_nulls(db, user):
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    db.add_all([
+        # Completed without a completion time, subject or duration.
+        models.Task(user_id=user, title="Task", status="completed"),
+        models.Task(user_id=user, title="Task", status="completed", subject="Math"),
+        models.Task(user_id=user, title="Task", status="completed", actual_duration=30, completed_at=today),
+        models.Task(user_id=user, title="Task", status="pending", subject="Math", actual_duration=30, completed_at=today),
+        models.Task(user_id=user, title="Task", status="completed", subject="Math", actual_duration=20, completed_at=today - timedelta(microseconds=1)),
+        models.PomodoroSession(user_id=user, focus_duration=25, break_duration=5, was_completed=True),
+        models.PomodoroSession(user_id=user, focus_duration=25, break_duration=5, was_completed=False, completed_at=today),
+    ])
+    db.commit()
+    summary = analytics.compute_summary(db, user)
+    assert comparable(summary) == comparable(python_summary(db, user))
+    assert summary.tasks_completed_today == 1
+    assert summary.tasks_completed_week == 2
+    assert summary.total_study_time == 25
+    assert summary.today_study_time == 0
+    assert [(item.subject, item.minutes) for item in summary.subject_distribution] == [("Math", 20)]
+    assert summary.completion_rate == 80
+    assert summary.focus_efficiency == 50
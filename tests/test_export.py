@@ -0,0 +1,30 @@
+import io
+from datetime import date, datetime, timedelta
+import pytest
+from api import recurrence
+
+pyarrow = pytest.importorskip("pyarrow")
+import pyarrow.parquet
+
+def test_parquet_export_of_materialized_occurrences(client, db, same_on_all_backends):
+    deadline = datetime.combine(date.today(), datetime.min.time()) + timedelta(hours=18)
+    response = client.post("/api/tasks", json={
+        "title": "Weekly review", "deadline": deadline.isoformat(), "isRecurring": True, "recurringSchedule": "weekly",
+    })
+    assert response.status_code == 201
+    template = response.json()
+    # Three weeks of occurrences, whatever the time of day.
+    recurrence.materialize_due(db, horizon=timedelta(days=24))
+
+    exported = client.get("/api/export", params={"resource": "tasks", "format": "parquet"})
+    assert exported.status_code == 200
+    table = pyarrow.parquet.read_table(io.BytesIO(exported.content))
+    assert table.schema.field("occurrenceDate").type == pyarrow.date32()
+    assert table.schema.field("deadline").type == pyarrow.timestamp("us")
+
+    rows = sorted(table.to_pylist(), key=lambda row: row["occurrenceDate"] or date.min)
+    occurrences = [row for row in rows if row["recurringTaskId"] == template["id"]]
+    assert [row["occurrenceDate"] for row in occurrences] == [deadline.date() + timedelta(weeks=week) for week in (1, 2, 3)]
+    assert rows[0]["id"] == template["id"]
+    assert rows[0]["occurrenceDate"] is None
+    same_on_all_backends([(row["title"], row["occurrenceDate"], row["deadline"]) for row in rows])
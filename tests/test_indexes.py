@@ -0,0 +1,116 @@
+from datetime import date, datetime, timedelta
+import pytest
+from sqlalchemy import func, select, text
+from api import models, pagination, pomodoro
+from api.dialects import is_true
+
+Task = models.Task
+Pomodoro = models.PomodoroSession
+
+def explain(db, statement) -> str:
+    # The plan of a statement as the app would run it, bound parameters and
+    # all, with every index name the plan mentions.
+    compiled = statement.compile(dialect=db.bind.dialect)
+    params = compiled.construct_params()
+    connection = db.connection()
+    if db.bind.dialect.name == "sqlite":
+        rows = connection.exec_driver_sql(
+            "EXPLAIN QUERY PLAN " + str(compiled), tuple(params[name] for name in compiled.positiontup)
+        ).all()
+        return "\n".join(row[-1] for row in rows)
+    # The tables hold a few rows, which a sequential scan would always win.
+    connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+    rows = connection.exec_driver_sql("EXPLAIN " + str(compiled), params).all()
+    return "\n".join(row[0] for row in rows)
+
+def index_names(db, name: str) -> set:
+    # On PostgreSQL a partitioned table's index has one index per partition,
+    # and the plan names those.
+    names = {name}
+    if db.bind.dialect.name == "postgresql":
+        names.update(db.execute(text(
+            "SELECT child.relname FROM pg_inherits"
+            " JOIN pg_class child ON child.oid = inhrelid"
+            " JOIN pg_class parent ON parent.oid = inhparent"
+            " WHERE parent.relname = :name"
+        ), {"name": name}).scalars())
+    return names
+
+def uses_index(db, statement, name: str) -> bool:
+    plan = explain(db, statement)
+    return any(f" {index} " in f" {plan} ".replace("\n", " ") for index in index_names(db, name))
+
+today = datetime.combine(date.today(), datetime.min.time())
+
+HOT_QUERIES = {
+    # GET /api/tasks, in both orders, and the pages after the first.
+    "ix_tasks_user_created_at_id": [
+        lambda user: select(Task.id).where(Task.user_id == user)
+            .order_by(*pagination.order_by_clauses(Task.created_at, Task.id, "desc")).limit(50),
+        lambda user: select(Task.id).where(
+            Task.user_id == user, pagination.keyset_filter(Task.created_at, Task.id, "asc", today, "id"),
+        ).order_by(*pagination.order_by_clauses(Task.created_at, Task.id, "asc")).limit(50),
+    ],
+    "ix_tasks_user_deadline_id": [
+        lambda user: select(Task.id).where(Task.user_id == user)
+            .order_by(*pagination.order_by_clauses(Task.deadline, Task.id, "asc")).limit(50),
+    ],
+    # GET /api/tasks?parentTaskId=... for a task's subtasks.
+    "ix_tasks_user_parent_task_id": [
+        lambda user: select(Task.id).where(Task.user_id == user, Task.parent_task_id == "parent"),
+    ],
+    # The analytics summary: completions since a day, the subject
+    # distribution and the study time since a day.
+    "ix_tasks_user_status_completed_at": [
+        lambda user: select(func.count()).select_from(Task)
+            .where(Task.user_id == user, Task.status == "completed", Task.completed_at >= today),
+    ],
+    "ix_tasks_user_completed_subject": [
+        lambda user: select(Task.subject, func.sum(Task.actual_duration)).where(
+            Task.user_id == user, Task.status == "completed", Task.subject.isnot(None), Task.subject != "",
+            Task.actual_duration.isnot(None), Task.actual_duration != 0,
+        ).group_by(Task.subject).order_by(Task.subject),
+    ],
+    "ix_pomodoro_sessions_user_completed_at": [
+        lambda user: select(func.sum(Pomodoro.focus_duration))
+            .where(Pomodoro.user_id == user, is_true(Pomodoro.was_completed), Pomodoro.completed_at >= today),
+    ],
+    # GET /api/pomodoro-sessions/stats over a month of completed sessions.
+    "ix_pomodoro_sessions_user_created_at": [
+        lambda user: pomodoro.stats_query(
+            pomodoro.session_filters(user, date.today() - timedelta(days=30), date.today(), completed=True), "day"
+        ),
+    ],
+    # The recurrence scheduler's due tasks.
+    "ix_tasks_next_occurrence_at": [
+        lambda user: select(Task.id).where(
+            is_true(Task.is_recurring), Task.recurring_schedule.isnot(None), Task.next_occurrence_at <= today,
+        ).order_by(Task.next_occurrence_at.asc().nulls_first()).limit(100),
+    ],
+}
+
+@pytest.fixture
+def history(db, user):
+    # A year of one user's tasks and sessions, with statistics, so the
+    # planner weighs the indexes as it would on a real database.
+    start = today - timedelta(days=365)
+    db.add_all(models.Task(
+        user_id=user, title="Task", status="completed" if i % 3 else "pending",
+        subject=["Math", "Physics", "History", None][i % 4], actual_duration=25, deadline=start + timedelta(days=i),
+        completed_at=start + timedelta(days=i) if i % 3 else None, parent_task_id="parent" if i % 50 == 0 else None,
+    ) for i in range(365))
+    db.add_all(models.PomodoroSession(
+        user_id=user, focus_duration=25, break_duration=5, was_completed=bool(i % 4),
+        completed_at=start + timedelta(days=i), created_at=start + timedelta(days=i),
+    ) for i in range(365))
+    db.commit()
+    # VACUUM too on PostgreSQL, as autovacuum would have: index-only scans
+    # of the covering indexes need the visibility map.
+    with db.bind.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.exec_driver_sql("ANALYZE" if db.bind.dialect.name == "sqlite" else "VACUUM ANALYZE")
+
+@pytest.mark.parametrize("index", HOT_QUERIES)
+def test_hot_queries_use_their_index(db, user, history, index):
+    for query in HOT_QUERIES[index]:
+        statement = query(user)
+        assert uses_index(db, statement, index), explain(db, statement)
@@ -0,0 +1,40 @@
+from datetime import date, datetime, time, timedelta
+from api import recurrence
+
+def occurrence_dates(client, template_id):
+    tasks = client.get("/api/tasks", params={"sort": "deadline"}).json()
+    return [date.fromisoformat(task["occurrenceDate"]) for task in tasks if task["recurringTaskId"] == template_id]
+
+def test_rescheduling_skips_dates_already_materialized(client, db, same_on_all_backends):
+    today = date.today()
+    now = datetime.combine(today, time(12))
+    template = client.post("/api/tasks", json={
+        "title": "Weekly review", "deadline": datetime.combine(today, time(18)).isoformat(),
+        "isRecurring": True, "recurringSchedule": "weekly",
+    }).json()
+    recurrence.materialize_due(db, now=now, horizon=timedelta(days=24))
+    weekly = [today + timedelta(weeks=week) for week in (1, 2, 3)]
+    assert occurrence_dates(client, template["id"]) == weekly
+
+    # Moving the deadline a day re-anchors the schedule. The new cadence
+    # starts after the last occurrence already materialized, instead of
+    # putting one next to each of them.
+    moved = datetime.combine(today + timedelta(days=1), time(18))
+    assert client.patch(f"/api/tasks/{template['id']}", json={"deadline": moved.isoformat()}).status_code == 200
+    recurrence.materialize_due(db, now=now, horizon=timedelta(days=24))
+    later = [moved.date() + timedelta(weeks=3)]
+    assert occurrence_dates(client, template["id"]) == weekly + later
+
+    recurrence.materialize_due(db, now=now, horizon=timedelta(days=40))
+    later += [moved.date() + timedelta(weeks=week) for week in (4, 5)]
+    assert occurrence_dates(client, template["id"]) == weekly + later
+    same_on_all_backends([(day - today).days for day in weekly + later])
+
+def test_first_pickup_starts_from_now(client, db):
+    today = date.today()
+    template = client.post("/api/tasks", json={
+        "title": "Daily drill", "deadline": datetime.combine(today - timedelta(days=10), time(8)).isoformat(),
+        "isRecurring": True, "recurringSchedule": "daily",
+    }).json()
+    recurrence.materialize_due(db, now=datetime.combine(today, time(12)), horizon=timedelta(days=3))
+    assert occurrence_dates(client, template["id"]) == [today + timedelta(days=day) for day in (1, 2, 3)]
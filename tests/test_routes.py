@@ -0,0 +1,428 @@
+import json
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from sqlalchemy import select, update
+from api import models, streaks
+from api.dialects import utcnow
+
+DEFAULT_SUBJECTS = ["Math", "Physics", "Chemistry", "Biology", "History", "English", "Computer Science", "Other"]
+
+def create_task(client, **fields):
+    response = client.post("/api/tasks", json={"title": "Task", **fields})
+    assert response.status_code == 201, response.text
+    return response.json()
+
+def create_goal(client, **fields):
+    body = {"title": "Goal", "type": "weekly", "targetDate": (datetime.now() + timedelta(days=7)).isoformat(), **fields}
+    response = client.post("/api/goals", json=body)
+    assert response.status_code == 201, response.text
+    return response.json()
+
+def complete(client, task_id, **fields):
+    response = client.patch(f"/api/tasks/{task_id}", json={"status": "completed", **fields})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def without(item, *keys):
+    return {key: value for key, value in item.items() if key not in keys}
+
+def test_task_crud(client, same_on_all_backends):
+    task = create_task(client, title="Read chapter 5", subject="Physics", estimatedDuration=45, resources=["notes.pdf"])
+    assert task["status"] == "pending"
+    assert task["resources"] == ["notes.pdf"]
+
+    assert client.get(f"/api/tasks/{task['id']}").json() == task
+    updated = client.patch(f"/api/tasks/{task['id']}", json={"priority": "critical", "resources": []}).json()
+    assert updated["priority"] == "critical"
+    assert updated["resources"] == []
+    assert [item["id"] for item in client.get("/api/tasks").json()] == [task["id"]]
+    same_on_all_backends(without(updated, "id", "createdAt"))
+
+    assert client.delete(f"/api/tasks/{task['id']}").status_code == 204
+    assert client.get(f"/api/tasks/{task['id']}").status_code == 404
+    assert client.get("/api/tasks").json() == []
+
+def test_tasks_are_scoped_to_their_user(client, user):
+    task = create_task(client)
+    other = {"X-User-Id": f"{user}-other"}
+    assert client.get(f"/api/tasks/{task['id']}", headers=other).status_code == 404
+    assert client.patch(f"/api/tasks/{task['id']}", json={"title": "Mine"}, headers=other).status_code == 404
+    assert client.delete(f"/api/tasks/{task['id']}", headers=other).status_code == 404
+    assert client.get("/api/tasks", headers=other).json() == []
+
+def test_task_pages_and_filters(client, same_on_all_backends):
+    start = datetime(2030, 1, 1, 9, 0)
+    ids = [
+        create_task(client, title=f"Task {i}", subject="Math" if i % 2 else "History", deadline=(start + timedelta(days=i)).isoformat())["id"]
+        for i in range(5)
+    ]
+
+    seen = []
+    params = {"limit": 2, "sort": "deadline", "order": "desc"}
+    while True:
+        page = client.get("/api/tasks", params=params).json()
+        seen.extend(item["id"] for item in page["items"])
+        if page["nextCursor"] is None:
+            break
+        params["cursor"] = page["nextCursor"]
+    assert seen == ids[::-1]
+
+    math = client.get("/api/tasks", params={"subject": "Math"}).json()
+    assert [item["title"] for item in math] == ["Task 1", "Task 3"]
+    window = client.get("/api/tasks", params={"deadlineFrom": (start + timedelta(days=1)).isoformat(), "deadlineTo": (start + timedelta(days=3)).isoformat()}).json()
+    assert [item["title"] for item in window] == ["Task 1", "Task 2"]
+    same_on_all_backends([item["title"] for item in window + math])
+
+def test_bulk_tasks(client, same_on_all_backends):
+    created = client.post("/api/tasks/bulk", json=[{"title": "A"}, {"description": "no title"}, {"title": "B"}])
+    assert created.status_code == 201
+    result = created.json()
+    assert [item["title"] for item in result["items"]] == ["A", "B"]
+    assert [error["index"] for error in result["errors"]] == [1]
+
+    ids = [item["id"] for item in result["items"]]
+    updated = client.patch("/api/tasks/bulk", json=[{"id": ids[0], "status": "completed", "actualDuration": 20}, {"id": "missing"}]).json()
+    assert [item["status"] for item in updated["items"]] == ["completed"]
+    assert [error["id"] for error in updated["errors"]] == ["missing"]
+
+    deleted = client.request("DELETE", "/api/tasks/bulk", json={"ids": ids}).json()
+    assert sorted(deleted["deleted"]) == sorted(ids)
+    assert client.get("/api/tasks").json() == []
+    same_on_all_backends((len(result["errors"]), len(updated["errors"]), len(deleted["deleted"])))
+
+def test_task_tree(client, same_on_all_backends):
+    root = create_task(client, title="Root", estimatedDuration=60)
+    child = create_task(client, title="Child", parentTaskId=root["id"], estimatedDuration=30)
+    create_task(client, title="Grandchild", parentTaskId=child["id"], estimatedDuration=10)
+    complete(client, child["id"], actualDuration=25)
+
+    tree = client.get(f"/api/tasks/{root['id']}/tree").json()
+    assert tree["nodeCount"] == 3
+    assert tree["maxDepth"] == 2
+    assert tree["root"]["estimatedDurationTotal"] == 100
+    assert tree["root"]["actualDurationTotal"] == 25
+    assert tree["root"]["completedCount"] == 1
+    assert tree["root"]["completionPercentage"] == 33
+    assert [node["title"] for node in tree["root"]["children"]] == ["Child"]
+    same_on_all_backends({key: tree["root"][key] for key in ("taskCount", "completedCount", "completionPercentage", "estimatedDurationTotal")})
+
+def test_goal_progress_follows_related_tasks(client, same_on_all_backends):
+    first = create_task(client, estimatedDuration=30)
+    second = create_task(client, estimatedDuration=30)
+    goal = create_goal(client, relatedTaskIds=[second["id"], first["id"]])
+    assert goal["relatedTaskIds"] == [second["id"], first["id"]]
+    assert goal["progress"] == 0
+
+    complete(client, first["id"])
+    assert client.get(f"/api/goals/{goal['id']}").json()["progress"] == 50
+    assert client.delete(f"/api/tasks/{second['id']}").status_code == 204
+    goal = client.get(f"/api/goals/{goal['id']}").json()
+    assert goal["relatedTaskIds"] == [first["id"]]
+    assert goal["progress"] == 100
+    same_on_all_backends(goal["progress"])
+
+    assert client.post("/api/goals", json={"title": "G", "type": "weekly", "targetDate": datetime.now().isoformat(), "relatedTaskIds": ["missing"]}).status_code == 400
+
+def test_goal_progress_is_weighted_by_estimate(client, same_on_all_backends):
+    done = create_task(client, estimatedDuration=60)
+    pending = create_task(client, estimatedDuration=30)
+    unestimated = create_task(client)
+    goal = create_goal(client, relatedTaskIds=[done["id"], pending["id"]])
+    complete(client, done["id"])
+    # 60 of 90 minutes is 66.7%, rounded rather than truncated.
+    assert client.get(f"/api/goals/{goal['id']}").json()["progress"] == 67
+
+    # A task without an estimate weighs the goal's average one: 60 of 135.
+    goal = client.patch(f"/api/goals/{goal['id']}", json={"relatedTaskIds": [done["id"], pending["id"], unestimated["id"]]}).json()
+    assert goal["progress"] == 44
+    same_on_all_backends(goal["progress"])
+
+def test_pomodoro_sessions_and_stats(client, same_on_all_backends):
+    task = create_task(client)
+    response = client.post("/api/pomodoro-sessions", json={"taskId": task["id"], "focusDuration": 25, "breakDuration": 5, "wasCompleted": True})
+    assert response.status_code == 201
+
+    # A session's place in time is its createdAt, which only imports set.
+    today = date.today()
+    history = [
+        {"taskId": task["id"], "focusDuration": 50, "breakDuration": 10, "wasCompleted": completed, "createdAt": f"{day}T10:00:00"}
+        for day, completed in ((today - timedelta(days=1), True), (today - timedelta(days=1), False), (today - timedelta(days=40), True))
+    ]
+    body = "\n".join(json.dumps(session) for session in history).encode()
+    assert client.post("/api/import", params={"resource": "pomodoro-sessions"}, content=body).json()["imported"] == 3
+
+    assert len(client.get("/api/pomodoro-sessions").json()) == 4
+    recent = client.get("/api/pomodoro-sessions", params={"from": (today - timedelta(days=1)).isoformat(), "completed": "true"}).json()
+    assert [session["focusDuration"] for session in recent] == [50, 25]
+
+    stats = client.get("/api/pomodoro-sessions/stats", params={"bucket": "day", "byTask": "true", "from": (today - timedelta(days=1)).isoformat()}).json()
+    assert [
+        (row["period"], row["taskId"], row["sessions"], row["completedSessions"], row["focusMinutes"], row["breakMinutes"])
+        for row in stats
+    ] == [
+        ((today - timedelta(days=1)).isoformat(), task["id"], 2, 1, 100, 20),
+        (today.isoformat(), task["id"], 1, 1, 25, 5),
+    ]
+    months = client.get("/api/pomodoro-sessions/stats", params={"bucket": "month"}).json()
+    assert sum(row["sessions"] for row in months) == 4
+    assert all(row["period"].endswith("-01") for row in months)
+    same_on_all_backends([without(row, "taskId") for row in stats + months])
+
+def test_analytics(client, same_on_all_backends):
+    # The settings row holds the streak; the client creates it on load.
+    client.get("/api/settings")
+    physics = create_task(client, subject="Physics")
+    create_task(client, subject="Math")
+    complete(client, physics["id"], actualDuration=40)
+    client.post("/api/pomodoro-sessions", json={"focusDuration": 25, "breakDuration": 5, "wasCompleted": True, "completedAt": datetime.now().isoformat()})
+    client.post("/api/pomodoro-sessions", json={"focusDuration": 25, "breakDuration": 5, "wasCompleted": False})
+
+    summary = client.get("/api/analytics/summary").json()
+    assert summary == {
+        "totalStudyTime": 25,
+        "todayStudyTime": 25,
+        "weekStudyTime": 25,
+        "tasksCompletedToday": 1,
+        "tasksCompletedWeek": 1,
+        "currentStreak": 1,
+        "subjectDistribution": [{"subject": "Physics", "minutes": 40}],
+        "completionRate": 50,
+        "focusEfficiency": 50,
+    }
+    same_on_all_backends(summary, "summary")
+
+    daily = client.get("/api/analytics/daily").json()
+    assert daily == [{
+        "date": date.today().isoformat(),
+        "totalMinutesStudied": 65,
+        "tasksCompleted": 1,
+        "pomodoroSessionsCompleted": 1,
+        "subjectBreakdown": {"Physics": 40},
+    }]
+    same_on_all_backends(daily, "daily")
+
+def test_recompute_streak(client, same_on_all_backends):
+    client.get("/api/settings")
+    # Imported history does not advance the streak as it lands.
+    today = datetime.combine(date.today(), datetime.min.time()) + timedelta(hours=9)
+    body = "\n".join(
+        json.dumps({"title": f"Day {day}", "status": "completed", "completedAt": (today - timedelta(days=day)).isoformat()})
+        for day in (0, 1, 2, 4)
+    )
+    assert client.post("/api/import", params={"resource": "tasks"}, content=body.encode()).json()["imported"] == 4
+    assert client.get("/api/settings").json()["currentStreak"] == 0
+
+    recomputed = client.post("/api/settings/recompute-streak").json()
+    assert (recomputed["currentStreak"], recomputed["longestStreak"]) == (3, 3)
+    # Read back in a request of its own: the recompute was committed.
+    settings = client.get("/api/settings").json()
+    assert (settings["currentStreak"], settings["longestStreak"]) == (3, 3)
+    same_on_all_backends((settings["currentStreak"], settings["longestStreak"]))
+
+def test_settings_and_subjects(client, same_on_all_backends):
+    settings = client.get("/api/settings").json()
+    assert settings["customSubjects"] == DEFAULT_SUBJECTS
+    assert client.patch("/api/settings", json={"theme": "light"}).json()["theme"] == "light"
+
+    assert client.post("/api/subjects", params={"subject": "Art"}).json()["subjects"] == DEFAULT_SUBJECTS + ["Art"]
+    task = create_task(client, subject="Math")
+    renamed = client.patch("/api/subjects/Math", json={"name": "Maths"}).json()
+    assert renamed["tasksUpdated"] == 1
+    assert renamed["subjects"][0] == "Maths"
+    assert client.get(f"/api/tasks/{task['id']}").json()["subject"] == "Maths"
+    assert client.patch("/api/subjects/Missing", json={"name": "X"}).status_code == 404
+
+    remaining = client.delete("/api/subjects/Art").json()["subjects"]
+    assert "Art" not in remaining
+    same_on_all_backends(remaining)
+
+def test_search(client, same_on_all_backends):
+    thermo = create_task(client, title="Thermodynamics revision", subject="Physics", description="Entropy and heat engines")
+    create_task(client, title="Calculus drills", subject="Math")
+    goal = create_goal(client, title="Master thermodynamics")
+
+    results = client.get("/api/search", params={"q": "thermodynamics"}).json()
+    assert results["total"] == 2
+    assert {(hit["type"], hit["id"]) for hit in results["items"]} == {("task", thermo["id"]), ("goal", goal["id"])}
+    assert "<mark>" in results["items"][0]["titleHighlight"]
+    tasks_only = client.get("/api/search", params={"q": "entropy", "type": "tasks"}).json()
+    assert [hit["id"] for hit in tasks_only["items"]] == [thermo["id"]]
+    excluded = client.get("/api/search", params={"q": "thermodynamics -entropy"}).json()
+    assert [hit["id"] for hit in excluded["items"]] == [goal["id"]]
+    same_on_all_backends(sorted((hit["type"], hit["title"]) for hit in results["items"]))
+
+def test_search_highlights_are_escaped(client, same_on_all_backends):
+    create_task(client, title="<script>alert(1)</script> thermodynamics", description="Heat & <b>thermodynamics</b>")
+    hit = client.get("/api/search", params={"q": "thermodynamics"}).json()["items"][0]
+    assert hit["title"] == "<script>alert(1)</script> thermodynamics"
+    assert "<script>" not in hit["titleHighlight"]
+    assert hit["titleHighlight"].startswith("&lt;script&gt;alert(1)&lt;/script&gt;")
+    assert "<mark>thermodynamics</mark>" in hit["titleHighlight"]
+    assert "<b>" not in hit["descriptionHighlight"]
+    assert "&amp;" in hit["descriptionHighlight"]
+    assert "<mark>thermodynamics</mark>" in hit["descriptionHighlight"]
+    same_on_all_backends(hit["titleHighlight"])
+
+def test_export_and_import(client, user, same_on_all_backends):
+    for i in range(3):
+        create_task(client, title=f"Exported {i}", subject="Math", resources=[f"r{i}"])
+    exported = client.get("/api/export", params={"resource": "tasks"})
+    assert exported.status_code == 200
+    lines = exported.text.strip().splitlines()
+    assert len(lines) == 3
+
+    other = {"X-User-Id": f"{user}-copy"}
+    fresh = [json.dumps(dict(json.loads(line), id=str(uuid.uuid4()))) for line in lines]
+    body = "\n".join(fresh + ["not json"]).encode()
+    result = client.post("/api/import", params={"resource": "tasks"}, content=body, headers=other).json()
+    assert (result["received"], result["imported"], result["skipped"], result["rejected"]) == (4, 3, 0, 1)
+    again = client.post("/api/import", params={"resource": "tasks"}, content="\n".join(fresh).encode(), headers=other).json()
+    assert (again["imported"], again["skipped"]) == (0, 3)
+
+    copied = client.get("/api/tasks", headers=other).json()
+    assert sorted(task["title"] for task in copied) == ["Exported 0", "Exported 1", "Exported 2"]
+    csv_export = client.get("/api/export", params={"resource": "tasks", "format": "csv"}, headers=other)
+    assert len(csv_export.text.strip().splitlines()) == 4
+    same_on_all_backends(sorted((task["title"], task["resources"][0]) for task in copied))
+
+def test_import_rejects_lines_that_are_not_utf8(client, same_on_all_backends):
+    ndjson = '{"title": "ok"}\n'.encode() + b'{"title": "a\xff"}\n' + '{"title": "café"}\n'.encode()
+    result = client.post("/api/import", params={"resource": "tasks", "format": "ndjson"}, content=ndjson)
+    assert result.status_code == 200
+    result = result.json()
+    assert (result["received"], result["imported"], result["rejected"]) == (3, 2, 1)
+    assert [error["line"] for error in result["errors"]] == [2]
+
+    csv_body = 'title,subject\nfirst,"multi\nline"\n'.encode() + b'bad\xff,Math\n' + 'third,Physics\n'.encode()
+    result = client.post("/api/import", params={"resource": "tasks", "format": "csv"}, content=csv_body).json()
+    assert (result["received"], result["imported"], result["rejected"]) == (3, 2, 1)
+    assert [error["line"] for error in result["errors"]] == [4]
+
+    titles = sorted(task["title"] for task in client.get("/api/tasks").json())
+    assert titles == ["café", "first", "ok", "third"]
+    same_on_all_backends(titles)
+
+def test_session_import_skips_existing_ids(client, user, same_on_all_backends):
+    # Sessions are partitioned by created_at on PostgreSQL; an id imported
+    # again with another created_at, in another month, is still the same session.
+    session_id = str(uuid.uuid4())
+    session = {"id": session_id, "focusDuration": 25, "breakDuration": 5, "wasCompleted": True}
+    first = json.dumps(dict(session, createdAt="2026-01-15T10:00:00", completedAt="2026-01-15T10:25:00"))
+    moved = json.dumps(dict(session, createdAt="2026-03-15T10:00:00", completedAt="2026-03-15T10:25:00"))
+    result = client.post("/api/import", params={"resource": "pomodoro-sessions"}, content=f"{first}\n{moved}".encode()).json()
+    assert (result["imported"], result["skipped"]) == (1, 1)
+    again = client.post("/api/import", params={"resource": "pomodoro-sessions"}, content=moved.encode()).json()
+    assert (again["imported"], again["skipped"]) == (0, 1)
+    # Not even for another user.
+    other = client.post("/api/import", params={"resource": "pomodoro-sessions"}, content=moved.encode(), headers={"X-User-Id": f"{user}-other"}).json()
+    assert (other["imported"], other["skipped"]) == (0, 1)
+
+    sessions = client.get("/api/pomodoro-sessions").json()
+    assert [(item["id"], item["createdAt"]) for item in sessions] == [(session_id, "2026-01-15T10:00:00")]
+    daily = client.get("/api/analytics/daily").json()
+    assert [(day["date"], day["pomodoroSessionsCompleted"]) for day in daily] == [("2026-01-15", 1)]
+    same_on_all_backends(len(sessions))
+
+def test_conditional_requests(client):
+    create_task(client)
+    first = client.get("/api/tasks")
+    etag = first.headers["ETag"]
+    assert client.get("/api/tasks", headers={"If-None-Match": etag}).status_code == 304
+
+    create_task(client)
+    second = client.get("/api/tasks", headers={"If-None-Match": etag})
+    assert second.status_code == 200
+    assert second.headers["ETag"] != etag
+
+def test_if_modified_since(client, db, user):
+    create_task(client)
+    versions = models.TableVersion
+    now = db.execute(select(utcnow())).scalar()
+    def stamp(updated_at):
+        db.execute(update(versions).where(versions.table_name == "tasks", versions.user_id == user).values(updated_at=updated_at))
+        db.commit()
+
+    # Written within the current second: a write later in the same second
+    # would carry the same HTTP date, so there is no Last-Modified yet and
+    # If-Modified-Since with that second is not answered with a 304.
+    written = now + timedelta(milliseconds=900)
+    stamp(written)
+    response = client.get("/api/tasks", headers={"If-Modified-Since": format_datetime(written.replace(microsecond=0, tzinfo=timezone.utc), usegmt=True)})
+    assert response.status_code == 200
+    assert "Last-Modified" not in response.headers
+
+    stamp(now - timedelta(hours=1, milliseconds=500))
+    last_modified = client.get("/api/tasks").headers["Last-Modified"]
+    assert client.get("/api/tasks", headers={"If-Modified-Since": last_modified}).status_code == 304
+    earlier = format_datetime(parsedate_to_datetime(last_modified) - timedelta(seconds=1), usegmt=True)
+    assert client.get("/api/tasks", headers={"If-Modified-Since": earlier}).status_code == 200
+    # The ETag wins over the date.
+    assert client.get("/api/tasks", headers={"If-None-Match": '"stale"', "If-Modified-Since": last_modified}).status_code == 200
+
+def test_reset_all_runs_as_a_job(client, user, run_jobs, same_on_all_backends):
+    task = create_task(client, subject="Physics")
+    complete(client, task["id"], actualDuration=30)
+    create_goal(client, relatedTaskIds=[task["id"]])
+
+    response = client.post("/api/reset-all")
+    assert response.status_code == 202
+    job = response.json()
+    assert response.headers["Location"] == f"/api/jobs/{job['id']}"
+    assert job["status"] == "queued"
+    assert client.post("/api/reset-all").json()["id"] == job["id"]
+    assert client.get(f"/api/jobs/{job['id']}", headers={"X-User-Id": f"{user}-other"}).status_code == 404
+
+    run_jobs()
+    job = client.get(response.headers["Location"]).json()
+    assert job["status"] == "succeeded"
+    assert job["result"] == {"deleted": {"tasks": 1, "goals": 1, "pomodoroSessions": 0, "dailyStats": 1}}
+    assert client.get("/api/tasks").json() == []
+    assert client.get("/api/analytics/daily").json() == []
+    assert client.get("/api/settings").json()["currentStreak"] == 0
+    assert [item["id"] for item in client.get("/api/jobs").json()] == [job["id"]]
+    same_on_all_backends(job["result"])
+
+def test_rebuild_analytics_job(client, db, user, run_jobs, same_on_all_backends):
+    task = create_task(client, subject="History")
+    complete(client, task["id"], actualDuration=50)
+    # Lose the rollup, as a bad deploy might.
+    db.execute(models.DailyStats.__table__.delete().where(models.DailyStats.user_id == user))
+    db.commit()
+    assert client.get("/api/analytics/daily").json() == []
+
+    assert client.post("/api/analytics/rebuild").status_code == 202
+    run_jobs()
+    daily = client.get("/api/analytics/daily").json()
+    assert [(day["tasksCompleted"], day["subjectBreakdown"]) for day in daily] == [(1, {"History": 50})]
+    same_on_all_backends(daily)
+
+def test_failed_rebuild_is_rolled_back(client, db, user, run_jobs, monkeypatch, same_on_all_backends):
+    client.get("/api/settings")
+    task = create_task(client, subject="History")
+    complete(client, task["id"], actualDuration=50)
+    db.execute(models.DailyStats.__table__.delete().where(models.DailyStats.user_id == user))
+    db.commit()
+
+    # The streak fails after daily_stats has been rebuilt: the attempt
+    # leaves nothing behind, and the retry redoes all of it.
+    recompute_streaks = streaks.recompute_streaks
+    def fail_once(*args, **kwargs):
+        monkeypatch.setattr(streaks, "recompute_streaks", recompute_streaks)
+        raise RuntimeError("connection lost")
+    monkeypatch.setattr(streaks, "recompute_streaks", fail_once)
+
+    job = client.post("/api/analytics/rebuild").json()
+    run_jobs()
+    failed = client.get(f"/api/jobs/{job['id']}").json()
+    assert (failed["status"], failed["error"]) == ("queued", "RuntimeError: connection lost")
+    assert client.get("/api/analytics/daily").json() == []
+
+    db.execute(update(models.Job).where(models.Job.id == job["id"]).values(run_after=datetime.now()))
+    db.commit()
+    run_jobs()
+    assert client.get(f"/api/jobs/{job['id']}").json()["status"] == "succeeded"
+    daily = client.get("/api/analytics/daily").json()
+    assert [(day["tasksCompleted"], day["subjectBreakdown"]) for day in daily] == [(1, {"History": 50})]
+    assert client.get("/api/analytics/summary").json()["currentStreak"] == 1
+    same_on_all_backends(daily)
@@ -0,0 +1,86 @@
+import random
+import threading
+from datetime import datetime, timedelta
+import pytest
+from api import database, models, streaks
+
+THREADS = 8
+
+def run_concurrently(user, days, threads=THREADS, stagger=0.0):
+    # Every thread replays the same days in order, each call in its own
+    # transaction like concurrent completions. They start together, or
+    # staggered so lagging writers replay days the row has already moved past.
+    barrier = threading.Barrier(threads)
+    errors = []
+
+    def replay(index):
+        db = database.SessionLocal()
+        try:
+            barrier.wait()
+            threading.Event().wait(index * stagger)
+            for day in days:
+                # Same or slightly later time of day, as separate requests would have.
+                streaks.record_study_day(db, user, day + timedelta(seconds=random.randint(0, 59)))
+                db.commit()
+        except Exception as e:
+            errors.append(e)
+        finally:
+            db.close()
+
+    workers = [threading.Thread(target=replay, args=(index,)) for index in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert errors == []
+
+def settings(db, user, **fields):
+    db.add(models.UserSettings(user_id=user, **fields))
+    db.commit()
+
+def streak(db, user):
+    db.expire_all()
+    row = db.query(models.UserSettings).filter(models.UserSettings.user_id == user).one()
+    return row.current_streak, row.longest_streak, row.last_study_date.date()
+
+def test_same_day_is_counted_once(db, user):
+    today = datetime(2026, 3, 10, 9)
+    settings(db, user, current_streak=3, longest_streak=5, last_study_date=today - timedelta(days=1))
+    run_concurrently(user, [today])
+    assert streak(db, user) == (4, 5, today.date())
+
+def test_streak_restarts_after_a_gap(db, user):
+    today = datetime(2026, 3, 10, 9)
+    settings(db, user, current_streak=3, longest_streak=5, last_study_date=today - timedelta(days=2))
+    run_concurrently(user, [today])
+    assert streak(db, user) == (1, 5, today.date())
+
+def test_day_boundary(db, user):
+    # Just before and just after midnight: two days, whichever thread
+    # writes them.
+    midnight = datetime(2026, 3, 11)
+    settings(db, user, current_streak=5, longest_streak=5, last_study_date=midnight - timedelta(days=2))
+    run_concurrently(user, [midnight - timedelta(minutes=1), midnight])
+    assert streak(db, user) == (7, 7, midnight.date())
+
+    # A lagging writer's completion from before midnight changes nothing.
+    run_concurrently(user, [midnight - timedelta(minutes=1)])
+    assert streak(db, user) == (7, 7, midnight.date())
+
+@pytest.mark.parametrize("seed", [1, 2])
+def test_staggered_replays(db, user, seed):
+    rng = random.Random(seed)
+    days = []
+    day = datetime(2026, 1, 1, 9)
+    for _ in range(30):
+        days.append(day)
+        day += timedelta(days=2 if rng.random() < 0.1 else 1)
+
+    current = longest = 0
+    for previous, day in zip([None] + days, days):
+        current = current + 1 if previous and (day.date() - previous.date()).days == 1 else 1
+        longest = max(longest, current)
+
+    settings(db, user)
+    run_concurrently(user, days, stagger=0.005)
+    assert streak(db, user) == (current, longest, days[-1].date())